@@ -56,12 +56,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portfolioapp.middleware.MetricsMiddleware',  # inactif sauf METRICS_ENABLED
+    'portfolioapp.middleware.SQLInstrumentationMiddleware',  # inactif sauf SQL_INSTRUMENTATION_ENABLED
+    'portfolioapp.middleware.TemplateProfilingMiddleware',  # inactif sauf TEMPLATE_PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'csp.middleware.CSPMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'portfolioapp.middleware.ProfilingMiddleware',  # requiert request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -113,6 +117,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexions persistantes, vérifiées avant réutilisation
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # BEGIN IMMEDIATE : une transaction d'écriture prend le verrou dès le début
+            # et attend (busy_timeout) au lieu d'échouer en cours de route
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -313,6 +325,69 @@ MATERIAL_ADMIN_SITE = {
 }
 
 
+# ------------------------------
+# CACHE
+# ------------------------------
+# Les invalidations passent par le cache (versions de tags, voir
+# portfolioapp/caching.py) : avec plusieurs workers, utiliser un backend
+# partagé (FileBasedCache, Redis...) pour qu'elles atteignent tous les workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'portfolio',
+    }
+}
+GLOBAL_CONTEXT_CACHE_TIMEOUT = 300  # secondes
+PAGE_CACHE_ENABLED = True  # pages complètes des visiteurs anonymes (portfolioapp/page_cache.py)
+PAGE_CACHE_TIMEOUT = 600
+# Valeur de l'en-tête X-Page-Cache-Bypass forçant un nouveau rendu (vide = désactivé)
+PAGE_CACHE_BYPASS_TOKEN = os.environ.get('PAGE_CACHE_BYPASS_TOKEN', '')
+RELATED_PROJECTS_CACHE_TIMEOUT = 3600  # barre « autres réalisations » de project_detail
+LIKED_IDS_CACHE_TIMEOUT = 3600  # projets/commentaires likés par utilisateur (voir portfolioapp/likes.py)
+
+# ------------------------------
+# COMPTEURS DE VUES (write-behind, voir portfolioapp/counters.py)
+# ------------------------------
+COUNTER_FLUSH_INTERVAL = 10  # secondes entre deux écritures en base (perte maximale si un worker est tué)
+COUNTER_FLUSH_THRESHOLD = 100  # nombre d'objets en attente déclenchant un flush
+COUNTER_SPOOL_DIR = BASE_DIR / 'var' / 'counters'  # incréments non écrits à l'arrêt du worker
+
+# ------------------------------
+# STATISTIQUES DE FRÉQUENTATION (voir portfolioapp/analytics.py)
+# ------------------------------
+ANALYTICS_FLUSH_INTERVAL = 10  # secondes entre deux insertions d'événements de vue
+ANALYTICS_FLUSH_THRESHOLD = 200  # événements en attente déclenchant une insertion
+ANALYTICS_BUFFER_MAX_EVENTS = 10000  # au-delà (base indisponible), les plus anciens sont abandonnés
+ANALYTICS_BATCH_SIZE = 1000  # lignes par INSERT
+ANALYTICS_EVENT_RETENTION_DAYS = 90  # conservation des événements bruts (les agrégats sont gardés)
+ANALYTICS_DELETE_BATCH_SIZE = 1000  # événements supprimés par transaction
+
+# ------------------------------
+# RAPPORTS ADSENSE (import CSV, voir portfolioapp/ad_reports.py)
+# ------------------------------
+AD_IMPORT_BATCH_SIZE = 1000  # lignes écrites par requête lors d'un import
+
+# ------------------------------
+# RECHERCHE PLEIN TEXTE (SQLite FTS5, voir portfolioapp/search.py)
+# ------------------------------
+SEARCH_MAX_RESULTS = 500  # résultats classés au plus par recherche
+
+# ------------------------------
+# ENVOI DE FICHIERS (CV, voir portfolioapp/file_delivery.py)
+# ------------------------------
+# None : Django envoie le fichier en streaming
+# 'x-sendfile' : délégation à Apache (mod_xsendfile)
+# 'x-accel-redirect' : délégation à nginx, via un emplacement `internal` pointant sur MEDIA_ROOT
+FILE_DELIVERY_OFFLOAD = None
+FILE_DELIVERY_ACCEL_PREFIX = '/protected/'
+
+# ------------------------------
+# IMAGES RESPONSIVES (voir portfolioapp/images.py)
+# ------------------------------
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280)  # largeurs générées en WebP et JPEG
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_THREADS = 2  # threads de génération après un upload
+
 # ------------------------------
 # SECURITY
 # ------------------------------
@@ -362,6 +437,83 @@ CONTENT_SECURITY_POLICY = {
     }
 }
 
+# ------------------------------
+# BASE D'ACTIVITÉ
+# ------------------------------
+# Fichier SQLite séparé pour les tables à forte écriture : notifications, vues,
+# performances AdSense et sessions (portfolioapp/routers.py). Vide = une seule base.
+# Mise en place :
+#   python manage.py migrate --database activity && python manage.py migrate
+#   python manage.py move_activity_data  # base existante : copie les lignes déjà présentes
+#   python manage.py reconcile_unread_notifications  # périodiquement (voir routers.py)
+ACTIVITY_DATABASE = os.environ.get('ACTIVITY_DATABASE', '')
+if ACTIVITY_DATABASE:
+    DATABASES['activity'] = {**DATABASES['default'], 'NAME': ACTIVITY_DATABASE, 'TEST': {'DEPENDENCIES': []}}
+    # Tests : la migration 0002 de "default" lit les notifications de "activity", créée d'abord
+    DATABASES['default']['TEST'] = {'DEPENDENCIES': ['activity']}
+    DATABASE_ROUTERS = ['portfolioapp.routers.ActivityRouter']
+
+# ------------------------------
+# MÉTRIQUES
+# ------------------------------
+# Endpoint /metrics au format Prometheus (portfolioapp/metrics.py). Chaque worker
+# écrit ses valeurs dans son fichier de METRICS_DIR, additionnés au scrape.
+# Vider METRICS_DIR à chaque redéploiement. Désactivé par défaut.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '') == '1'
+METRICS_DIR = BASE_DIR / 'var' / 'metrics'
+METRICS_FLUSH_INTERVAL = 5  # secondes entre deux écritures du fichier d'un worker
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # REMOTE_ADDR autorisés à lire /metrics
+
+# ------------------------------
+# PROFILAGE CPU
+# ------------------------------
+# Requêtes exécutées sous cProfile (portfolioapp/profiling.py) : à la demande du
+# staff (en-tête "X-Profile: 1" ou ?_profile=1) ou par échantillonnage. Rapports
+# listés par vue sur /profiling/ (staff uniquement). Désactivé par défaut.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') == '1'
+PROFILING_SAMPLE_RATE = 0  # part des requêtes profilées sans demande (0.01 = 1 %)
+PROFILING_DIR = BASE_DIR / 'var' / 'profiles'
+PROFILING_MAX_REPORTS = 200  # rapports conservés, les plus anciens sont supprimés
+
+# ------------------------------
+# PROFILAGE DES TEMPLATES
+# ------------------------------
+# Temps, appels et requêtes SQL par template, include et tag de portfolio_extras
+# sur un échantillon de requêtes (portfolioapp/template_profiling.py) : en-tête
+# Server-Timing et journal JSON lines. Agrégat : python manage.py template_profile
+# Désactivé par défaut.
+TEMPLATE_PROFILING_ENABLED = os.environ.get('TEMPLATE_PROFILING_ENABLED', '') == '1'
+TEMPLATE_PROFILING_SAMPLE_RATE = 0.1  # part des requêtes mesurées (1.0 = toutes)
+TEMPLATE_PROFILING_LOG = BASE_DIR / 'var' / 'templates' / 'renders.jsonl'
+TEMPLATE_PROFILING_LOG_MAX_BYTES = 10 * 1024 * 1024  # rotation au-delà
+TEMPLATE_PROFILING_LOG_BACKUPS = 5
+
+# ------------------------------
+# INSTRUMENTATION SQL
+# ------------------------------
+# Requêtes SQL d'un échantillon de requêtes HTTP : en-tête Server-Timing et
+# journal JSON lines (portfolioapp/sql_instrumentation.py). Désactivé par défaut.
+SQL_INSTRUMENTATION_ENABLED = os.environ.get('SQL_INSTRUMENTATION_ENABLED', '') == '1'
+SQL_INSTRUMENTATION_SAMPLE_RATE = 0.05  # part des requêtes instrumentées (1.0 = toutes)
+SQL_INSTRUMENTATION_LOG = BASE_DIR / 'var' / 'sql' / 'requests.jsonl'
+SQL_INSTRUMENTATION_LOG_MAX_BYTES = 10 * 1024 * 1024  # rotation au-delà
+SQL_INSTRUMENTATION_LOG_BACKUPS = 5
+SQL_INSTRUMENTATION_SLOWEST = 5  # requêtes lentes / répétées journalisées par requête HTTP
+
+# ------------------------------
+# SQLITE
+# ------------------------------
+# PRAGMA appliqués à chaque nouvelle connexion (portfolioapp/sqlite_tuning.py).
+# Comparer avec les réglages par défaut : python manage.py benchmark_sqlite
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,  # ms d'attente d'un verrou avant "database is locked"
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 128 * 1024 * 1024,  # octets lus par mmap
+    'cache_size': -20000,  # négatif = en Kio (20 Mo par connexion)
+    'temp_store': 'memory',
+}
+
 # ------------------------------
 # END
 # ------------------------------
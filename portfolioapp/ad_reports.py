@@ -0,0 +1,265 @@
+"""
+Import en masse et rapports des performances AdSense.
+
+- `import_csv(lines)` lit un export CSV AdSense ligne par ligne (le fichier
+  n'est jamais chargé en entier), valide chaque ligne et écrit les lignes
+  valides par lots : un INSERT ... ON CONFLICT (unité, date) DO UPDATE par lot,
+  le CTR étant calculé pour tout le lot en une seule passe ;
+- `refresh_rollups(start, end)` recalcule, à partir de requêtes SQL groupées,
+  les agrégats hebdomadaires et mensuels par position des périodes couvrant
+  [start, end]. L'admin affiche ces agrégats sans parcourir les lignes
+  journalières.
+"""
+import csv
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import AdPerformance, AdPerformanceRollup, AdUnit, compute_ctr
+
+# Colonne attendue -> intitulés acceptés (comparaison insensible à la casse)
+COLUMNS = {
+    'date': ('date', 'jour'),
+    'ad_unit': ('ad unit', 'ad unit id', 'ad unit code', 'ad_unit', 'ad_unit_id', 'unité publicitaire'),
+    'impressions': ('impressions', 'ad impressions'),
+    'clicks': ('clicks', 'clics'),
+    'revenue': ('estimated earnings (usd)', 'estimated earnings', 'earnings', 'revenue', 'revenus'),
+}
+REQUIRED = ('date', 'ad_unit', 'impressions', 'clicks')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+# Lignes de total ajoutées en fin d'export
+TOTAL_LABELS = {'total', 'totals', 'totaux'}
+PERIODS = (('week', TruncWeek), ('month', TruncMonth))
+# 1,234 ou 12,345,678 : virgules séparant des milliers, sans décimales
+THOUSANDS_RE = re.compile(r'^\d{1,3}(,\d{3})+$')
+
+
+class CSVFormatError(ValueError):
+    """En-têtes du fichier inutilisables"""
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    # [(numéro de ligne, message), ...]
+    errors: list = field(default_factory=list)
+    first_date: object = None
+    last_date: object = None
+
+
+def _batch_size():
+    return getattr(settings, 'AD_IMPORT_BATCH_SIZE', 1000)
+
+
+def _atomic():
+    # Les performances peuvent être dans la base d'activité (routers.py)
+    return transaction.atomic(using=router.db_for_write(AdPerformance))
+
+
+def _header_map(fieldnames):
+    normalized = {name.strip().lower(): name for name in fieldnames if name}
+    columns = {}
+    for column, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in normalized:
+                columns[column] = normalized[alias]
+                break
+    missing = [column for column in REQUIRED if column not in columns]
+    if missing:
+        raise CSVFormatError(f"Colonnes manquantes : {', '.join(missing)}")
+    return columns
+
+
+def _unit_lookup():
+    """{identifiant AdSense ou nom en minuscules: pk}"""
+    units = {}
+    for pk, slot, name in AdUnit.objects.values_list('pk', 'ad_unit_id', 'name'):
+        units.setdefault(name.strip().lower(), pk)
+        units[slot.strip().lower()] = pk
+    return units
+
+
+def _parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"date invalide : {value!r}")
+
+
+def _parse_int(value, label):
+    try:
+        number = int(value.replace(',', '').replace(' ', '').replace('\xa0', '') or 0)
+    except ValueError:
+        raise ValueError(f"{label} invalide : {value!r}") from None
+    if number < 0:
+        raise ValueError(f"{label} négatif : {value!r}")
+    return number
+
+
+def _parse_decimal(value):
+    cleaned = value.replace('$', '').replace(' ', '').replace('\xa0', '')
+    if ',' in cleaned and '.' in cleaned:
+        # 1,234.56 (export US) ou 1.234,56 : le dernier séparateur est la virgule décimale
+        if cleaned.rfind(',') > cleaned.rfind('.'):
+            cleaned = cleaned.replace('.', '').replace(',', '.')
+        else:
+            cleaned = cleaned.replace(',', '')
+    elif THOUSANDS_RE.match(cleaned):
+        # 1,234 (export US sans centimes), les montants ont au plus deux décimales
+        cleaned = cleaned.replace(',', '')
+    else:
+        # 1234,56 (export FR)
+        cleaned = cleaned.replace(',', '.')
+    try:
+        amount = Decimal(cleaned or 0).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"revenus invalides : {value!r}") from None
+    if amount < 0:
+        raise ValueError(f"revenus négatifs : {value!r}")
+    return amount
+
+
+def _parse_row(row, columns, units):
+    """((unité, date), (impressions, clics, revenus)) ou ValueError ; None pour une ligne de total"""
+    raw_date = (row.get(columns['date']) or '').strip()
+    if raw_date.lower() in TOTAL_LABELS:
+        return None
+    day = _parse_date(raw_date)
+    unit = (row.get(columns['ad_unit']) or '').strip()
+    unit_id = units.get(unit.lower())
+    if unit_id is None:
+        raise ValueError(f"unité publicitaire inconnue : {unit!r}")
+    impressions = _parse_int(row.get(columns['impressions']) or '', 'impressions')
+    clicks = _parse_int(row.get(columns['clicks']) or '', 'clics')
+    if clicks > impressions:
+        raise ValueError(f"plus de clics ({clicks}) que d'impressions ({impressions})")
+    revenue = _parse_decimal(row.get(columns['revenue']) or '') if 'revenue' in columns else Decimal('0.00')
+    return (unit_id, day), (impressions, clicks, revenue)
+
+
+def _write_batch(batch):
+    keys = list(batch)
+    impressions, clicks, revenues = zip(*batch.values())
+    # CTR calculé colonne par colonne pour tout le lot
+    ctrs = list(map(compute_ctr, clicks, impressions))
+    objects = [
+        AdPerformance(ad_unit_id=unit_id, date=day, impressions=impressions[i], clicks=clicks[i],
+                      ctr=ctrs[i], revenue=revenues[i])
+        for i, (unit_id, day) in enumerate(keys)
+    ]
+    with _atomic():
+        AdPerformance.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=['ad_unit', 'date'],
+            update_fields=['impressions', 'clicks', 'ctr', 'revenue'],
+        )
+
+
+def import_csv(lines, batch_size=None, dry_run=False, delimiter=','):
+    """
+    Importe un export CSV (itérable de lignes). Les lignes invalides sont
+    ignorées et signalées ; pour un même (unité, date), la dernière ligne
+    l'emporte. Les rapports des périodes importées sont ensuite recalculés.
+    """
+    batch_size = batch_size or _batch_size()
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    columns = _header_map(reader.fieldnames or [])
+    units = _unit_lookup()
+    result = ImportResult()
+    batch = {}
+
+    def flush():
+        if batch and not dry_run:
+            _write_batch(batch)
+        result.rows += len(batch)
+        batch.clear()
+
+    for row in reader:
+        try:
+            parsed = _parse_row(row, columns, units)
+        except ValueError as error:
+            result.errors.append((reader.line_num, str(error)))
+            continue
+        if parsed is None:
+            continue
+        key, values = parsed
+        # Un doublon du lot en cours le remplace sans compter comme une nouvelle ligne
+        if key not in batch and len(batch) >= batch_size:
+            flush()
+        batch[key] = values
+        day = key[1]
+        result.first_date = min(result.first_date or day, day)
+        result.last_date = max(result.last_date or day, day)
+    flush()
+
+    if result.first_date and not dry_run:
+        refresh_rollups(result.first_date, result.last_date)
+    return result
+
+
+def _period_bounds(period, start, end):
+    """Premier et dernier jour des périodes couvrant [start, end]"""
+    if period == 'week':
+        return start - timedelta(days=start.weekday()), end + timedelta(days=6 - end.weekday())
+    next_month = (end.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start.replace(day=1), next_month - timedelta(days=1)
+
+
+def refresh_rollups(start, end):
+    """Recalcule les agrégats des semaines et mois couvrant [start, end]. Retourne le nombre d'agrégats écrits."""
+    # Positions lues à part : les unités et les performances peuvent être dans deux bases
+    positions = dict(AdUnit.objects.values_list('pk', 'position'))
+    written = 0
+    with _atomic():
+        for period, trunc in PERIODS:
+            first, last = _period_bounds(period, start, end)
+            rows = (
+                AdPerformance.objects.filter(date__range=(first, last))
+                .annotate(period_start=trunc('date'))
+                .values_list('period_start', 'ad_unit_id')
+                .annotate(Sum('impressions'), Sum('clicks'), Sum('revenue'))
+                .order_by()
+            )
+            totals = defaultdict(lambda: [0, 0, Decimal('0.00')])
+            for period_start, unit_id, impressions, clicks, revenue in rows:
+                total = totals[period_start, positions.get(unit_id)]
+                total[0] += impressions
+                total[1] += clicks
+                total[2] += revenue
+            rollups = [
+                AdPerformanceRollup(
+                    period=period,
+                    period_start=period_start,
+                    position=position,
+                    impressions=impressions,
+                    clicks=clicks,
+                    ctr=compute_ctr(clicks, impressions),
+                    revenue=revenue,
+                )
+                for (period_start, position), (impressions, clicks, revenue) in totals.items()
+                if position is not None
+            ]
+            AdPerformanceRollup.objects.filter(period=period, period_start__range=(first, last)).delete()
+            AdPerformanceRollup.objects.bulk_create(rollups)
+            written += len(rollups)
+    return written
+
+
+def rebuild_rollups():
+    """Recalcule tous les agrégats (ex. après un changement de position d'une unité)"""
+    bounds = AdPerformance.objects.aggregate(first=Min('date'), last=Max('date'))
+    with _atomic():
+        AdPerformanceRollup.objects.all().delete()
+        if bounds['first'] is None:
+            return 0
+        return refresh_rollups(bounds['first'], bounds['last'])
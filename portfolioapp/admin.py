@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Sum
 from django.utils.html import format_html
 from . models import *
 
@@ -26,11 +27,7 @@ class ProjectAdmin(admin.ModelAdmin):
     list_filter = ['category', 'status', 'featured', 'created_at', 'tags']
     search_fields = ['title', 'description', 'technologies']
     filter_horizontal = ['tags']
-    readonly_fields = ['views_count', 'created_at', 'updated_at']
-    
-    def likes_count(self, obj):
-        return obj.likes.count()
-    likes_count.short_description = 'Likes'
+    readonly_fields = ['views_count', 'likes_count', 'comments_count', 'created_at', 'updated_at']
 
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
@@ -80,6 +77,7 @@ class ProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'full_name', 'location', 'get_education_level']
     search_fields = ['user__username', 'full_name', 'location']
     list_filter = ['education_level', 'sex', 'civil_status', 'country']
+    readonly_fields = ['unread_notifications_count']
     
     def get_education_level(self, obj):
         if obj.education_level:
@@ -154,6 +152,17 @@ class AdPerformanceAdmin(admin.ModelAdmin):
     search_fields = ['ad_unit__name']
     readonly_fields = ['created_at', 'ctr_display']
     date_hierarchy = 'date'
+    # Pas de jointure vers AdUnit : les deux tables peuvent être dans des bases différentes (routers.py)
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('ad_unit')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        unit_ids = AdUnit.objects.filter(name__icontains=search_term).values_list('pk', flat=True)
+        return queryset.filter(ad_unit_id__in=list(unit_ids)), False
     
     def ctr_display(self, obj):
         return f"{obj.ctr:.2f}%"
@@ -164,6 +173,62 @@ class AdPerformanceAdmin(admin.ModelAdmin):
         obj.calculate_ctr()
         super().save_model(request, obj, form, change)
 
+@admin.register(AdPerformanceRollup)
+class AdPerformanceRollupAdmin(admin.ModelAdmin):
+    """Rapports hebdomadaires/mensuels (import_ad_performance), avec graphique des revenus"""
+    change_list_template = 'admin/portfolioapp/adperformancerollup/change_list.html'
+    list_display = ['period_start', 'period', 'position', 'impressions', 'clicks', 'ctr_display', 'revenue']
+    list_filter = ['period', 'position']
+    date_hierarchy = 'period_start'
+    chart_periods = 26
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def ctr_display(self, obj):
+        return f"{obj.ctr:.2f}%"
+    ctr_display.short_description = 'CTR'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            # Revenus par période, toutes positions filtrées confondues
+            series = list(
+                changelist.queryset.order_by().values('period_start')
+                .annotate(total_revenue=Sum('revenue'), total_impressions=Sum('impressions'))
+                .order_by('-period_start')[:self.chart_periods]
+            )[::-1]
+            response.context_data['chart'] = series
+            response.context_data['chart_max'] = max((row['total_revenue'] for row in series), default=0)
+        return response
+
+# ===== ADMIN STATISTIQUES DE FRÉQUENTATION =====
+# Agrégats en lecture seule (les événements bruts ne sont pas exposés)
+
+class ViewRollupAdmin(admin.ModelAdmin):
+    list_filter = ['kind', 'device']
+    search_fields = ['referrer']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(HourlyViewRollup)
+class HourlyViewRollupAdmin(ViewRollupAdmin):
+    list_display = ['hour', 'kind', 'object_id', 'device', 'referrer', 'views']
+    date_hierarchy = 'hour'
+
+@admin.register(DailyViewRollup)
+class DailyViewRollupAdmin(ViewRollupAdmin):
+    list_display = ['day', 'kind', 'object_id', 'device', 'referrer', 'views']
+    date_hierarchy = 'day'
+
 # Enregistrement des autres modèles avec configuration de base
 admin.site.register(Skill)
 admin.site.register(Category)
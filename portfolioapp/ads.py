@@ -0,0 +1,135 @@
+"""
+Index compilé des emplacements publicitaires AdSense.
+
+Les unités actives sont chargées une seule fois et rangées par (position,
+appareil), avec leurs filtres de pages compilés en expressions régulières et
+leur code HTML déjà généré. L'index est conservé en mémoire dans chaque
+worker et reconstruit lorsque le tag de cache "ad-placements" change (toute
+sauvegarde ou suppression d'AdUnit/AdSenseConfig, voir models.py) :
+les template tags publicitaires ne font plus aucune requête SQL.
+"""
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from . import metrics
+from .caching import tag_versions
+from .devices import DESKTOP, MOBILE, device_type
+from .models import AdSenseConfig, AdUnit
+
+TAG = 'ad-placements'
+
+
+def compile_pages(pages):
+    """Compile une liste d'URLs séparées par des virgules (correspondance par sous-chaîne)"""
+    if not pages:
+        return None
+    return re.compile('|'.join(re.escape(page.strip()) for page in pages.split(',')))
+
+
+@dataclass(frozen=True)
+class Placement:
+    position: str
+    html: str
+    custom_css: str
+    show_on_mobile: bool
+    show_on_desktop: bool
+    include: re.Pattern = None
+    exclude: re.Pattern = None
+
+    def matches(self, path):
+        if self.exclude is not None and self.exclude.search(path):
+            return False
+        if self.include is not None:
+            return self.include.search(path) is not None
+        return True
+
+    def shows_on(self, device):
+        return self.show_on_mobile if device == MOBILE else self.show_on_desktop
+
+
+@dataclass(frozen=True)
+class PlacementIndex:
+    config: AdSenseConfig
+    has_auto_ads: bool = False
+    # {(position, appareil): [Placement, ...]} dans l'ordre des unités
+    by_device: dict = field(default_factory=dict)
+    # Première unité active de chaque position, tous appareils confondus
+    first_by_position: dict = field(default_factory=dict)
+
+    def unit_for(self, position, device, path):
+        for placement in self.by_device.get((position, device), ()):
+            if placement.matches(path):
+                return placement
+        return None
+
+
+def build_index():
+    """Construit l'index à partir de la base (deux requêtes)"""
+    # Pas de get_or_create ici : la création invaliderait l'index en cours de construction
+    config = AdSenseConfig.objects.filter(id=1).first() or AdSenseConfig(
+        id=1, publisher_id='ca-pub-0000000000000000', is_active=False, test_mode=True,
+    )
+    by_device = defaultdict(list)
+    first_by_position = {}
+    has_auto_ads = False
+    for unit in AdUnit.objects.filter(is_active=True):
+        placement = Placement(
+            position=unit.position,
+            html=unit.get_ad_code(config),
+            custom_css=unit.custom_css,
+            show_on_mobile=unit.show_on_mobile,
+            show_on_desktop=unit.show_on_desktop,
+            include=compile_pages(unit.pages_to_show),
+            exclude=compile_pages(unit.pages_to_exclude),
+        )
+        for device in (MOBILE, DESKTOP):
+            if placement.shows_on(device):
+                by_device[(unit.position, device)].append(placement)
+        first_by_position.setdefault(unit.position, placement)
+        has_auto_ads = has_auto_ads or unit.ad_type == 'auto'
+    return PlacementIndex(
+        config=config,
+        has_auto_ads=has_auto_ads,
+        by_device=dict(by_device),
+        first_by_position=first_by_position,
+    )
+
+
+_local = None
+_lock = threading.Lock()
+
+
+def get_index(request=None):
+    """
+    Retourne l'index courant. Une seule lecture de cache (version du tag) par
+    requête : l'index est ensuite mémorisé sur l'objet request.
+    """
+    if request is not None:
+        index = getattr(request, '_ad_placements', None)
+        if index is not None:
+            return index
+    global _local
+    version = tag_versions([TAG])[TAG]
+    local = _local
+    if local is None or local[0] != version:
+        with _lock:
+            if _local is None or _local[0] != version:
+                _local = (version, build_index())
+            local = _local
+    if request is not None:
+        request._ad_placements = local[1]
+    return local[1]
+
+
+def unit_html(request, position):
+    """Code HTML de l'annonce à afficher à cette position pour cette requête ('' si aucune)"""
+    index = get_index(request)
+    if not index.config.is_active:
+        return ''
+    placement = index.unit_for(position, device_type(request), request.path)
+    if placement is None:
+        return ''
+    metrics.AD_RENDERS.inc(position=position, tag='adsense_unit')
+    return placement.html
@@ -0,0 +1,250 @@
+"""
+Statistiques de fréquentation : événements de vue et agrégats.
+
+- `record_view(request, obj)` ajoute une vue (projet, article ou CV) avec le
+  site référent (nom d'hôte seulement) et le type d'appareil. Les événements
+  sont accumulés en mémoire dans chaque worker puis insérés par lots
+  (ANALYTICS_FLUSH_THRESHOLD événements ou ANALYTICS_FLUSH_INTERVAL secondes) ;
+- `rollup()` agrège les événements par heure puis par jour (commande
+  `rollup_view_events`, à planifier). Les dernières heures sont recalculées à
+  chaque passage, ce qui absorbe les événements arrivés en retard ;
+- `prune()` supprime par lots les événements plus anciens que
+  ANALYTICS_EVENT_RETENTION_DAYS, jamais ceux qui ne sont pas encore agrégés.
+
+Les pages et l'admin ne lisent que les agrégats (`traffic_summary()`).
+"""
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .caching import invalidate
+from .devices import device_type
+from .models import DailyViewRollup, HourlyViewRollup, ViewEvent, ViewRollup
+
+logger = logging.getLogger(__name__)
+
+TAG = 'view-rollups'
+# Heures déjà agrégées recalculées à chaque passage (événements encore en tampon)
+LATENESS = timedelta(hours=1)
+
+
+def _flush_interval():
+    return getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 10)
+
+
+def _flush_threshold():
+    return getattr(settings, 'ANALYTICS_FLUSH_THRESHOLD', 200)
+
+
+def _max_buffered():
+    return getattr(settings, 'ANALYTICS_BUFFER_MAX_EVENTS', 10000)
+
+
+def _batch_size():
+    return getattr(settings, 'ANALYTICS_BATCH_SIZE', 1000)
+
+
+class EventBuffer:
+    """Événements en attente d'insertion, partagés par les threads d'un worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+            due = (
+                len(self._events) >= _flush_threshold()
+                or time.monotonic() - self._last_flush >= _flush_interval()
+            )
+        if due:
+            self.flush()
+
+    def drain(self):
+        with self._lock:
+            events, self._events = self._events, []
+            self._last_flush = time.monotonic()
+        return events
+
+    def restore(self, events):
+        """Remet des événements non insérés en tête du tampon (les plus anciens sont abandonnés au-delà de la limite)"""
+        with self._lock:
+            self._events = events + self._events
+            overflow = len(self._events) - _max_buffered()
+            if overflow > 0:
+                logger.warning("Tampon des vues plein, %d événements abandonnés", overflow)
+                del self._events[:overflow]
+
+    def flush(self):
+        """Insère les événements en attente. Retourne le nombre d'événements écrits."""
+        events = self.drain()
+        if not events:
+            return 0
+        try:
+            ViewEvent.objects.bulk_create(events, batch_size=_batch_size())
+        except DatabaseError:
+            logger.exception("Échec de l'insertion des vues, %d événements remis en attente", len(events))
+            self.restore(events)
+            return 0
+        return len(events)
+
+
+buffer = EventBuffer()
+
+
+_recorder = threading.local()
+
+
+@contextmanager
+def recording():
+    """Enregistre les vues faites dans le bloc, pour les rejouer sur une page servie depuis le cache"""
+    recorded = []
+    previous = getattr(_recorder, 'views', None)
+    _recorder.views = recorded
+    try:
+        yield recorded
+    finally:
+        _recorder.views = previous
+
+
+def _referrer(request):
+    host = urlsplit(request.META.get('HTTP_REFERER', '')).hostname or ''
+    return host[:255]
+
+
+def _add(request, kind, object_id):
+    buffer.add(ViewEvent(
+        kind=kind,
+        object_id=object_id,
+        referrer=_referrer(request),
+        device=device_type(request),
+        created_at=timezone.now(),
+    ))
+
+
+def record_view(request, obj):
+    """Ajoute une vue de `obj` (Project, BlogPost ou Resume) pour cette requête"""
+    kind = obj._meta.model_name
+    recorded = getattr(_recorder, 'views', None)
+    if recorded is not None:
+        recorded.append((kind, obj.pk))
+    _add(request, kind, obj.pk)
+
+
+def replay(request, recorded):
+    for kind, object_id in recorded:
+        _add(request, kind, object_id)
+
+
+def flush():
+    return buffer.flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    # Statistiques seulement : en cas d'échec, les événements sont perdus (journalisé par flush)
+    buffer.flush()
+
+
+def _upsert(model, rows, period):
+    objects = [model(**row) for row in rows]
+    model.objects.bulk_create(
+        objects,
+        batch_size=_batch_size(),
+        update_conflicts=True,
+        unique_fields=[period, *ViewRollup.DIMENSIONS],
+        update_fields=['views'],
+    )
+    return len(objects)
+
+
+def rollup():
+    """Agrège les nouveaux événements par heure puis par jour. Retourne (heures, jours) écrits."""
+    latest = HourlyViewRollup.objects.aggregate(latest=Max('hour'))['latest']
+    if latest is not None:
+        since = latest - LATENESS
+    else:
+        since = ViewEvent.objects.aggregate(first=Min('created_at'))['first']
+        if since is None:
+            return 0, 0
+    since = timezone.localtime(since).replace(minute=0, second=0, microsecond=0)
+
+    hourly = (
+        ViewEvent.objects.filter(created_at__gte=since)
+        .annotate(hour=TruncHour('created_at'))
+        .values('hour', *ViewRollup.DIMENSIONS)
+        .annotate(views=Count('id'))
+        .order_by()
+    )
+    first_day = since.replace(hour=0)
+    daily = (
+        HourlyViewRollup.objects.filter(hour__gte=first_day)
+        .annotate(day=TruncDate('hour'))
+        .values('day', *ViewRollup.DIMENSIONS)
+        .annotate(total=Sum('views'))
+        .order_by()
+    )
+    # Agrégats éventuellement dans la base d'activité (routers.py)
+    with transaction.atomic(using=router.db_for_write(HourlyViewRollup)):
+        hours = _upsert(HourlyViewRollup, hourly, 'hour')
+        # Les jours touchés sont recalculés entièrement depuis les agrégats horaires
+        days = _upsert(DailyViewRollup, (
+            {'views': row.pop('total'), **row} for row in daily
+        ), 'day')
+    invalidate(TAG)
+    return hours, days
+
+
+def prune(retention_days=None, batch_size=None):
+    """Supprime par lots les événements expirés et déjà agrégés. Retourne le nombre supprimé."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'ANALYTICS_EVENT_RETENTION_DAYS', 90)
+    batch_size = batch_size or getattr(settings, 'ANALYTICS_DELETE_BATCH_SIZE', 1000)
+    latest = HourlyViewRollup.objects.aggregate(latest=Max('hour'))['latest']
+    if latest is None:
+        return 0
+    cutoff = min(timezone.now() - timedelta(days=retention_days), latest - LATENESS)
+
+    deleted = 0
+    while True:
+        ids = list(
+            ViewEvent.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        # Une transaction courte par lot : les insertions ne sont pas bloquées longtemps
+        deleted += ViewEvent.objects.filter(id__in=ids).delete()[0]
+
+
+def traffic_summary(days=30):
+    """Fréquentation des `days` derniers jours, lue dans les agrégats journaliers"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rollups = DailyViewRollup.objects.filter(day__gte=since).order_by()
+    by_day = dict(rollups.values_list('day').annotate(total=Sum('views')))
+    by_device = dict(rollups.values_list('device').annotate(total=Sum('views')))
+    referrers = list(
+        rollups.exclude(referrer='').values_list('referrer').annotate(total=Sum('views')).order_by('-total')[:5]
+    )
+    return {
+        'days': [(since + timedelta(days=offset), by_day.get(since + timedelta(days=offset), 0))
+                 for offset in range(days)],
+        'total': sum(by_day.values()),
+        'max': max(by_day.values(), default=0),
+        'devices': by_device,
+        'referrers': referrers,
+    }
@@ -0,0 +1,358 @@
+"""
+Benchmark des vues sur un jeu de données volumineux (commande `benchmark_views`).
+
+- `seed()` remplit la base (de test) avec des volumes configurables : projets,
+  commentaires et réponses (répartis de façon inégale, quelques projets très
+  commentés), notifications, likes, articles, témoignages ;
+- `cases()` décrit une requête par route de portfolioapp/urls.py (et une
+  variante connectée des pages principales) ;
+- `run()` exécute chaque cas en process avec django.test.Client : latences
+  p50/p95 sur plusieurs passes, puis une passe instrumentée pour le nombre de
+  requêtes SQL et le pic de mémoire Python (tracemalloc) ;
+- `compare()` signale les régressions entre deux fichiers de résultats.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+
+from . import analytics, counters, profiling, search, site_stats
+from .models import (BlogPost, Category, Comment, Notification, Profile, Project, ProjectLike, Resume, Tag,
+                     Testimonial)
+
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark'
+
+VOLUMES = {
+    'projects': 10_000,
+    'comments': 1_000_000,
+    'notifications': 100_000,
+    'users': 200,
+    'blog_posts': 500,
+}
+
+WORDS = (
+    'django python portfolio projet application web mobile design interface base données '
+    'automatisation gestion intelligence artificielle api rest javascript sqlite analyse rapport'
+).split()
+
+
+@dataclass
+class Dataset:
+    """Objets de référence utilisés pour construire les URL des cas"""
+    user_id: int
+    project_id: int
+    comment_id: int
+    own_comment_id: int
+    other_comment_id: int
+    post_slug: str
+    resume_id: int
+    notification_id: int
+
+
+@dataclass
+class Case:
+    name: str
+    # Chemin, ou fonction(dataset, client) -> chemin appelée avant chaque requête (hors mesure)
+    path: object
+    method: str = 'get'
+    data: dict = field(default_factory=dict)
+    user: bool = False
+
+    @property
+    def key(self):
+        return f"{self.name}:{'user' if self.user else 'anonymous'}"
+
+    def resolve_path(self, dataset, client):
+        return self.path(dataset, client) if callable(self.path) else self.path.format(d=dataset)
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _bulk(model, objects, batch_size):
+    return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def seed(projects=None, comments=None, notifications=None, users=None, blog_posts=None,
+         batch_size=5000, random_seed=42, log=lambda message: None):
+    """Remplit la base. Retourne le Dataset des objets de référence."""
+    volumes = {**VOLUMES, **{name: value for name, value in {
+        'projects': projects, 'comments': comments, 'notifications': notifications,
+        'users': users, 'blog_posts': blog_posts,
+    }.items() if value is not None}}
+    rng = random.Random(random_seed)
+    started = time.perf_counter()
+
+    password = make_password(PASSWORD)
+    # Compte staff : mesure aussi les pages de profilage
+    people = _bulk(User, [User(username=USERNAME, password=password, is_staff=True)] + [
+        User(username=f'visiteur{i}', password=password) for i in range(max(volumes['users'] - 1, 1))
+    ], batch_size)
+    _bulk(Profile, [Profile(user=user) for user in people], batch_size)
+    viewer, user_ids = people[0], [user.pk for user in people]
+
+    categories = _bulk(Category, [Category(name=f'Catégorie {i}') for i in range(12)], batch_size)
+    tags = _bulk(Tag, [Tag(name=f'tag{i}') for i in range(40)], batch_size)
+    project_objects = _bulk(Project, [
+        Project(user=viewer, title=f'Projet {i} {_text(rng, 3)}', description=f'<p>{_text(rng, 80)}</p>',
+                technologies=', '.join(rng.sample(WORDS, 3)), category=rng.choice(categories),
+                featured=i < 6, views_count=rng.randint(0, 5000))
+        for i in range(volumes['projects'])
+    ], batch_size)
+    project_ids = [project.pk for project in project_objects]
+    _bulk(Project.tags.through, [
+        Project.tags.through(project_id=pk, tag_id=tag.pk)
+        for pk in project_ids for tag in rng.sample(tags, 3)
+    ], batch_size)
+    log(f'{len(project_ids)} projets')
+
+    # Répartition inégale : les premiers projets concentrent les commentaires
+    def pick_project():
+        return project_ids[int(rng.random() ** 3 * len(project_ids))]
+
+    top_level = int(volumes['comments'] * 0.8)
+    roots = []
+    for start in range(0, top_level, batch_size):
+        batch = _bulk(Comment, [
+            Comment(project_id=pick_project(), author_id=rng.choice(user_ids), text=_text(rng, 20))
+            for _ in range(min(batch_size, top_level - start))
+        ], batch_size)
+        roots.extend((comment.pk, comment.project_id) for comment in batch)
+    for start in range(0, volumes['comments'] - top_level, batch_size):
+        parents = [roots[int(rng.random() ** 3 * len(roots))] for _ in range(
+            min(batch_size, volumes['comments'] - top_level - start))]
+        _bulk(Comment, [
+            Comment(project_id=project_id, parent_id=parent_id, author_id=rng.choice(user_ids), text=_text(rng, 12))
+            for parent_id, project_id in parents
+        ], batch_size)
+    log(f"{volumes['comments']} commentaires")
+
+    _bulk(ProjectLike, [
+        ProjectLike(user_id=user_id, project_id=project_id)
+        for user_id in user_ids for project_id in set(rng.sample(project_ids, min(20, len(project_ids))))
+    ], batch_size)
+    _bulk(Comment.likes.through, [
+        Comment.likes.through(comment_id=comment_id, user_id=user_id)
+        for comment_id, _ in roots[:2000] for user_id in rng.sample(user_ids, min(3, len(user_ids)))
+    ], batch_size)
+
+    # Un dixième des notifications pour l'utilisateur du benchmark (bulk_create met à jour les compteurs)
+    for start in range(0, volumes['notifications'], batch_size):
+        Notification.objects.bulk_create([
+            Notification(user_id=viewer.pk if i % 10 == 0 else rng.choice(user_ids),
+                         message=_text(rng, 8), link=f'/projets/{pick_project()}/', is_read=rng.random() < 0.5)
+            for i in range(start, min(start + batch_size, volumes['notifications']))
+        ], batch_size=batch_size)
+    log(f"{volumes['notifications']} notifications")
+
+    _bulk(BlogPost, [
+        BlogPost(title=f'Article {i}', slug=f'article-{i}', content=f'<p>{_text(rng, 300)}</p>',
+                 excerpt=_text(rng, 20), views_count=rng.randint(0, 5000))
+        for i in range(volumes['blog_posts'])
+    ], batch_size)
+    _bulk(Testimonial, [
+        Testimonial(name=f'Client {i}', position='Directeur', message=_text(rng, 30), is_featured=i < 3)
+        for i in range(30)
+    ], batch_size)
+    resume = Resume(title='CV')
+    resume.file.save('benchmark-cv.pdf', ContentFile(b'%PDF-1.4\n' + bytes(range(256)) * 512))
+
+    # Les bulk_create n'envoient pas de signaux : compteurs, statistiques et index recalculés
+    call_command('reconcile_engagement_counters', stdout=StringIO())
+    site_stats.reconcile()
+    search.rebuild(Project, BlogPost)
+    log(f'Base remplie en {time.perf_counter() - started:.0f} s')
+    return dataset()
+
+
+def dataset():
+    """Objets de référence d'une base déjà remplie (None si la base est vide)"""
+    viewer = User.objects.filter(username=USERNAME).first()
+    if viewer is None:
+        return None
+    project = Project.objects.order_by('-comments_count').first()
+    comment = Comment.objects.filter(project=project, parent=None).order_by('-replies_count').first()
+    own = Comment.objects.filter(author=viewer, parent=None).order_by('pk').first()
+    other = Comment.objects.exclude(author=viewer).filter(parent=None).order_by('pk').first()
+    return Dataset(
+        user_id=viewer.pk,
+        project_id=project.pk,
+        comment_id=comment.pk,
+        own_comment_id=own.pk,
+        other_comment_id=other.pk,
+        post_slug=BlogPost.objects.order_by('pk').values_list('slug', flat=True).first(),
+        resume_id=Resume.objects.filter(is_active=True).values_list('pk', flat=True).first(),
+        notification_id=Notification.objects.filter(user=viewer).values_list('pk', flat=True).first(),
+    )
+
+
+def _own_comment(dataset, client):
+    comment = Comment.objects.create(project_id=dataset.project_id, author_id=dataset.user_id, text='À supprimer')
+    return f'/comment/{comment.pk}/delete/'
+
+
+def _logged_in(path):
+    def prepare(dataset, client):
+        client.force_login(User.objects.get(pk=dataset.user_id))
+        return path
+    return prepare
+
+
+def _profile_report(dataset, client):
+    found = profiling.reports()
+    if not found:
+        # Premier rapport demandé par le compte staff, quel que soit le client mesuré
+        staff = Client()
+        staff.force_login(User.objects.get(pk=dataset.user_id))
+        staff.get('/about/', {profiling.QUERY_PARAM: '1'})
+        found = profiling.reports()
+    return f"/profiling/{found[-1]['name']}/"
+
+
+def cases():
+    """Une requête par route de portfolioapp/urls.py, plus les pages principales en connecté"""
+    comment = {'text': 'Commentaire du benchmark', 'comment_form': '1'}
+    return [
+        Case('home', '/'),
+        Case('home', '/', user=True),
+        Case('about', '/about/'),
+        Case('contact', '/contact/'),
+        Case('projects', '/projects/'),
+        Case('projects', '/projects/', user=True),
+        Case('project_detail', '/projets/{d.project_id}/'),
+        Case('project_detail', '/projets/{d.project_id}/', user=True),
+        Case('project_detail_en', '/projects/{d.project_id}/'),
+        Case('search_projects', '/search/?search=django+api'),
+        Case('toggle_like', '/project/{d.project_id}/like/', method='post', user=True),
+        Case('add_comment', '/projets/{d.project_id}/comment/', method='post', data=comment, user=True),
+        Case('add_reply', '/comment/{d.comment_id}/reply/', method='post', data=comment, user=True),
+        Case('toggle_like_comment', '/comment/{d.comment_id}/like/', method='post', user=True),
+        Case('delete_comment', _own_comment, method='post', user=True),
+        Case('edit_comment', '/comment/{d.own_comment_id}/edit/', user=True),
+        Case('get_replies', '/comment/{d.comment_id}/replies/'),
+        Case('report_comment', '/comment/{d.other_comment_id}/report/', method='post', user=True),
+        Case('blog', '/blog/'),
+        Case('blog_detail', '/blog/{d.post_slug}/'),
+        Case('testimonials', '/testimonials/'),
+        Case('download_resume', '/download-resume/{d.resume_id}/'),
+        Case('portfolio_stats', '/stats/'),
+        Case('metrics', '/metrics'),
+        Case('cpu_profiles', '/profiling/', user=True),
+        Case('cpu_profile_report', _profile_report, user=True),
+        Case('signup', '/signup/'),
+        Case('profile', '/profile/', user=True),
+        Case('edit_profile', '/profile/edit/', user=True),
+        Case('logout', _logged_in('/logout/'), user=True),
+        Case('unread_notifications', '/unread-notifications/', user=True),
+        Case('view_notifications', '/notifications/', user=True),
+        Case('mark_notification_as_read', '/notification/mark-as-read/{d.notification_id}/', user=True),
+        Case('mark_all_notifications_as_read', '/mark-all-notifications-as-read/', user=True),
+        Case('privacy_policy', '/privacy-policy/'),
+        Case('terms_of_service', '/terms-of-service/'),
+    ]
+
+
+def uncovered_routes(case_list, urlconf='portfolioapp.urls'):
+    """Noms d'URL de `urlconf` sans cas de benchmark"""
+    names = {pattern.name for pattern in get_resolver(urlconf).url_patterns if pattern.name}
+    return sorted(names - {case.name for case in case_list})
+
+
+def _request(client, case, dataset):
+    path = case.resolve_path(dataset, client)
+    # Cache vidé avant chaque requête : on mesure le rendu, pas le cache de pages
+    cache.clear()
+    started = time.perf_counter()
+    response = getattr(client, case.method)(path, case.data)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    elapsed = time.perf_counter() - started
+    response.close()
+    return response.status_code, elapsed
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def run(case_list, dataset, repeat=20, progress=lambda key, result: None):
+    """Mesure chaque cas. Retourne {clé du cas: résultats}."""
+    viewer = User.objects.get(pk=dataset.user_id)
+    results = {}
+    for case in case_list:
+        client = Client(raise_request_exception=False)
+        if case.user:
+            client.force_login(viewer)
+        _request(client, case, dataset)  # passe de chauffe
+
+        timings = []
+        for _ in range(repeat):
+            status, elapsed = _request(client, case, dataset)
+            timings.append(elapsed * 1000)
+
+        # Passe instrumentée à part : tracemalloc et la capture SQL faussent les latences
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connections['default']) as queries:
+                status, _ = _request(client, case, dataset)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # Écritures différées faites pendant la mesure, pas à la fin du processus (base déjà détruite)
+        counters.flush()
+        analytics.flush()
+
+        results[case.key] = {
+            'url': case.path if isinstance(case.path, str) else case.path.__name__,
+            'method': case.method.upper(),
+            'status': status,
+            'p50_ms': round(_percentile(timings, 50), 2),
+            'p95_ms': round(_percentile(timings, 95), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'queries': len(queries),
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+        progress(case.key, results[case.key])
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=2.0):
+    """
+    Régressions de `current` par rapport à `baseline` (dictionnaires "results") :
+    p95 ou pic de mémoire en hausse de plus de `threshold` (et de plus de
+    `min_delta_ms` pour les latences, sous lequel la mesure n'est que du bruit),
+    requêtes SQL en plus, ou réponse devenue une erreur.
+    """
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if now['status'] >= 500 > before['status']:
+            regressions.append(f"{key}: statut {before['status']} → {now['status']}")
+        if now['queries'] > before['queries']:
+            regressions.append(f"{key}: requêtes SQL {before['queries']} → {now['queries']}")
+        if (now['p95_ms'] > before['p95_ms'] * (1 + threshold)
+                and now['p95_ms'] - before['p95_ms'] >= min_delta_ms):
+            regressions.append(f"{key}: p95 {before['p95_ms']} ms → {now['p95_ms']} ms")
+        if now['peak_memory_kib'] > before['peak_memory_kib'] * (1 + threshold):
+            regressions.append(
+                f"{key}: mémoire {before['peak_memory_kib']} Kio → {now['peak_memory_kib']} Kio"
+            )
+    return regressions
@@ -0,0 +1,70 @@
+"""
+Cache versionné par tags.
+
+Chaque valeur mise en cache dépend d'un ou plusieurs tags (ex. "project-list",
+"project:42"). Chaque tag possède un numéro de version stocké dans le cache ;
+la clé réelle d'une valeur inclut les versions de ses tags. Invalider un tag
+revient à changer sa version : les anciennes entrées ne sont plus jamais lues
+et expirent d'elles-mêmes.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+TAG_PREFIX = 'tag-version:'
+_MISSING = object()
+
+
+def _tag_key(tag):
+    return f'{TAG_PREFIX}{tag}'
+
+
+def _new_version():
+    # Basée sur l'horloge pour ne pas retomber sur une ancienne version après éviction
+    return time.time_ns()
+
+
+def tag_versions(tags):
+    """Retourne les versions courantes des tags, en initialisant celles qui manquent"""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate(*tags):
+    """Invalide toutes les valeurs dépendant d'au moins un des tags"""
+    if tags:
+        cache.set_many({_tag_key(tag): _new_version() for tag in tags}, None)
+
+
+def versioned_key(key, tags):
+    """Construit la clé réelle d'une valeur à partir des versions de ses tags"""
+    versions = tag_versions(tags)
+    digest = hashlib.md5(
+        '|'.join(f'{tag}={versions[tag]}' for tag in sorted(versions)).encode()
+    ).hexdigest()
+    return f'{key}:{digest}'
+
+
+def get_or_set(key, tags, compute, timeout=None):
+    """
+    Retourne la valeur en cache pour `key`, ou la calcule avec `compute()`.
+    La valeur est invalidée dès qu'un des `tags` est invalidé.
+    """
+    full_key = versioned_key(key, tags)
+    # La valeur est enveloppée dans un tuple pour pouvoir mettre None en cache
+    cached = cache.get(full_key, _MISSING)
+    if cached is not _MISSING:
+        metrics.FRAGMENT_CACHE.inc(result='hit')
+        return cached[0]
+    metrics.FRAGMENT_CACHE.inc(result='miss')
+    value = compute()
+    cache.set(full_key, (value,), timeout)
+    return value
@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from .likes import liked_ids
+from .models import Comment
+
+
+def comment_queryset():
+    """Commentaires avec auteur et profil (compteurs de likes/réponses stockés sur le commentaire)"""
+    return Comment.objects.select_related('author__profile')
+
+
+def _attach(comments, liked_ids, children_by_parent):
+    for comment in comments:
+        comment.is_liked = comment.pk in liked_ids
+        comment.thread_replies = children_by_parent.get(comment.pk, [])
+
+
+def load_comment_thread(project, viewer=None):
+    """
+    Charge tous les commentaires d'un projet en deux requêtes au plus (commentaires
+    + likes de l'utilisateur, voir likes.py) et reconstitue l'arbre des réponses.
+    Retourne (commentaires de premier niveau, nombre total de commentaires).
+    """
+    comments = list(comment_queryset().filter(project=project).order_by('-created_at'))
+    liked = liked_ids(viewer).comments
+
+    children_by_parent = defaultdict(list)
+    for comment in reversed(comments):
+        # Réponses dans l'ordre chronologique
+        children_by_parent[comment.parent_id].append(comment)
+    _attach(comments, liked, children_by_parent)
+
+    top_level = [comment for comment in comments if comment.parent_id is None]
+    return top_level, len(comments)
+
+
+def load_replies(comment, viewer=None):
+    """
+    Charge les réponses (non supprimées) d'un commentaire et leurs sous-réponses,
+    niveau par niveau : le nombre de requêtes dépend de la profondeur, pas du volume.
+    """
+    replies = list(comment_queryset().filter(parent=comment, is_deleted=False).order_by('created_at'))
+    liked = liked_ids(viewer).comments
+    level = replies
+    while level:
+        parent_ids = [reply.pk for reply in level]
+        children = list(comment_queryset().filter(parent_id__in=parent_ids).order_by('created_at'))
+        children_by_parent = defaultdict(list)
+        for child in children:
+            children_by_parent[child.parent_id].append(child)
+        _attach(level, liked, children_by_parent)
+        level = children
+    return replies
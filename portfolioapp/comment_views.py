@@ -3,35 +3,40 @@ from django.http import JsonResponse
 from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from django.db import transaction
 from django.db.models import Count
 
 from .models import Project, Comment, Notification
 from .forms import CommentForm, ReplyForm
+from .comment_threads import load_replies
+from .conditional import content_etag
 
 @login_required
 def toggle_like_comment(request, comment_id):
     """Vue pour liker/unliker un commentaire"""
     comment = get_object_or_404(Comment, id=comment_id)
     
-    if request.user in comment.likes.all():
-        comment.likes.remove(request.user)
-        liked = False
-    else:
-        comment.likes.add(request.user)
-        liked = True
-        
-        # Créer une notification pour l'auteur du commentaire
-        if comment.author != request.user:
-            Notification.objects.create(
-                user=comment.author,
-                message=f"{request.user.username} a aimé votre commentaire",
-                link=f"{reverse('project_detail', args=[comment.project.id])}#comment-{comment.id}"
-            )
+    with transaction.atomic():
+        # Le compteur du commentaire est mis à jour par les signaux, dans cette transaction
+        liked = not comment.likes.filter(pk=request.user.pk).exists()
+        if liked:
+            comment.likes.add(request.user)
+        else:
+            comment.likes.remove(request.user)
+        comment.refresh_from_db(fields=['likes_count'])
+    
+    # Créer une notification pour l'auteur du commentaire
+    if liked and comment.author_id != request.user.pk:
+        Notification.objects.create(
+            user_id=comment.author_id,
+            message=f"{request.user.username} a aimé votre commentaire",
+            link=f"{reverse('project_detail', args=[comment.project_id])}#comment-{comment.id}"
+        )
     
     return JsonResponse({
         'success': True,
         'liked': liked,
-        'likes_count': comment.likes.count()
+        'likes_count': comment.likes_count
     })
 
 @login_required
@@ -94,10 +99,11 @@ def edit_comment(request, comment_id):
         'comment': comment
     })
 
+@content_etag
 def get_replies(request, comment_id):
     """Récupère les réponses à un commentaire"""
     comment = get_object_or_404(Comment, id=comment_id)
-    replies = comment.get_replies()
+    replies = load_replies(comment, request.user)
     
     replies_html = ''
     for reply in replies:
@@ -110,7 +116,7 @@ def get_replies(request, comment_id):
     return JsonResponse({
         'success': True,
         'replies_html': replies_html,
-        'replies_count': replies.count()
+        'replies_count': len(replies)
     })
 
 @login_required
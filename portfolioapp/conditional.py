@@ -0,0 +1,126 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified, réponses 304).
+
+Pages HTML : `conditional_view(state, tags)` calcule les validateurs avant
+tout rendu, à partir d'une seule requête légère (`state`, ex. Max(updated_at)
+et quelques compteurs) et des versions des tags de cache dont dépend le
+gabarit (menus, statistiques, publicités). Les pages des utilisateurs
+connectés incluent aussi l'utilisateur et son nombre de notifications non lues
+dans l'ETag, et n'ont pas de Last-Modified.
+
+Endpoints JSON : `content_etag` ajoute un ETag calculé sur le contenu, ce qui
+évite le transfert quand un client qui interroge régulièrement l'endpoint a
+déjà la même réponse.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.views.decorators.http import condition
+
+from .caching import tag_versions
+from .devices import device_type
+from .models import BlogPost, Comment, PortfolioStats, Profile, Project
+from .page_cache import BASE_TAGS
+
+
+def _validators(request, state, tags, args, kwargs):
+    """(etag, last_modified) mémorisés sur la requête : condition() appelle les deux fonctions"""
+    cached = getattr(request, '_conditional_validators', None)
+    if cached is not None:
+        return cached
+
+    values = state(*args, **kwargs)
+    if values is None:
+        # Objet introuvable : la vue répondra 404 sans validateurs
+        request._conditional_validators = (None, None)
+        return request._conditional_validators
+
+    versions = tag_versions([*BASE_TAGS, *tags])
+    parts = [f'{key}={values[key]}' for key in sorted(values)]
+    parts += [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+    parts += [translation.get_language() or '', device_type(request)]
+
+    last_modified = None
+    if request.user.is_authenticated:
+        parts += [f'user={request.user.pk}', f'unread={Profile.get_unread_count(request.user)}']
+    else:
+        # Les versions de tags sont des horodatages (ns) : ils comptent comme modifications
+        dates = [value for value in values.values() if isinstance(value, datetime)]
+        dates += [datetime.fromtimestamp(version / 1e9, tz=timezone.utc) for version in versions.values()]
+        last_modified = max(dates)
+
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    request._conditional_validators = (etag, last_modified)
+    return request._conditional_validators
+
+
+def _per_project(queryset, field, aggregate):
+    return Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(value=aggregate).values('value'),
+    )
+
+
+def project_state(pk):
+    """Projet, fil de commentaires (dates, likes) et compteurs stockés du projet, en une requête"""
+    return Project.objects.filter(pk=pk).annotate(
+        comments_updated=_per_project(Comment.objects.all(), 'project', Max('updated_at')),
+        comment_likes=_per_project(Comment.objects.all(), 'project', Sum('likes_count')),
+    ).values('updated_at', 'comments_updated', 'comments_count', 'comment_likes', 'likes_count').first()
+
+
+def projects_state(*args, **kwargs):
+    return Project.objects.aggregate(updated=Max('updated_at'), total=Count('pk'))
+
+
+def published_posts_state(*args, **kwargs):
+    return BlogPost.objects.filter(is_published=True).aggregate(updated=Max('updated_at'), total=Count('pk'))
+
+
+def stats_state(*args, **kwargs):
+    return PortfolioStats.objects.filter(pk=1).values('last_updated').first() or {}
+
+
+def conditional_view(state, tags=(), on_not_modified=None):
+    """
+    Décorateur de vue. `state(*args, **kwargs)` reçoit les arguments de l'URL et
+    retourne un dict de valeurs résumant le contenu (None si l'objet n'existe pas).
+    `on_not_modified(request, *args, **kwargs)` est appelé pour un GET répondu
+    par un 304, que la vue ne voit pas (ex. compter la visite).
+    """
+    def decorator(view):
+        def etag_func(request, *args, **kwargs):
+            return _validators(request, state, tags, args, kwargs)[0]
+
+        def last_modified_func(request, *args, **kwargs):
+            return _validators(request, state, tags, args, kwargs)[1]
+
+        conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+        if on_not_modified is None:
+            return conditional
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.status_code == 304 and request.method == 'GET':
+                on_not_modified(request, *args, **kwargs)
+            return response
+        return wrapper
+    return decorator
+
+
+def content_etag(view):
+    """ETag sur le contenu de la réponse (endpoints JSON interrogés régulièrement)"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.streaming:
+            return response
+        set_response_etag(response)
+        # Toujours revalider : la réponse dépend de l'utilisateur et change souvent
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+    return wrapper
@@ -1,44 +1,67 @@
-from .models import Category, Tag, PortfolioStats, Resume, Notification
+from django.conf import settings
+from django.db import DatabaseError
 from django.db.models import Count
+from django.utils.functional import SimpleLazyObject
 
-def global_context(request):
-    """
-    Context processor pour fournir des données globales à tous les templates
-    """
+from . import site_stats
+from .caching import get_or_set
+from .models import Category, Tag, Resume, Profile
+
+
+def _cached(key, tags, compute):
+    """Valeur paresseuse : rien n'est calculé tant que le template ne l'utilise pas"""
+    timeout = getattr(settings, 'GLOBAL_CONTEXT_CACHE_TIMEOUT', 300)
+    return SimpleLazyObject(lambda: get_or_set(key, tags, compute, timeout))
+
+
+def _categories():
     # Catégories avec nombre de projets
-    categories = Category.objects.annotate(
+    return list(Category.objects.annotate(
         project_count=Count('project')
-    ).filter(project_count__gt=0)
-    
+    ).filter(project_count__gt=0))
+
+
+def _popular_tags():
     # Tags populaires
-    popular_tags = Tag.objects.annotate(
+    return list(Tag.objects.annotate(
         project_count=Count('project')
-    ).filter(project_count__gt=0).order_by('-project_count')[:10]
-    
+    ).filter(project_count__gt=0).order_by('-project_count')[:10])
+
+
+def _stats():
     # Statistiques du portfolio
     try:
-        stats = PortfolioStats.objects.first()
-        if not stats:
-            stats = PortfolioStats.objects.create()
-    except:
+        stats = site_stats.get_stats()
+    except DatabaseError:
         stats = None
-    
+    return stats
+
+
+def _active_resumes():
     # CV actifs
-    active_resumes = Resume.objects.filter(is_active=True)
-    
+    return list(Resume.objects.filter(is_active=True))
+
+
+def global_context(request):
+    """
+    Context processor pour fournir des données globales à tous les templates.
+    Les valeurs sont paresseuses et mises en cache ; les signaux des modèles
+    concernés invalident le cache (voir CACHE_TAGS dans models.py).
+    """
     return {
-        'global_categories': categories,
-        'global_popular_tags': popular_tags,
-        'global_stats': stats,
-        'global_resumes': active_resumes,
+        'global_categories': _cached('global:categories', ['category-list', 'project-list'], _categories),
+        'global_popular_tags': _cached('global:popular-tags', ['tag-list', 'project-list'], _popular_tags),
+        'global_stats': _cached('global:stats', ['portfolio-stats'], _stats),
+        'global_resumes': _cached('global:resumes', ['resume-list'], _active_resumes),
     }
 
 def unread_notifications_count(request):
     """
     Context processor pour le nombre de notifications non lues
+    (compteur stocké sur le profil, voir Profile.get_unread_count)
     """
     if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+        unread_count = Profile.get_unread_count(request.user)
     else:
         unread_count = 0
     
@@ -0,0 +1,237 @@
+"""
+Compteurs write-behind pour les vues et téléchargements.
+
+Les incréments sont accumulés en mémoire dans chaque worker, puis écrits en
+base par lots d'UPDATE atomiques (`F('champ') + n`). Un flush a lieu lorsque
+le tampon dépasse COUNTER_FLUSH_THRESHOLD clés ou lorsque
+COUNTER_FLUSH_INTERVAL secondes se sont écoulées depuis le dernier flush ;
+un minuteur le déclenche aussi dans un worker qui ne reçoit plus de requêtes.
+
+Garanties :
+- un flush qui échoue remet ses incréments dans le tampon (rien n'est perdu
+  ni compté deux fois, la transaction étant annulée) ;
+- à l'arrêt normal du worker (fin de l'interpréteur), le tampon est flushé,
+  ou écrit dans le répertoire COUNTER_SPOOL_DIR si la base est indisponible ;
+- la commande `flush_counters` rejoue les fichiers du spool (elle ne peut
+  pas atteindre les tampons des workers).
+
+Limite : un worker tué sans arrêt normal (SIGKILL, timeout de gunicorn, OOM)
+perd son tampon, soit au plus COUNTER_FLUSH_INTERVAL secondes ou
+COUNTER_FLUSH_THRESHOLD objets d'incréments. Les compteurs sont des
+statistiques : cette perte est acceptée plutôt qu'une écriture par vue.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Envoyé à chaque flush, dans sa transaction, avec `deltas` : {(label, champ): {pk: n}}
+counters_flushed = Signal()
+
+
+def _flush_interval():
+    return getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+
+
+def _flush_threshold():
+    return getattr(settings, 'COUNTER_FLUSH_THRESHOLD', 100)
+
+
+def _spool_dir():
+    return Path(getattr(settings, 'COUNTER_SPOOL_DIR', Path(settings.BASE_DIR) / 'var' / 'counters'))
+
+
+class CounterBuffer:
+    """Tampon des incréments en attente, partagé par les threads d'un worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, label, field, pk, amount=1):
+        with self._lock:
+            self._pending[(label, field, pk)] += amount
+            due = (
+                len(self._pending) >= _flush_threshold()
+                or time.monotonic() - self._last_flush >= _flush_interval()
+            )
+            if not due:
+                self._schedule()
+        if due:
+            self.flush()
+
+    def _schedule(self):
+        # Appelé avec le verrou : un seul minuteur en attente par tampon
+        if self._timer is None:
+            self._timer = threading.Timer(_flush_interval(), self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            # Un flush échoué reprogramme le minuteur (restore)
+            self.flush()
+        finally:
+            # Connexions propres à ce thread
+            connections.close_all()
+
+    def pending(self, label, field, pk):
+        """Incréments pas encore écrits en base pour un objet"""
+        with self._lock:
+            return self._pending.get((label, field, pk), 0)
+
+    def drain(self):
+        """Vide le tampon de façon atomique et retourne son contenu"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return pending
+
+    def restore(self, pending):
+        """Remet des incréments non écrits dans le tampon"""
+        with self._lock:
+            for key, amount in pending.items():
+                self._pending[key] += amount
+            if self._pending:
+                self._schedule()
+
+    def flush(self):
+        """Écrit les incréments en attente. Retourne le nombre d'objets mis à jour."""
+        pending = self.drain()
+        if not pending:
+            return 0
+        try:
+            apply_increments(pending)
+        except DatabaseError:
+            logger.exception("Échec du flush des compteurs, %d incréments remis en attente", len(pending))
+            self.restore(pending)
+            return 0
+        return len(pending)
+
+    def spool(self):
+        """Écrit le tampon dans un fichier du spool (utilisé à l'arrêt si la base échoue)"""
+        pending = self.drain()
+        if not pending:
+            return None
+        spool_dir = _spool_dir()
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        path = spool_dir / f"{os.getpid()}-{uuid.uuid4().hex}.json"
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps([[label, field, pk, amount] for (label, field, pk), amount in pending.items()]))
+        os.replace(tmp_path, path)
+        return path
+
+
+def apply_increments(pending):
+    """
+    Applique les incréments dans une seule transaction. Les objets ayant le même
+    delta sont regroupés dans un même UPDATE ... SET champ = champ + n.
+    """
+    grouped = defaultdict(lambda: defaultdict(list))
+    deltas = defaultdict(dict)
+    for (label, field, pk), amount in pending.items():
+        if amount:
+            grouped[(label, field)][amount].append(pk)
+            deltas[(label, field)][pk] = amount
+
+    with transaction.atomic():
+        for (label, field), by_amount in grouped.items():
+            model = apps.get_model(label)
+            for amount, pks in by_amount.items():
+                model.objects.filter(pk__in=pks).update(**{field: F(field) + amount})
+        if deltas:
+            # Dans la transaction : les agrégats dérivés (site_stats) sont écrits
+            # avec les compteurs, ou remis en attente avec eux si le flush échoue
+            counters_flushed.send(sender=CounterBuffer, deltas=dict(deltas))
+
+
+def replay_spool():
+    """Rejoue puis supprime les fichiers du spool. Retourne le nombre de fichiers traités."""
+    spool_dir = _spool_dir()
+    if not spool_dir.exists():
+        return 0
+    replayed = 0
+    for path in sorted(spool_dir.glob('*.json')):
+        pending = defaultdict(int)
+        for label, field, pk, amount in json.loads(path.read_text()):
+            pending[(label, field, pk)] += amount
+        # Le fichier n'est supprimé qu'après un commit réussi
+        apply_increments(pending)
+        path.unlink()
+        replayed += 1
+    return replayed
+
+
+buffer = CounterBuffer()
+
+
+_recorder = threading.local()
+
+
+@contextmanager
+def recording():
+    """
+    Enregistre les incréments faits dans le bloc, pour pouvoir les rejouer
+    (ex. une page servie depuis le cache compte quand même une vue).
+    """
+    recorded = []
+    previous = getattr(_recorder, 'increments', None)
+    _recorder.increments = recorded
+    try:
+        yield recorded
+    finally:
+        _recorder.increments = previous
+
+
+def replay(recorded):
+    for label, field, pk, amount in recorded:
+        buffer.add(label, field, pk, amount)
+
+
+def increment(instance, field, amount=1):
+    """
+    Incrémente un compteur sans écriture immédiate en base. La valeur de
+    l'instance est aussi mise à jour pour que la page affiche le bon total.
+    """
+    setattr(instance, field, getattr(instance, field) + amount)
+    recorded = getattr(_recorder, 'increments', None)
+    if recorded is not None:
+        recorded.append((instance._meta.label, field, instance.pk, amount))
+    buffer.add(instance._meta.label, field, instance.pk, amount)
+
+
+def flush():
+    return buffer.flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        buffer.flush()
+    finally:
+        if len(buffer):
+            buffer.spool()
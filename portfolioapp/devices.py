@@ -0,0 +1,15 @@
+"""Détection du type d'appareil à partir du User-Agent, mémorisée sur la requête"""
+
+MOBILE = 'mobile'
+DESKTOP = 'desktop'
+MOBILE_KEYWORDS = ('mobile', 'android', 'iphone', 'ipad')
+
+
+def device_type(request):
+    """Retourne MOBILE ou DESKTOP ; le User-Agent n'est analysé qu'une fois par requête"""
+    device = getattr(request, '_device_type', None)
+    if device is None:
+        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
+        device = MOBILE if any(keyword in user_agent for keyword in MOBILE_KEYWORDS) else DESKTOP
+        request._device_type = device
+    return device
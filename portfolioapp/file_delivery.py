@@ -0,0 +1,166 @@
+"""
+Envoi de fichiers (CV, pièces jointes) en streaming.
+
+- lecture du disque par blocs via FileResponse (jamais de fichier entier en mémoire) ;
+- requêtes Range (un seul intervalle, sinon réponse complète) et If-Range ;
+- ETag / Last-Modified et réponses 304 ;
+- délégation optionnelle au serveur web (FILE_DELIVERY_OFFLOAD = 'x-sendfile'
+  pour Apache/mod_xsendfile, 'x-accel-redirect' pour nginx, avec
+  FILE_DELIVERY_ACCEL_PREFIX comme emplacement interne correspondant à MEDIA_ROOT).
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import iri_to_uri
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _BoundedReader:
+    """Lit au plus `length` octets d'un fichier à partir de la position courante"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class DeliveryResponse(FileResponse):
+    """FileResponse qui appelle `on_close` une fois la réponse envoyée par le serveur"""
+
+    on_close = None
+
+    def close(self):
+        super().close()
+        if self.on_close is not None:
+            callback, self.on_close = self.on_close, None
+            callback(self)
+
+
+def parse_range(header, size):
+    """
+    Retourne (début, fin incluse) pour un en-tête Range à un seul intervalle,
+    None si l'en-tête est absent ou non pris en charge (réponse complète),
+    ou False si l'intervalle ne peut pas être satisfait (416).
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffixe : les N derniers octets
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Range n'est honoré que si If-Range (s'il est présent) désigne la version actuelle"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _offload_response(path, content_type):
+    mode = getattr(settings, 'FILE_DELIVERY_OFFLOAD', None)
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        prefix = getattr(settings, 'FILE_DELIVERY_ACCEL_PREFIX', '/protected/').rstrip('/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = iri_to_uri(f'{prefix}/{relative}')
+        return response
+    return None
+
+
+def serve_file(request, field_file, filename, as_attachment=True, on_delivery=None):
+    """
+    Envoie le fichier d'un FileField. `on_delivery(response)` est appelé après
+    l'envoi, pour un GET sans Range ou dont l'intervalle commence au premier
+    octet (pas pour HEAD, les 304/416 ni les reprises de téléchargement).
+    """
+    path = field_file.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("Fichier introuvable")
+    etag = _etag(stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    counted = False
+    if response is None:
+        byte_range = None
+        if request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        # Premier envoi du fichier : contenu complet ou intervalle commençant à 0
+        counted = request.method == 'GET' and (byte_range is None or (byte_range and byte_range[0] == 0))
+
+        response = _offload_response(path, content_type)
+        if response is not None:
+            # Le serveur web gère lui-même Range et le contenu
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        elif byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range is None:
+            response = DeliveryResponse(
+                open(path, 'rb'), content_type=content_type, as_attachment=as_attachment, filename=filename,
+            )
+            response['Content-Length'] = stat.st_size
+        else:
+            start, end = byte_range
+            file = open(path, 'rb')
+            file.seek(start)
+            response = DeliveryResponse(
+                _BoundedReader(file, end - start + 1), content_type=content_type, status=206,
+                as_attachment=as_attachment, filename=filename,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+
+    if counted and on_delivery is not None:
+        if isinstance(response, DeliveryResponse):
+            response.on_close = on_delivery
+        else:
+            on_delivery(response)
+    return response
@@ -0,0 +1,191 @@
+"""
+Déclinaisons responsives des images (projets, articles, profils, témoignages, à propos).
+
+Pour une image `projects/site.jpg`, chaque largeur de IMAGE_DERIVATIVE_WIDTHS
+produit `derivatives/projects/site-640w.webp` et `derivatives/projects/site-640w.jpg`.
+Les noms sont déterministes : le template tag `responsive_image` construit le
+`srcset` sans requête, et revient à l'image d'origine tant que les déclinaisons
+n'existent pas encore.
+
+Les déclinaisons sont générées après l'enregistrement dans un pool de threads
+(voir les signaux dans models.py) ; la commande `build_image_derivatives`
+traite les médias existants en parallèle.
+"""
+import io
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+# Formats générés : (extension, format Pillow, type MIME)
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+
+# Champs image déclinés : {label du modèle: nom du champ}
+IMAGE_FIELDS = {
+    'portfolioapp.Project': 'image',
+    'portfolioapp.BlogPost': 'image',
+    'portfolioapp.Profile': 'profile_picture',
+    'portfolioapp.Testimonial': 'photo',
+    'portfolioapp.About': 'photo',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def widths():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 960, 1280)))
+
+
+def _quality():
+    return getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', 80)
+
+
+def derivative_name(name, width, extension):
+    root = posixpath.splitext(name)[0]
+    return f'{DERIVATIVES_DIR}/{root}-{width}w.{extension}'
+
+
+def _ready_key(name):
+    return f'image-derivatives:{name}'
+
+
+def is_supported(name):
+    return bool(name) and posixpath.splitext(name)[1].lower() in SOURCE_EXTENSIONS and not name.startswith(f'{DERIVATIVES_DIR}/')
+
+
+def is_ready(name, storage=default_storage):
+    """Vrai si les déclinaisons de l'image existent (résultat mis en cache)"""
+    if not is_supported(name):
+        return False
+    key = _ready_key(name)
+    ready = cache.get(key)
+    if ready is None:
+        ready = storage.exists(derivative_name(name, max(widths()), FORMATS[-1][0]))
+        # Une image absente est revérifiée plus tard (génération en cours)
+        cache.set(key, ready, None if ready else 60)
+    return ready
+
+
+def _encode(image, width, pillow_format):
+    from PIL import Image
+
+    resized = image.copy()
+    # Jamais d'agrandissement : une image plus petite est seulement ré-encodée
+    resized.thumbnail((width, width * 10), Image.LANCZOS)
+    if pillow_format == 'JPEG' and resized.mode != 'RGB':
+        background = Image.new('RGB', resized.size, (255, 255, 255))
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        resized = background
+    elif resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA')
+    options = {'quality': _quality()}
+    options.update({'optimize': True, 'progressive': True} if pillow_format == 'JPEG' else {'method': 4})
+    output = io.BytesIO()
+    resized.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def generate(name, storage=default_storage, force=False):
+    """
+    Génère toutes les déclinaisons d'une image. Retourne le nombre de fichiers écrits
+    (0 si elles existaient déjà et que `force` est faux).
+    """
+    if not is_supported(name):
+        return 0
+    if not force and storage.exists(derivative_name(name, max(widths()), FORMATS[-1][0])):
+        cache.set(_ready_key(name), True, None)
+        return 0
+
+    from PIL import Image, ImageOps
+
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    written = 0
+    # Le JPEG de la plus grande largeur est écrit en dernier : il sert de témoin pour is_ready()
+    for width in sorted(widths()):
+        for extension, pillow_format, _ in FORMATS:
+            target = derivative_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(image, width, pillow_format)))
+            written += 1
+    cache.set(_ready_key(name), True, None)
+    return written
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_THREADS', 2),
+                thread_name_prefix='image-derivatives',
+            )
+        return _executor
+
+
+def _run(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception("Échec de la génération des déclinaisons de %s", name)
+
+
+def schedule(name):
+    """Génère les déclinaisons en arrière-plan, sans bloquer la requête"""
+    if not is_supported(name) or is_ready(name):
+        return None
+    future = _get_executor().submit(_run, name)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def wait_pending(timeout=None):
+    """Attend la fin des générations en cours (tests, commandes)"""
+    for future in list(_pending):
+        future.result(timeout)
+
+
+def derivative_url(name, width, extension):
+    return default_storage.url(derivative_name(name, width, extension))
+
+
+def srcset(name, extension):
+    return ', '.join(
+        f'{derivative_url(name, width, extension)} {width}w'
+        for width in sorted(widths())
+    )
+
+
+def iter_media_images(root=None):
+    """Noms (relatifs à MEDIA_ROOT) de toutes les images d'origine du dossier média"""
+    root = str(root or settings.MEDIA_ROOT)
+    for directory, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        if relative_dir.split(os.sep)[0] == DERIVATIVES_DIR:
+            dirnames[:] = []
+            continue
+        for filename in filenames:
+            name = filename if relative_dir == '.' else f'{relative_dir}/{filename}'.replace(os.sep, '/')
+            if is_supported(name):
+                yield name
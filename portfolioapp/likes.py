@@ -0,0 +1,69 @@
+"""
+Projets et commentaires likés par l'utilisateur connecté.
+
+Les deux ensembles d'IDs sont chargés en une seule requête (UNION), mis en
+cache par utilisateur (tag "liked:<user_id>", invalidé par les signaux de
+ProjectLike et des likes de commentaires) et mémorisés sur l'objet user de la
+requête : les templates font ensuite des tests d'appartenance sans requête.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import CharField, Value
+
+from .caching import get_or_set, invalidate
+from .models import Comment, ProjectLike
+
+PROJECT = 'project'
+COMMENT = 'comment'
+
+
+@dataclass(frozen=True)
+class LikedIds:
+    projects: frozenset = frozenset()
+    comments: frozenset = frozenset()
+
+    def contains(self, obj):
+        if isinstance(obj, Comment):
+            return obj.pk in self.comments
+        return obj.pk in self.projects
+
+
+EMPTY = LikedIds()
+
+
+def _tag(user_id):
+    return f'liked:{user_id}'
+
+
+def _load(user_id):
+    kind = CharField()
+    rows = (
+        ProjectLike.objects.filter(user_id=user_id)
+        .values_list(Value(PROJECT, output_field=kind), 'project_id')
+        .union(
+            Comment.likes.through.objects.filter(user_id=user_id)
+            .values_list(Value(COMMENT, output_field=kind), 'comment_id'),
+            all=True,
+        )
+    )
+    ids = {PROJECT: set(), COMMENT: set()}
+    for row_kind, pk in rows:
+        ids[row_kind].add(pk)
+    return LikedIds(projects=frozenset(ids[PROJECT]), comments=frozenset(ids[COMMENT]))
+
+
+def liked_ids(user):
+    """IDs likés par l'utilisateur (une requête au plus par requête HTTP, aucune si en cache)"""
+    if user is None or not user.is_authenticated:
+        return EMPTY
+    cached = getattr(user, '_liked_ids', None)
+    if cached is None:
+        timeout = getattr(settings, 'LIKED_IDS_CACHE_TIMEOUT', 3600)
+        cached = get_or_set(f'liked-ids:{user.pk}', [_tag(user.pk)], lambda: _load(user.pk), timeout)
+        user._liked_ids = cached
+    return cached
+
+
+def invalidate_user(*user_ids):
+    invalidate(*(_tag(user_id) for user_id in user_ids))
@@ -0,0 +1,120 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from portfolioapp import search
+
+WORDS = (
+    'django python portfolio projet application web mobile design interface base données '
+    'automatisation église école gestion intelligence artificielle api rest javascript tailwind '
+    'bootstrap sqlite analyse tableau rapport client serveur déploiement sécurité performance'
+).split()
+
+
+# Vocabulaire rare pour que les mots courants restent sélectifs, comme dans un vrai corpus
+RARE_WORDS = [f'terme{i}' for i in range(20_000)]
+
+
+def _word(rng):
+    return rng.choice(WORDS) if rng.random() < 0.02 else rng.choice(RARE_WORDS)
+
+
+def _html_document(rng, words):
+    """Contenu HTML proche de ce que produit CKEditor"""
+    paragraphs = []
+    for _ in range(rng.randint(2, 6)):
+        text = ' '.join(_word(rng) for _ in range(words // 4))
+        paragraphs.append(f'<p style="text-align:justify;"><span style="color:hsl(231,48%,48%);">{text}</span></p>')
+    return ''.join(paragraphs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare la recherche icontains (LIKE) et l\'index FTS5 sur une base SQLite '
+        'temporaire remplie de N documents synthétiques'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--queries', nargs='+', default=['django', 'intelligence artificielle', 'sécurité api'])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--words', type=int, default=200, help='Nombre de mots par document')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            with tempfile.TemporaryDirectory() as tmp:
+                db = sqlite3.connect(Path(tmp) / 'bench.sqlite3')
+                self.stdout.write(f'\n=== {size} documents ===')
+                self._seed(db, size, options['words'], random.Random(options['seed']))
+                for query in options['queries']:
+                    like = self._time(db, self._like_sql(query), options['repeat'])
+                    fts = self._time(db, self._fts_sql(query), options['repeat'])
+                    self.stdout.write(
+                        f'{query!r:30} icontains: {like * 1000:8.1f} ms   '
+                        f'fts5: {fts * 1000:8.1f} ms   (x{like / fts if fts else float("inf"):.1f})'
+                    )
+                db.close()
+
+    def _seed(self, db, size, words, rng):
+        started = time.perf_counter()
+        db.execute('CREATE TABLE project (id INTEGER PRIMARY KEY, title TEXT, description TEXT, technologies TEXT)')
+        db.execute(search.CREATE_TABLE_SQL)
+        batch = []
+        for pk in range(1, size + 1):
+            title = ' '.join(_word(rng) for _ in range(4))
+            description = _html_document(rng, words)
+            technologies = ', '.join(rng.sample(WORDS, 3))
+            batch.append((pk, title, description, technologies))
+            if len(batch) == 1000 or pk == size:
+                db.executemany('INSERT INTO project VALUES (?, ?, ?, ?)', batch)
+                db.executemany(
+                    f'INSERT INTO {search.TABLE} (rowid, {", ".join(search.COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)',
+                    [
+                        (pk * 2, search.html_to_text(title), search.html_to_text(description), '', technologies, '')
+                        for pk, title, description, technologies in batch
+                    ],
+                )
+                batch = []
+        db.commit()
+        self.stdout.write(f'Base remplie en {time.perf_counter() - started:.1f} s')
+
+    def _like_sql(self, query):
+        # Même forme que le SQL généré par Q(title__icontains) | Q(description__icontains) | ...
+        # suivi du COUNT(*) du Paginator puis de la première page
+        pattern = f"%{query}%".replace("'", "''")
+        where = (
+            f"title LIKE '{pattern}' ESCAPE '\\' OR description LIKE '{pattern}' ESCAPE '\\' "
+            f"OR technologies LIKE '{pattern}' ESCAPE '\\'"
+        )
+        return [
+            f"SELECT COUNT(*) FROM project WHERE {where}",
+            f"SELECT id, title, description FROM project WHERE {where} ORDER BY id DESC LIMIT 9",
+        ]
+
+    def _fts_sql(self, query):
+        match = search.build_match_query(query).replace("'", "''")
+        weights = ', '.join(str(weight) for weight in search.WEIGHTS)
+        # Classement BM25 complet, puis extraits pour la première page uniquement (comme search.load_page)
+        return [
+            f"SELECT rowid FROM {search.TABLE} WHERE {search.TABLE} MATCH '{match}' "
+            f"ORDER BY bm25({search.TABLE}, {weights}) LIMIT 500",
+            f"SELECT rowid, snippet({search.TABLE}, -1, '<mark>', '</mark>', '…', 16) FROM {search.TABLE} "
+            f"WHERE {search.TABLE} MATCH '{match}' AND rowid IN "
+            f"(SELECT rowid FROM {search.TABLE} WHERE {search.TABLE} MATCH '{match}' "
+            f"ORDER BY bm25({search.TABLE}, {weights}) LIMIT 9)",
+        ]
+
+    def _time(self, db, statements, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for sql in statements:
+                db.execute(sql).fetchall()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
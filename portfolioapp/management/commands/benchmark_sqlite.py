@@ -0,0 +1,128 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from portfolioapp import sqlite_tuning
+
+SCHEMA = [
+    'CREATE TABLE project (id INTEGER PRIMARY KEY, title TEXT, description TEXT, views_count INTEGER DEFAULT 0)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, project_id INTEGER, content TEXT, created_at REAL)',
+    'CREATE INDEX comment_project ON comment (project_id)',
+]
+
+# (nom, PRAGMA, mode de BEGIN) — "défaut" reproduit la configuration Django d'origine
+PROFILES = (
+    ('défaut', {}, 'DEFERRED'),
+    ('réglé', None, 'IMMEDIATE'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure le débit lectures/écritures concurrentes sur une base SQLite temporaire, '
+        'avec la configuration par défaut puis avec SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Durée de chaque mesure (secondes)')
+        parser.add_argument('--rows', type=int, default=1000, help='Projets insérés avant la mesure')
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help='Timeout du module sqlite3 pour le profil par défaut (secondes)')
+
+    def handle(self, *args, **options):
+        for name, pragmas, begin in PROFILES:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / 'bench.sqlite3'
+                self._seed(path, options['rows'])
+                result = self._run(path, pragmas, begin, options)
+            duration = options['duration']
+            self.stdout.write(
+                f'{name:8} lectures: {result["reads"] / duration:9.0f}/s   '
+                f'écritures: {result["writes"] / duration:8.0f}/s   '
+                f'"database is locked": {result["locked"]}'
+            )
+
+    def _seed(self, path, rows):
+        db = sqlite3.connect(path)
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.executemany(
+            'INSERT INTO project (id, title, description) VALUES (?, ?, ?)',
+            [(pk, f'Projet {pk}', 'Description ' * 50) for pk in range(1, rows + 1)],
+        )
+        db.commit()
+        db.close()
+
+    def _connect(self, path, pragmas, options):
+        # isolation_level=None : transactions explicites, comme Django en autocommit
+        db = sqlite3.connect(path, timeout=options['timeout'], isolation_level=None, check_same_thread=False)
+        sqlite_tuning.apply_pragmas(db, pragmas)
+        return db
+
+    def _run(self, path, pragmas, begin, options):
+        rows = options['rows']
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        start = threading.Barrier(options['readers'] + options['writers'] + 1)
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def reader(index):
+            db = self._connect(path, pragmas, options)
+            start.wait()
+            i = index
+            while not stop.is_set():
+                i += 1
+                try:
+                    # Page projet : le projet, ses commentaires, puis la liste des plus vus
+                    pk = i % rows + 1
+                    db.execute('SELECT id, title, description FROM project WHERE id = ?', (pk,)).fetchall()
+                    db.execute('SELECT id, content FROM comment WHERE project_id = ? ORDER BY id DESC LIMIT 20',
+                               (pk,)).fetchall()
+                    db.execute('SELECT id, title FROM project ORDER BY views_count DESC LIMIT 9').fetchall()
+                    count('reads')
+                except sqlite3.OperationalError:
+                    count('locked')
+            db.close()
+
+        def writer(index):
+            db = self._connect(path, pragmas, options)
+            start.wait()
+            i = index
+            while not stop.is_set():
+                i += 1
+                pk = i % rows + 1
+                try:
+                    # Ajout d'un commentaire : lecture du projet puis écritures dans la même transaction
+                    db.execute(f'BEGIN {begin}')
+                    db.execute('SELECT id FROM project WHERE id = ?', (pk,)).fetchone()
+                    db.execute('INSERT INTO comment (project_id, content, created_at) VALUES (?, ?, ?)',
+                               (pk, 'Commentaire', time.time()))
+                    db.execute('UPDATE project SET views_count = views_count + 1 WHERE id = ?', (pk,))
+                    db.execute('COMMIT')
+                    count('writes')
+                except sqlite3.OperationalError:
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                    count('locked')
+            db.close()
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return counts
@@ -0,0 +1,104 @@
+import json
+import platform
+import tempfile
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (override_settings, setup_databases, setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from portfolioapp import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Mesure toutes les vues de portfolioapp (p50/p95, requêtes SQL, pic de mémoire) sur une base '
+        'de test remplie de volumes configurables, ou compare deux fichiers de résultats (--compare)'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmarks.VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+        parser.add_argument('--repeat', type=int, default=20, help='Requêtes mesurées par cas')
+        parser.add_argument('--only', nargs='+', help="Noms d'URL à mesurer (défaut : toutes)")
+        parser.add_argument('--output', default='benchmark-views.json')
+        parser.add_argument('--database-file',
+                            help='Fichier SQLite de la base de benchmark (défaut : en mémoire)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Conserve la base (avec --database-file) et la réutilise sans la remplir')
+        parser.add_argument('--compare', nargs=2, metavar=('REFERENCE', 'RESULTATS'),
+                            help='Compare deux fichiers de résultats au lieu de mesurer')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Hausse relative tolérée du p95 et de la mémoire (0.2 = 20 %%)')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self._compare(*options['compare'], options['threshold'])
+
+        case_list = benchmarks.cases()
+        uncovered = benchmarks.uncovered_routes(case_list)
+        if uncovered:
+            self.stdout.write(self.style.WARNING(f"Routes sans cas : {', '.join(uncovered)}"))
+        if options['only']:
+            case_list = [case for case in case_list if case.name in options['only']]
+
+        setup_test_environment(debug=False)
+        if options['database_file']:
+            connections['default'].settings_dict['TEST']['NAME'] = options['database_file']
+            media_root = Path(options['database_file'] + '.media')
+        else:
+            media_root = Path(tempfile.mkdtemp())
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'],
+                                     serialized_aliases=set())
+        try:
+            # Métriques actives comme en production (coût du middleware et de /metrics inclus)
+            with override_settings(MEDIA_ROOT=media_root, METRICS_ENABLED=True, METRICS_DIR=media_root / 'metrics',
+                                   PROFILING_ENABLED=True, PROFILING_DIR=media_root / 'profiles'):
+                results = self._run(case_list, options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'repeat': options['repeat'],
+                'volumes': {name: options[name] for name in benchmarks.VOLUMES},
+            },
+            'results': results,
+        }
+        Path(options['output']).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f"✅ Résultats écrits dans {options['output']}"))
+
+    def _run(self, case_list, options):
+        dataset = benchmarks.dataset() if options['keepdb'] else None
+        if dataset is None:
+            dataset = benchmarks.seed(
+                **{name: options[name] for name in benchmarks.VOLUMES},
+                log=self.stdout.write,
+            )
+
+        def progress(key, result):
+            self.stdout.write(
+                f"{key:42} {result['status']}  p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"{result['queries']:4} requêtes  {result['peak_memory_kib']:9.1f} Kio"
+            )
+
+        return benchmarks.run(case_list, dataset, repeat=options['repeat'], progress=progress)
+
+    def _compare(self, reference, current, threshold):
+        try:
+            baseline, latest = (json.loads(Path(path).read_text())['results'] for path in (reference, current))
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Fichier de résultats illisible : {error}')
+        regressions = benchmarks.compare(baseline, latest, threshold)
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(f'  - {line}'))
+        if regressions:
+            raise CommandError(f'{len(regressions)} régression(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Aucune régression'))
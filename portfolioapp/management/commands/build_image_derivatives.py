@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from portfolioapp import images
+
+
+def _init_worker():
+    # Nécessaire quand les processus sont lancés en mode "spawn" (Windows, macOS)
+    django.setup()
+
+
+def _generate(name, force):
+    try:
+        return name, images.generate(name, force=force), None
+    except Exception as exc:
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Génère en parallèle les déclinaisons responsives (WebP/JPEG) des images existantes du dossier média'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Nombre de processus')
+        parser.add_argument('--force', action='store_true', help='Régénère les déclinaisons existantes')
+
+    def handle(self, *args, **options):
+        names = list(images.iter_media_images())
+        self.stdout.write(f'{len(names)} image(s) trouvée(s)')
+        generated = failed = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            futures = [executor.submit(_generate, name, options['force']) for name in names]
+            for future in as_completed(futures):
+                name, written, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'❌ {name}: {error}')
+                elif written:
+                    generated += 1
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{name}: {written} fichier(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {generated} image(s) déclinée(s), {len(names) - generated - failed} déjà à jour, {failed} échec(s)'
+        ))
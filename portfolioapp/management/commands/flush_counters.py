@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from portfolioapp import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Rejoue les fichiers du spool des compteurs de vues/téléchargements (COUNTER_SPOOL_DIR). '
+        'Ne force pas le flush des workers en cours : ils écrivent leur tampon eux-mêmes (seuil, minuteur, '
+        'arrêt normal) ; un worker tué (SIGKILL, OOM) perd au plus COUNTER_FLUSH_INTERVAL secondes d\'incréments'
+    )
+
+    def handle(self, *args, **options):
+        replayed = counters.replay_spool()
+
+        self.stdout.write(f'Fichiers de spool rejoués: {replayed}')
+        self.stdout.write(self.style.SUCCESS('✅ Spool vide'))
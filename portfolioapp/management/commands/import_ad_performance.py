@@ -0,0 +1,59 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolioapp import ad_reports
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Importe un export CSV des performances AdSense (upsert par unité et par date) et met à jour les rapports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?', help='Fichier CSV à importer (- pour l\'entrée standard)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Lignes écrites par requête (défaut : AD_IMPORT_BATCH_SIZE)')
+        parser.add_argument('--delimiter', default=',', help='Séparateur de colonnes (défaut : ,)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Encodage du fichier (défaut : utf-8-sig)')
+        parser.add_argument('--dry-run', action='store_true', help='Valider le fichier sans rien écrire')
+        parser.add_argument('--rebuild-rollups', action='store_true',
+                            help='Recalculer tous les rapports hebdomadaires et mensuels')
+
+    def handle(self, *args, **options):
+        if options['csv_file']:
+            self._import(options)
+        elif not options['rebuild_rollups']:
+            raise CommandError('Indiquez un fichier CSV ou --rebuild-rollups')
+
+        if options['rebuild_rollups'] and not options['dry_run']:
+            written = ad_reports.rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f'✅ {written} rapport(s) recalculé(s)'))
+
+    def _import(self, options):
+        path = options['csv_file']
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding=options['encoding'])
+        try:
+            result = ad_reports.import_csv(
+                stream,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                delimiter=options['delimiter'],
+            )
+        except ad_reports.CSVFormatError as error:
+            raise CommandError(str(error)) from error
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, message in result.errors[:MAX_REPORTED_ERRORS]:
+            self.stdout.write(f'  - ligne {line}: {message}')
+        if len(result.errors) > MAX_REPORTED_ERRORS:
+            self.stdout.write(f'  ... et {len(result.errors) - MAX_REPORTED_ERRORS} autre(s) erreur(s)')
+
+        verb = 'validée(s)' if options['dry_run'] else 'importée(s)'
+        summary = f'{result.rows} ligne(s) {verb}, {len(result.errors)} ligne(s) rejetée(s)'
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f'⚠️ {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {summary}'))
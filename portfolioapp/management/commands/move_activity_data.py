@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from portfolioapp.routers import ACTIVITY, ACTIVITY_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copie les lignes des tables d'activité (notifications, vues, AdSense, sessions) "
+        "de la base principale vers la base d'activité, après activation de ACTIVITY_DATABASE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delete', action='store_true',
+                            help='Vide ensuite les tables copiées dans la base principale')
+
+    def handle(self, *args, **options):
+        if ACTIVITY not in connections.settings:
+            raise CommandError("Base d'activité non configurée (ACTIVITY_DATABASE)")
+        existing = set(connections[DEFAULT_DB_ALIAS].introspection.table_names())
+
+        for label in sorted(ACTIVITY_MODELS):
+            model = apps.get_model(label)
+            if model._meta.db_table not in existing:
+                continue
+            copied = self._copy(model, options['batch_size'])
+            self.stdout.write(f'  - {label}: {copied} ligne(s) copiée(s)')
+            if options['delete']:
+                # DELETE brut : pas de signaux (ils décrémenteraient les compteurs de notifications)
+                with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {connections[DEFAULT_DB_ALIAS].ops.quote_name(model._meta.db_table)}')
+
+        self.stdout.write(self.style.SUCCESS('✅ Copie terminée'))
+
+    def _copy(self, model, batch_size):
+        # _base_manager : pas de signaux ni de mise à jour des compteurs, les lignes sont copiées telles quelles
+        source = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        target = model._base_manager.using(ACTIVITY)
+        copied, last = 0, None
+        while True:
+            batch = list((source if last is None else source.filter(pk__gt=last))[:batch_size])
+            if not batch:
+                return copied
+            with transaction.atomic(using=ACTIVITY):
+                target.bulk_create(batch, ignore_conflicts=True)
+            copied += len(batch)
+            last = batch[-1].pk
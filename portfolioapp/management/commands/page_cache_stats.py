@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolioapp import metrics, page_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Affiche les hits/miss du cache de pages anonymes par vue. Compteurs lus dans le cache : '
+        'ceux de tous les workers avec un cache partagé (Redis, Memcached, base), du seul processus '
+        'courant avec LocMemCache. --metrics lit les métriques de tous les workers (METRICS_ENABLED)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics', action='store_true',
+                            help='Additionne les compteurs des fichiers de METRICS_DIR')
+        parser.add_argument('--reset', action='store_true', help='Remet les compteurs du cache à zéro')
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            if not metrics.enabled():
+                raise CommandError('Métriques indisponibles : activer METRICS_ENABLED')
+            counts_by_view = page_cache.metrics_stats()
+        else:
+            counts_by_view = page_cache.stats()
+
+        if not any(sum(counts.values()) for counts in counts_by_view.values()):
+            self.stdout.write('Aucune page servie par le cache de pages pour le moment')
+        for name, counts in counts_by_view.items():
+            served = counts['hit'] + counts['miss']
+            ratio = f"{counts['hit'] / served:.0%}" if served else '-'
+            self.stdout.write(
+                f"{name:20} hits: {counts['hit']:6}  miss: {counts['miss']:6}  "
+                f"bypass: {counts['bypass']:4}  taux: {ratio}"
+            )
+
+        if options['reset']:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('✅ Compteurs remis à zéro'))
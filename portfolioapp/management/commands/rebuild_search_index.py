@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolioapp import search
+from portfolioapp.models import BlogPost, Project
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'index de recherche plein texte (FTS5) des projets et articles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Nombre de documents indexés par transaction')
+
+    def handle(self, *args, **options):
+        search.reset_availability()
+        if not search.is_available():
+            raise CommandError('Index FTS5 indisponible : base non SQLite ou migrations non appliquées.')
+
+        indexed = search.rebuild(Project, BlogPost, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {indexed} document(s) indexé(s)'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from portfolioapp.models import Comment, Project, ProjectLike, Reply
+
+# (modèle, compteur stocké, modèle compté, clé étrangère vers le modèle)
+COUNTERS = [
+    (Project, 'likes_count', ProjectLike, 'project'),
+    (Project, 'comments_count', Comment, 'project'),
+    (Comment, 'likes_count', Comment.likes.through, 'comment'),
+    (Comment, 'replies_count', Comment, 'parent'),
+    (Reply, 'likes_count', Reply.likes.through, 'reply'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs de likes, commentaires et réponses stockés sur les projets et commentaires'
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, counted, foreign_key in COUNTERS:
+            actual = dict(
+                counted.objects.filter(**{f'{foreign_key}__isnull': False})
+                .values_list(foreign_key)
+                .annotate(total=Count('pk'))
+                .order_by()
+            )
+
+            drifted = []
+            for obj in model.objects.only('id', field).iterator():
+                expected = actual.get(obj.pk, 0)
+                if getattr(obj, field) != expected:
+                    self.stdout.write(
+                        f'  - {model._meta.model_name} {obj.pk} ({field}): {getattr(obj, field)} → {expected}'
+                    )
+                    setattr(obj, field, expected)
+                    drifted.append(obj)
+
+            model.objects.bulk_update(drifted, [field], batch_size=500)
+            total += len(drifted)
+
+        if total:
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} compteur(s) corrigé(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Tous les compteurs sont à jour'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from portfolioapp import site_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les statistiques globales du portfolio (tenues à jour par deltas)'
+
+    def handle(self, *args, **options):
+        drift = site_stats.reconcile()
+
+        for field, (stored, expected) in drift.items():
+            self.stdout.write(f'  - {field}: {stored} → {expected}')
+
+        if drift:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(drift)} statistique(s) corrigée(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Toutes les statistiques sont à jour'))
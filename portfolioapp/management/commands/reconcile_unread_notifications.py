@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from portfolioapp.models import Notification, Profile
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs de notifications non lues stockés sur les profils'
+
+    def handle(self, *args, **options):
+        actual = dict(
+            Notification.objects.filter(is_read=False)
+            .values_list('user_id')
+            .annotate(total=Count('id'))
+        )
+
+        drifted = []
+        for profile in Profile.objects.only('id', 'user_id', 'unread_notifications_count').iterator():
+            expected = actual.get(profile.user_id, 0)
+            if profile.unread_notifications_count != expected:
+                self.stdout.write(
+                    f'  - utilisateur {profile.user_id}: {profile.unread_notifications_count} → {expected}'
+                )
+                profile.unread_notifications_count = expected
+                drifted.append(profile)
+
+        Profile.objects.bulk_update(drifted, ['unread_notifications_count'], batch_size=500)
+        cache.delete_many([Profile.unread_cache_key(profile.user_id) for profile in drifted])
+
+        if drifted:
+            self.stdout.write(self.style.SUCCESS(f'✅ {len(drifted)} compteur(s) corrigé(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Tous les compteurs sont à jour'))
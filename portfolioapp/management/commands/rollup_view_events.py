@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from portfolioapp import analytics
+
+
+class Command(BaseCommand):
+    help = 'Agrège les vues par heure et par jour, puis supprime les événements bruts expirés'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Durée de conservation des événements bruts (défaut : ANALYTICS_EVENT_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Événements supprimés par transaction (défaut : ANALYTICS_DELETE_BATCH_SIZE)')
+        parser.add_argument('--no-prune', action='store_true', help='Agréger sans supprimer les événements bruts')
+
+    def handle(self, *args, **options):
+        # Événements encore en tampon dans ce processus
+        analytics.flush()
+
+        hours, days = analytics.rollup()
+        self.stdout.write(f'  - {hours} agrégat(s) horaire(s), {days} agrégat(s) journalier(s) écrits')
+
+        if not options['no_prune']:
+            deleted = analytics.prune(options['retention_days'], options['batch_size'])
+            self.stdout.write(f'  - {deleted} événement(s) expiré(s) supprimé(s)')
+
+        self.stdout.write(self.style.SUCCESS('✅ Statistiques de fréquentation à jour'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolioapp import template_profiling
+
+SORT_FIELDS = ('self_ms', 'ms', 'calls', 'queries', 'self_queries')
+
+
+class Command(BaseCommand):
+    help = (
+        'Agrège le journal du profilage des templates (TEMPLATE_PROFILING_LOG, rotations comprises) : '
+        'appels, temps et requêtes SQL par template, include et tag'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Journal à lire (défaut : TEMPLATE_PROFILING_LOG)')
+        parser.add_argument('--view', help="Nom d'URL à analyser (défaut : toutes les vues)")
+        parser.add_argument('--kind', choices=('template', 'include', 'tag'))
+        parser.add_argument('--sort', choices=SORT_FIELDS, default='self_ms')
+        parser.add_argument('--limit', type=int, default=30)
+
+    def handle(self, *args, **options):
+        paths = template_profiling.log.files(options['log'])
+        if not paths:
+            raise CommandError('Journal introuvable : activer TEMPLATE_PROFILING_ENABLED et servir des requêtes')
+
+        lines = (line for path in paths for line in path.read_text(encoding='utf-8').splitlines())
+        requests, totals = template_profiling.aggregate(lines, view=options['view'])
+        if not requests:
+            raise CommandError('Aucune requête mesurée')
+
+        rows = [(kind, name, total) for (kind, name), total in totals.items()
+                if options['kind'] in (None, kind)]
+        rows.sort(key=lambda row: row[2][options['sort']], reverse=True)
+        self.stdout.write(f'{requests} requête(s) mesurée(s), moyennes par requête :')
+        self.stdout.write(f"{'type':9} {'appels':>8} {'ms':>9} {'ms propres':>10} {'SQL':>6} {'SQL propres':>11}  nom")
+        for kind, name, total in rows[:options['limit']]:
+            self.stdout.write(
+                f"{kind:9} {total['calls'] / requests:8.1f} {total['ms'] / requests:9.2f} "
+                f"{total['self_ms'] / requests:10.2f} {total['queries'] / requests:6.1f} "
+                f"{total['self_queries'] / requests:11.1f}  {name}"
+            )
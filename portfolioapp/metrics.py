@@ -0,0 +1,276 @@
+"""
+Métriques au format d'exposition texte de Prometheus (vue `metrics`, /metrics).
+
+Chaque worker accumule ses valeurs en mémoire, puis les écrit dans son propre
+fichier de METRICS_DIR : au plus toutes les METRICS_FLUSH_INTERVAL secondes en
+fin de requête, et à l'arrêt. La vue additionne les fichiers de tous les
+workers : compteurs et histogrammes se cumulent sans verrou entre processus
+(chaque fichier n'a qu'un écrivain, remplacé atomiquement). Après un fork,
+l'enfant repart de zéro avec son propre fichier.
+
+Les fichiers des workers arrêtés restent comptés : vider METRICS_DIR au
+redéploiement (Prometheus traite la baisse comme une remise à zéro).
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def allowed_ips():
+    return getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+
+def _metrics_dir():
+    return Path(getattr(settings, 'METRICS_DIR', Path(settings.BASE_DIR) / 'var' / 'metrics'))
+
+
+def _flush_interval():
+    return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+
+class MetricStore:
+    """
+    Valeurs d'un worker : {(nom, ((label, valeur), ...)): total} pour un
+    compteur, [nombre par bucket..., somme, nombre] pour un histogramme.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._pid = os.getpid()
+        self._path = None
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+    def _check_fork(self):
+        # Un worker forké hérite des valeurs du parent, déjà comptées dans son fichier
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._values = {}
+            self._path = None
+            self._dirty = False
+
+    def inc(self, key, amount=1):
+        with self._lock:
+            self._check_fork()
+            self._values[key] = self._values.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, key, index, value, size):
+        with self._lock:
+            self._check_fork()
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * size + [0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+            self._dirty = True
+
+    def drain(self):
+        """Vide le store et retourne son contenu (utilisé par les tests)"""
+        with self._lock:
+            self._check_fork()
+            values, self._values = self._values, {}
+            self._dirty = False
+        return values
+
+    def flush(self, force=False):
+        """Écrit les valeurs dans le fichier du worker (si l'intervalle est écoulé ou `force`)"""
+        with self._lock:
+            self._check_fork()
+            if not self._dirty or (not force and time.monotonic() - self._last_flush < _flush_interval()):
+                return None
+            metrics_dir = _metrics_dir()
+            if self._path is None or self._path.parent != metrics_dir:
+                self._path = metrics_dir / f'{self._pid}-{uuid.uuid4().hex}.json'
+            rows = [[name, [list(label) for label in labels], value] for (name, labels), value in self._values.items()]
+            try:
+                metrics_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(rows))
+                os.replace(tmp_path, self._path)
+            except OSError:
+                # Répertoire indisponible : les valeurs restent en mémoire pour le prochain flush
+                logger.exception("Écriture des métriques impossible")
+                return None
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            return self._path
+
+
+store = MetricStore()
+_registry = {}
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry[name] = self
+
+    def key(self, labels):
+        return self.name, tuple((label, str(labels[label])) for label in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        store.inc(self.key(labels), amount)
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def inc(self, amount=1, **labels):
+        raise TypeError(f'{self.name} est un histogramme : utiliser observe()')
+
+    def observe(self, value, **labels):
+        # Premier bucket dont la borne (le) est >= value, sinon +Inf
+        store.observe(self.key(labels), bisect_left(self.buckets, value), value, len(self.buckets) + 1)
+
+    def samples(self, labels, value):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), value[:-2]):
+            cumulative += count
+            yield f'{self.name}_bucket', (*labels, ('le', _format(bound))), cumulative
+        yield f'{self.name}_sum', labels, value[-2]
+        yield f'{self.name}_count', labels, value[-1]
+
+
+REQUESTS = Counter(
+    'portfolio_http_requests_total', 'Requêtes HTTP par vue, méthode et statut', ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'portfolio_http_request_duration_seconds', 'Durée des requêtes HTTP par vue', ('view',),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    'portfolio_http_response_size_bytes', 'Taille du corps des réponses par vue', ('view',),
+    buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_QUERIES = Histogram(
+    'portfolio_db_queries_per_request', 'Requêtes SQL exécutées par requête HTTP, par vue', ('view',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+PAGE_CACHE = Counter(
+    'portfolio_page_cache_requests_total', 'Pages anonymes servies depuis le cache (hit), calculées (miss) ou '
+    'recalculées à la demande (bypass), par vue', ('view', 'outcome'),
+)
+FRAGMENT_CACHE = Counter(
+    'portfolio_fragment_cache_lookups_total', 'Lectures du cache versionné par tags (caching.get_or_set)',
+    ('result',),
+)
+NOTIFICATION_FANOUT = Histogram(
+    'portfolio_notification_fanout_size', 'Notifications créées par événement (notifications.fan_out)',
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+AD_RENDERS = Counter(
+    'portfolio_ad_placements_rendered_total', 'Annonces AdSense rendues, par position et template tag',
+    ('position', 'tag'),
+)
+
+
+class QueryCounter:
+    """execute_wrapper qui compte les requêtes SQL"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def observe_request(request, response, duration, queries):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+    REQUEST_DURATION.observe(duration, view=view)
+    DB_QUERIES.observe(queries, view=view)
+    if not response.streaming:
+        RESPONSE_SIZE.observe(len(response.content), view=view)
+    elif response.has_header('Content-Length'):
+        RESPONSE_SIZE.observe(int(response['Content-Length']), view=view)
+    store.flush()
+
+
+def collect():
+    """Valeurs additionnées de tous les workers, y compris celles du worker courant"""
+    store.flush(force=True)
+    totals = {}
+    metrics_dir = _metrics_dir()
+    paths = sorted(metrics_dir.glob('*.json')) if metrics_dir.exists() else []
+    for path in paths:
+        try:
+            rows = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Fichier supprimé entre-temps : ses valeurs sont ignorées pour ce scrape
+            continue
+        for name, labels, value in rows:
+            key = name, tuple(tuple(label) for label in labels)
+            current = totals.get(key)
+            if current is None:
+                totals[key] = value
+            elif isinstance(value, list):
+                totals[key] = [a + b for a, b in zip(current, value)]
+            else:
+                totals[key] = current + value
+    return totals
+
+
+def _format(value):
+    if isinstance(value, str):
+        return value
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def exposition(values):
+    """Texte au format d'exposition Prometheus 0.0.4"""
+    by_metric = {}
+    for (name, labels), value in values.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, value in sorted(by_metric.get(name, ())):
+            for sample, sample_labels, sample_value in metric.samples(labels, value):
+                rendered = ','.join(f'{label}="{_escape(text)}"' for label, text in sample_labels)
+                lines.append(f'{sample}{{{rendered}}} {_format(sample_value)}' if rendered
+                             else f'{sample} {_format(sample_value)}')
+    return '\n'.join(lines) + '\n'
+
+
+@atexit.register
+def _flush_at_exit():
+    if enabled():
+        store.flush(force=True)
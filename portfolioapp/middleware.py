@@ -0,0 +1,114 @@
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, profiling, sql_instrumentation, template_profiling
+from .request_logs import append_server_timing
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Mesure les requêtes SQL d'une fraction des requêtes HTTP (voir
+    sql_instrumentation.py). Retiré de la chaîne si SQL_INSTRUMENTATION_ENABLED
+    est faux ; à placer en tête de MIDDLEWARE pour inclure session et auth.
+    """
+
+    def __init__(self, get_response):
+        if not sql_instrumentation.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sql_instrumentation.sampled():
+            return self.get_response(request)
+
+        recorder = sql_instrumentation.QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        append_server_timing(response, sql_instrumentation.server_timing(recorder, total))
+        sql_instrumentation.log_request(request, response, recorder, total)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Alimente les métriques par vue (voir metrics.py) : nombre de requêtes,
+    durée, taille de réponse et requêtes SQL. Retiré de la chaîne si
+    METRICS_ENABLED est faux ; à placer en tête de MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = metrics.QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        metrics.observe_request(request, response, time.perf_counter() - started, counter.count)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Exécute sous cProfile les requêtes demandées par le staff ou échantillonnées
+    (voir profiling.py). Retiré de la chaîne si PROFILING_ENABLED est faux ; à
+    placer après AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not profiling.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = profiling.trigger(request)
+        if reason is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with profiling.profile() as profiler:
+            response = self.get_response(request)
+        if profiler is not None:
+            profiling.store(profiler, request, response, time.perf_counter() - started, reason)
+        return response
+
+
+class TemplateProfilingMiddleware:
+    """
+    Mesure le rendu des templates, includes et tags d'une fraction des requêtes
+    (voir template_profiling.py). Retiré de la chaîne si
+    TEMPLATE_PROFILING_ENABLED est faux.
+    """
+
+    def __init__(self, get_response):
+        if not template_profiling.enabled():
+            raise MiddlewareNotUsed
+        template_profiling.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not template_profiling.sampled():
+            return self.get_response(request)
+
+        recorder = template_profiling.RenderRecorder()
+        with ExitStack() as stack:
+            stack.enter_context(template_profiling.recording(recorder))
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        append_server_timing(response, template_profiling.server_timing(recorder))
+        template_profiling.log_request(request, response, recorder)
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_unread_counts(apps, schema_editor):
+    Notification = apps.get_model('portfolioapp', 'Notification')
+    Profile = apps.get_model('portfolioapp', 'Profile')
+    unread = Notification.objects.filter(is_read=False).values('user_id').annotate(total=Count('id'))
+    for row in unread:
+        Profile.objects.filter(user_id=row['user_id']).update(unread_notifications_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Notifications non lues'),
+        ),
+        migrations.RunPython(fill_unread_counts, migrations.RunPython.noop),
+    ]
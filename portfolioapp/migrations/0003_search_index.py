@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from portfolioapp import search
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(search.CREATE_TABLE_SQL)
+    search.reset_availability()
+    search.rebuild(
+        apps.get_model('portfolioapp', 'Project'),
+        apps.get_model('portfolioapp', 'BlogPost'),
+        using=schema_editor.connection.alias,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(search.DROP_TABLE_SQL)
+    search.reset_availability()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0002_profile_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
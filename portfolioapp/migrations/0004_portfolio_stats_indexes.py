@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_portfolio_stats(apps, schema_editor):
+    # Les totaux sont désormais tenus à jour par deltas : on part de valeurs exactes
+    Project = apps.get_model('portfolioapp', 'Project')
+    BlogPost = apps.get_model('portfolioapp', 'BlogPost')
+    ProjectLike = apps.get_model('portfolioapp', 'ProjectLike')
+    PortfolioStats = apps.get_model('portfolioapp', 'PortfolioStats')
+    views = sum(
+        model.objects.aggregate(total=Coalesce(Sum('views_count'), 0))['total']
+        for model in (Project, BlogPost)
+    )
+    PortfolioStats.objects.update_or_create(id=1, defaults={
+        'total_projects': Project.objects.count(),
+        'total_blog_posts': BlogPost.objects.filter(is_published=True).count(),
+        'total_views': views,
+        'total_likes': ProjectLike.objects.count(),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0003_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['is_published', '-views_count'], name='blogpost_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-views_count'], name='project_views_idx'),
+        ),
+        migrations.RunPython(fill_portfolio_stats, migrations.RunPython.noop),
+    ]
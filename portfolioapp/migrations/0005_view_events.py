@@ -0,0 +1,64 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0004_portfolio_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Projet'), ('blogpost', 'Article de blog'), ('resume', 'CV')], max_length=10, verbose_name='Type')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Objet')),
+                ('referrer', models.CharField(blank=True, max_length=255, verbose_name='Site référent')),
+                ('device', models.CharField(max_length=10, verbose_name='Appareil')),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Vue',
+                'verbose_name_plural': 'Vues',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Projet'), ('blogpost', 'Article de blog'), ('resume', 'CV')], max_length=10, verbose_name='Type')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Objet')),
+                ('referrer', models.CharField(blank=True, max_length=255, verbose_name='Site référent')),
+                ('device', models.CharField(max_length=10, verbose_name='Appareil')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Vues')),
+                ('day', models.DateField(verbose_name='Jour')),
+            ],
+            options={
+                'verbose_name': 'Vues par jour',
+                'verbose_name_plural': 'Vues par jour',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'kind', 'object_id', 'referrer', 'device'), name='daily_view_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyViewRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Projet'), ('blogpost', 'Article de blog'), ('resume', 'CV')], max_length=10, verbose_name='Type')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Objet')),
+                ('referrer', models.CharField(blank=True, max_length=255, verbose_name='Site référent')),
+                ('device', models.CharField(max_length=10, verbose_name='Appareil')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Vues')),
+                ('hour', models.DateTimeField(verbose_name='Heure')),
+            ],
+            options={
+                'verbose_name': 'Vues par heure',
+                'verbose_name_plural': 'Vues par heure',
+                'ordering': ['-hour'],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'kind', 'object_id', 'referrer', 'device'), name='hourly_view_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0005_view_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdPerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Semaine'), ('month', 'Mois')], max_length=5, verbose_name='Période')),
+                ('period_start', models.DateField(verbose_name='Début de période')),
+                ('position', models.CharField(choices=[('header', 'Header'), ('sidebar', 'Sidebar'), ('content_top', 'Top of Content'), ('content_middle', 'Middle of Content'), ('content_bottom', 'Bottom of Content'), ('footer', 'Footer'), ('between_posts', 'Between Posts'), ('popup', 'Popup')], max_length=20, verbose_name='Position')),
+                ('impressions', models.PositiveBigIntegerField(default=0, verbose_name='Impressions')),
+                ('clicks', models.PositiveBigIntegerField(default=0, verbose_name='Clics')),
+                ('ctr', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='CTR (%)')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenus ($)')),
+            ],
+            options={
+                'verbose_name': 'Rapport publicitaire',
+                'verbose_name_plural': 'Rapports publicitaires',
+                'ordering': ['-period_start', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start', 'position'), name='ad_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:47
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Project = apps.get_model('portfolioapp', 'Project')
+    ProjectLike = apps.get_model('portfolioapp', 'ProjectLike')
+    Comment = apps.get_model('portfolioapp', 'Comment')
+    Reply = apps.get_model('portfolioapp', 'Reply')
+    Project.objects.update(
+        likes_count=_count(ProjectLike.objects.all(), 'project'),
+        comments_count=_count(Comment.objects.all(), 'project'),
+    )
+    Comment.objects.update(
+        likes_count=_count(Comment.likes.through.objects.all(), 'comment'),
+        replies_count=_count(Comment.objects.all(), 'parent'),
+    )
+    Reply.objects.update(likes_count=_count(Reply.likes.through.objects.all(), 'reply'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolioapp', '0006_ad_performance_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de commentaires'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de likes'),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
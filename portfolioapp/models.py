@@ -1,13 +1,37 @@
-from django.db import models
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.core.cache import cache
 #from ckeditor.fields import RichTextField
 from django_ckeditor_5.fields import CKEditor5Field
 from django.urls import reverse
 from django_countries.fields import CountryField
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils.text import slugify
 
+from . import images, search, sqlite_tuning
+from .caching import invalidate
+from .counters import counters_flushed
+
+def adjust_counters(model, field, deltas):
+    """
+    Applique des variations {pk: delta} à un compteur stocké avec des UPDATE
+    atomiques (un par valeur de delta).
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: Greatest(F(field) + delta, Value(0))})
+
 # Modèle Category
 class Category(models.Model):
     name = models.CharField(max_length=120)
@@ -51,6 +75,9 @@ class Project(models.Model):
     ], default='termine')
     featured = models.BooleanField(default=False, verbose_name="Projet mis en avant")
     views_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de vues")
+    # Compteurs dénormalisés, tenus à jour par les signaux (voir adjust_counters)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre de likes")
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre de commentaires")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -58,13 +85,15 @@ class Project(models.Model):
         verbose_name = "Projet"
         verbose_name_plural = "Projets"
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-views_count'], name='project_views_idx')]
 
     def __str__(self):
         return self.title
 
     def increment_views(self):
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        """Incrémente le compteur de vues (écriture différée, voir counters.py)"""
+        from .counters import increment
+        increment(self, 'views_count')
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -79,6 +108,8 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     is_edited = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -89,10 +120,10 @@ class Comment(models.Model):
         return f"Comment by {self.author.username} on {self.project.title}"
 
     def like_count(self):
-        return self.likes.count()
+        return self.likes_count
 
     def reply_count(self):
-        return self.replies.count()
+        return self.replies_count
 
     def get_replies(self):
         return self.replies.filter(is_deleted=False).order_by('created_at')
@@ -110,6 +141,7 @@ class Reply(models.Model):
     image = models.ImageField(upload_to='reply_images/', blank=True, null=True)
     is_edited = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = 'Réponse'
@@ -120,22 +152,55 @@ class Reply(models.Model):
         return f"Reply by {self.author.username} to {self.comment.author.username}"
 
 
+@contextmanager
+def unread_atomic(using):
+    """
+    Transaction couvrant les notifications (base `using`) et les compteurs des
+    profils, qui peuvent être dans deux bases (routers.py) : une par base.
+    """
+    with (transaction.atomic(using=router.db_for_write(Profile), savepoint=False),
+          transaction.atomic(using=using, savepoint=False)):
+        yield
+
+
+class NotificationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """bulk_create qui met aussi à jour les compteurs de notifications non lues"""
+        with unread_atomic(self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Profile.adjust_unread_counts(Counter(obj.user_id for obj in objs if not obj.is_read))
+        return objs
+
+    def mark_all_as_read(self, user):
+        """Marque toutes les notifications non lues d'un utilisateur comme lues"""
+        with unread_atomic(self.db):
+            updated = self.filter(user=user, is_read=False).update(is_read=True)
+            Profile.adjust_unread_counts({user.pk: -updated})
+        return updated
+
 # Modèle Notification
 class Notification(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # Table pouvant vivre dans la base d'activité (routers.py) : pas de contrainte en base,
+    # la suppression en cascade est faite par le signal delete_user_notifications
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='notifications')
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     link = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     def __str__(self):
         return f"Notification for {self.user.username}: {self.message}"
 
     def mark_as_read(self):
         """Marque la notification comme lue."""
         if not self.is_read:
+            with unread_atomic(router.db_for_write(Notification)):
+                # L'UPDATE conditionnel évite de décrémenter deux fois le compteur
+                updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+                Profile.adjust_unread_counts({self.user_id: -updated})
             self.is_read = True
-            self.save()
 
 # Modèle Profile
 class Profile(models.Model):
@@ -156,9 +221,55 @@ class Profile(models.Model):
     country = CountryField(blank=True, null=True, verbose_name="Pays", default='FR')
     city = models.CharField(max_length=255, blank=True, null=True, verbose_name="Ville")
 
+    unread_notifications_count = models.PositiveIntegerField(default=0, verbose_name="Notifications non lues")
+
     def __str__(self):
         return f"Profil de {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        # Le compteur n'est modifié que par des UPDATE atomiques (adjust_unread_counts) :
+        # une sauvegarde complète ne doit pas l'écraser avec une valeur périmée.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'unread_notifications_count'
+            ]
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def unread_cache_key(user_id):
+        return f'unread-notifications:{user_id}'
+
+    @classmethod
+    def adjust_unread_counts(cls, deltas):
+        """
+        Applique des variations {user_id: delta} aux compteurs de notifications
+        non lues avec des UPDATE atomiques (un par valeur de delta).
+        """
+        by_delta = defaultdict(list)
+        for user_id, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(user_id)
+        for delta, user_ids in by_delta.items():
+            cls.objects.filter(user_id__in=user_ids).update(
+                unread_notifications_count=Greatest(F('unread_notifications_count') + delta, Value(0))
+            )
+        if by_delta:
+            cache.delete_many([cls.unread_cache_key(user_id) for user_id in deltas])
+
+    @classmethod
+    def get_unread_count(cls, user):
+        """Nombre de notifications non lues (cache, sinon lecture du profil)"""
+        key = cls.unread_cache_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = cls.objects.filter(user_id=user.pk).values_list('unread_notifications_count', flat=True).first()
+            if count is None:
+                # Utilisateur sans profil : retour au comptage direct
+                count = Notification.objects.filter(user_id=user.pk, is_read=False).count()
+            cache.set(key, count)
+        return count
+
 # Signaux pour créer/sauvegarder un profil automatiquement
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -259,8 +370,9 @@ class Resume(models.Model):
         return self.title
 
     def increment_downloads(self):
-        self.download_count += 1
-        self.save(update_fields=['download_count'])
+        """Incrémente le compteur de téléchargements (écriture différée, voir counters.py)"""
+        from .counters import increment
+        increment(self, 'download_count')
 
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
@@ -278,13 +390,15 @@ class BlogPost(models.Model):
         verbose_name = ("Article de blog")
         verbose_name_plural = ("Articles de blog")
         ordering = ['-published_date']
+        indexes = [models.Index(fields=['is_published', '-views_count'], name='blogpost_views_idx')]
 
     def __str__(self):
         return self.title
 
     def increment_views(self):
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        """Incrémente le compteur de vues (écriture différée, voir counters.py)"""
+        from .counters import increment
+        increment(self, 'views_count')
 
 # Modèle pour les statistiques du portfolio
 class PortfolioStats(models.Model):
@@ -304,85 +418,40 @@ class PortfolioStats(models.Model):
 # ===== SIGNAUX =====
 # Tous les signaux sont définis ici après la déclaration de tous les modèles
 
+# PRAGMA SQLite (WAL, busy_timeout...) appliqués à chaque nouvelle connexion
+@receiver(connection_created)
+def configure_database_connection(sender, connection, **kwargs):
+    sqlite_tuning.configure_connection(connection)
+
 # Signal pour créer une notification lorsqu'un commentaire est ajouté
 @receiver(post_save, sender=Comment)
 def create_comment_notification(sender, instance, created, **kwargs):
     if created:
-        # Récupérer tous les utilisateurs qui ont participé à ce projet
-        participants = set()
-
-        # Ajouter le propriétaire du projet
-        participants.add(instance.project.user)
-
-        # Ajouter tous les utilisateurs qui ont commenté ce projet
-        for comment in Comment.objects.filter(project=instance.project):
-            participants.add(comment.author)
-
-        # Ajouter tous les utilisateurs qui ont répondu aux commentaires de ce projet
-        for comment in Comment.objects.filter(project=instance.project):
-            for reply in Reply.objects.filter(comment=comment):
-                participants.add(reply.author)
-
-        # Supprimer l'auteur du nouveau commentaire de la liste
-        participants.discard(instance.author)
-
-        # Créer une notification pour chaque participant
-        for user in participants:
-            if instance.project.user == user:
-                # Message spécial pour le propriétaire du projet
-                message = f"{instance.author.username} a commenté votre projet : {instance.project.title}"
-            else:
-                # Message pour les autres participants
-                message = f"{instance.author.username} a ajouté un commentaire sur le projet : {instance.project.title}"
-
-            Notification.objects.create(
-                user=user,
-                message=message,
-                link=f"/projects/{instance.project.id}/"
-            )
+        from .notifications import notify_new_comment
+        notify_new_comment(instance)
 
 # Signal pour créer une notification lorsqu'une réponse est ajoutée
 @receiver(post_save, sender=Reply)
 def create_reply_notification(sender, instance, created, **kwargs):
     if created:
-        # Récupérer tous les utilisateurs qui ont participé à ce projet
-        participants = set()
-
-        # Ajouter le propriétaire du projet
-        participants.add(instance.comment.project.user)
-
-        # Ajouter l'auteur du commentaire original
-        participants.add(instance.comment.author)
-
-        # Ajouter tous les utilisateurs qui ont commenté ce projet
-        for comment in Comment.objects.filter(project=instance.comment.project):
-            participants.add(comment.author)
-
-        # Ajouter tous les utilisateurs qui ont répondu aux commentaires de ce projet
-        for comment in Comment.objects.filter(project=instance.comment.project):
-            for reply in Reply.objects.filter(comment=comment):
-                participants.add(reply.author)
-
-        # Supprimer l'auteur de la nouvelle réponse de la liste
-        participants.discard(instance.author)
-
-        # Créer une notification pour chaque participant
-        for user in participants:
-            if user == instance.comment.author:
-                # Message spécial pour l'auteur du commentaire original
-                message = f"{instance.author.username} a répondu à votre commentaire sur le projet : {instance.comment.project.title}"
-            elif user == instance.comment.project.user:
-                # Message pour le propriétaire du projet
-                message = f"{instance.author.username} a répondu à un commentaire sur votre projet : {instance.comment.project.title}"
-            else:
-                # Message pour les autres participants
-                message = f"{instance.author.username} a ajouté une réponse sur le projet : {instance.comment.project.title}"
-
-            Notification.objects.create(
-                user=user,
-                message=message,
-                link=f"/projects/{instance.comment.project.id}/"
-            )
+        from .notifications import notify_new_reply
+        notify_new_reply(instance)
+
+# Signaux pour maintenir le compteur de notifications non lues
+@receiver(post_save, sender=Notification)
+def increment_unread_notifications(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        Profile.adjust_unread_counts({instance.user_id: 1})
+
+@receiver(post_delete, sender=Notification)
+def decrement_unread_notifications(sender, instance, **kwargs):
+    if not instance.is_read:
+        Profile.adjust_unread_counts({instance.user_id: -1})
+
+# Cascades des tables d'activité, qui peuvent être dans une autre base (routers.py)
+@receiver(post_delete, sender=User)
+def delete_user_notifications(sender, instance, **kwargs):
+    Notification.objects.filter(user_id=instance.pk).delete()
 
 # Signal pour générer automatiquement le slug des articles de blog
 @receiver(post_save, sender=BlogPost)
@@ -407,6 +476,225 @@ def create_like_notification(sender, instance, created, **kwargs):
             link=f"/projects/{instance.project.id}/"
         )
 
+# Signaux pour maintenir les compteurs de likes, commentaires et réponses
+@receiver(post_save, sender=ProjectLike)
+def count_project_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_counters(Project, 'likes_count', {instance.project_id: 1})
+
+@receiver(post_delete, sender=ProjectLike)
+def uncount_project_like(sender, instance, **kwargs):
+    adjust_counters(Project, 'likes_count', {instance.project_id: -1})
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_counters(Project, 'comments_count', {instance.project_id: 1})
+        if instance.parent_id:
+            adjust_counters(Comment, 'replies_count', {instance.parent_id: 1})
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    adjust_counters(Project, 'comments_count', {instance.project_id: -1})
+    if instance.parent_id:
+        adjust_counters(Comment, 'replies_count', {instance.parent_id: -1})
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+@receiver(m2m_changed, sender=Reply.likes.through)
+def count_message_likes(sender, instance, action, reverse, pk_set, **kwargs):
+    liked_model = Comment if sender is Comment.likes.through else Reply
+    column = f'{liked_model._meta.model_name}_id'
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() signale les ids demandés, pas seulement ceux réellement liés
+        links = sender.objects.filter(**{'user_id' if reverse else column: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{column}__in' if reverse else 'user_id__in': pk_set})
+        instance._removed_likes = Counter(links.values_list(column, flat=True))
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop('_removed_likes', {})
+        adjust_counters(liked_model, 'likes_count', {pk: -n for pk, n in removed.items()})
+    elif action == 'post_add' and pk_set:
+        # pk_set ne contient que les liens réellement créés
+        adjust_counters(liked_model, 'likes_count', Counter(pk_set) if reverse else {instance.pk: len(pk_set)})
+
+# Signaux pour invalider les IDs likés mis en cache par utilisateur (voir likes.py)
+@receiver(post_save, sender=ProjectLike)
+@receiver(post_delete, sender=ProjectLike)
+def invalidate_liked_projects(sender, instance, **kwargs):
+    from .likes import invalidate_user
+    invalidate_user(instance.user_id)
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+def invalidate_liked_comments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # clear() ne fournit pas les utilisateurs concernés
+        instance._cleared_likers = list(sender.objects.filter(comment_id=instance.pk).values_list('user_id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        from .likes import invalidate_user
+        if reverse:
+            invalidate_user(instance.pk)
+        elif action == 'post_clear':
+            invalidate_user(*instance.__dict__.pop('_cleared_likers', ()))
+        elif pk_set:
+            invalidate_user(*pk_set)
+
+# Signaux pour tenir à jour PortfolioStats par deltas (voir site_stats.py)
+@receiver(post_save, sender=Project)
+def count_new_project(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .site_stats import apply_deltas
+        apply_deltas(total_projects=1, total_views=instance.views_count)
+
+@receiver(post_delete, sender=Project)
+def count_deleted_project(sender, instance, **kwargs):
+    from .site_stats import apply_deltas
+    apply_deltas(total_projects=-1, total_views=-instance.views_count)
+
+@receiver(pre_save, sender=BlogPost)
+def remember_blog_post_publication(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._was_published = False
+    else:
+        instance._was_published = BlogPost.objects.filter(pk=instance.pk, is_published=True).exists()
+
+@receiver(post_save, sender=BlogPost)
+def count_published_blog_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from .site_stats import apply_deltas
+    apply_deltas(
+        total_blog_posts=int(instance.is_published) - int(instance._was_published),
+        total_views=instance.views_count if created else 0,
+    )
+
+@receiver(post_delete, sender=BlogPost)
+def count_deleted_blog_post(sender, instance, **kwargs):
+    from .site_stats import apply_deltas
+    apply_deltas(total_blog_posts=-int(instance.is_published), total_views=-instance.views_count)
+
+@receiver(post_save, sender=ProjectLike)
+def count_new_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .site_stats import apply_deltas
+        apply_deltas(total_likes=1)
+
+@receiver(post_delete, sender=ProjectLike)
+def count_deleted_like(sender, instance, **kwargs):
+    from .site_stats import apply_deltas
+    apply_deltas(total_likes=-1)
+
+@receiver(counters_flushed)
+def count_flushed_views(sender, deltas, **kwargs):
+    views = sum(
+        sum(deltas.get((model._meta.label, 'views_count'), {}).values())
+        for model in (Project, BlogPost)
+    )
+    if views:
+        from .site_stats import apply_deltas
+        apply_deltas(total_views=views)
+
+# Tags de cache (voir caching.py) invalidés à chaque modification d'un modèle
+CACHE_TAGS = {
+    Category: ('category-list',),
+    Tag: ('tag-list',),
+    Project: ('project-list',),
+    BlogPost: ('blog-list',),
+    Resume: ('resume-list',),
+    PortfolioStats: ('portfolio-stats',),
+    ProjectLike: ('project-engagement',),
+    Comment: ('project-engagement',),
+    About: ('about',),
+    Testimonial: ('testimonial-list',),
+}
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_model_cache_tags(sender, instance, **kwargs):
+    tags = CACHE_TAGS.get(sender)
+    if tags:
+        # Tags de liste + tag de l'objet lui-même (ex. "project:42")
+        invalidate(*tags, f'{sender._meta.model_name}:{instance.pk}')
+
+@receiver(m2m_changed, sender=Project.tags.through)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def invalidate_tag_cache(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate('tag-list')
+
+# Signaux pour maintenir l'index de recherche plein texte (voir search.py)
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_project(instance)
+
+@receiver(post_save, sender=BlogPost)
+def index_blog_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_blog_post(instance)
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    search.remove('project', instance.pk)
+
+@receiver(post_delete, sender=BlogPost)
+def unindex_blog_post(sender, instance, **kwargs):
+    search.remove('blogpost', instance.pk)
+
+@receiver(m2m_changed, sender=Project.tags.through)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def reindex_tagged_objects(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        objects = [instance]
+    elif sender is Project.tags.through:
+        # Modification depuis le tag : pk_set contient les projets (vide pour clear)
+        objects = Project.objects.filter(pk__in=pk_set or []).prefetch_related('tags')
+    else:
+        objects = BlogPost.objects.filter(pk__in=pk_set or []).prefetch_related('tags')
+    for obj in objects:
+        if isinstance(obj, Project):
+            search.index_project(obj)
+        elif isinstance(obj, BlogPost):
+            search.index_blog_post(obj)
+
+def _reindex_tag_objects(project_ids, post_ids):
+    for project in Project.objects.filter(pk__in=project_ids).prefetch_related('tags'):
+        search.index_project(project)
+    for post in BlogPost.objects.filter(pk__in=post_ids).prefetch_related('tags'):
+        search.index_blog_post(post)
+
+@receiver(post_save, sender=Tag)
+def reindex_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and search.is_available():
+        _reindex_tag_objects(
+            instance.project_set.values_list('pk', flat=True),
+            instance.blogpost_set.values_list('pk', flat=True),
+        )
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_objects(sender, instance, **kwargs):
+    # Les liaisons sont supprimées sans m2m_changed : on les mémorise avant suppression
+    if search.is_available():
+        instance._search_reindex = (
+            list(instance.project_set.values_list('pk', flat=True)),
+            list(instance.blogpost_set.values_list('pk', flat=True)),
+        )
+
+@receiver(post_delete, sender=Tag)
+def reindex_deleted_tag(sender, instance, **kwargs):
+    if hasattr(instance, '_search_reindex'):
+        _reindex_tag_objects(*instance._search_reindex)
+
+# Signal pour générer les déclinaisons responsives des images (voir images.py)
+@receiver(post_save)
+def schedule_image_derivatives(sender, instance, raw=False, **kwargs):
+    field = images.IMAGE_FIELDS.get(sender._meta.label)
+    if field and not raw:
+        name = getattr(instance, field).name
+        if images.is_supported(name):
+            transaction.on_commit(lambda: images.schedule(name))
+
 # ===== MODÈLES GOOGLE ADSENSE =====
 
 class AdSenseConfig(models.Model):
@@ -576,9 +864,10 @@ class AdUnit(models.Model):
 
         return True
 
-    def get_ad_code(self):
+    def get_ad_code(self, config=None):
         """Génère le code HTML de l'annonce AdSense"""
-        config = AdSenseConfig.get_config()
+        if config is None:
+            config = AdSenseConfig.get_config()
 
         if not config.is_active:
             return ""
@@ -617,9 +906,12 @@ class AdUnit(models.Model):
 
 class AdPerformance(models.Model):
     """Suivi des performances des annonces"""
+    # Table pouvant vivre dans la base d'activité (routers.py) : pas de contrainte en base,
+    # la suppression en cascade est faite par le signal delete_ad_unit_performances
     ad_unit = models.ForeignKey(
         AdUnit,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name='performances',
         verbose_name="Unité publicitaire"
     )
@@ -658,7 +950,123 @@ class AdPerformance(models.Model):
 
     def calculate_ctr(self):
         """Calcule le CTR automatiquement"""
-        if self.impressions > 0:
-            self.ctr = (self.clicks / self.impressions) * 100
-        else:
-            self.ctr = 0.00
\ No newline at end of file
+        self.ctr = compute_ctr(self.clicks, self.impressions)
+
+def compute_ctr(clicks, impressions):
+    """CTR en pourcentage, arrondi au centième (0 sans impression)"""
+    if not impressions:
+        return Decimal('0.00')
+    return (Decimal(clicks) * 100 / Decimal(impressions)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+class AdPerformanceRollup(models.Model):
+    """Performances agrégées par semaine ou par mois et par position (voir ad_reports.py)"""
+    PERIODS = [
+        ('week', 'Semaine'),
+        ('month', 'Mois'),
+    ]
+
+    period = models.CharField(max_length=5, choices=PERIODS, verbose_name="Période")
+    period_start = models.DateField(verbose_name="Début de période")
+    position = models.CharField(max_length=20, choices=AdUnit.POSITIONS, verbose_name="Position")
+    impressions = models.PositiveBigIntegerField(default=0, verbose_name="Impressions")
+    clicks = models.PositiveBigIntegerField(default=0, verbose_name="Clics")
+    ctr = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="CTR (%)")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Revenus ($)")
+
+    class Meta:
+        verbose_name = "Rapport publicitaire"
+        verbose_name_plural = "Rapports publicitaires"
+        ordering = ['-period_start', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start', 'position'], name='ad_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} du {self.period_start} - {self.position}"
+
+# Les rapports des périodes touchées sont recalculés après toute saisie dans l'admin
+@receiver(post_delete, sender=AdUnit)
+def delete_ad_unit_performances(sender, instance, **kwargs):
+    AdPerformance.objects.filter(ad_unit_id=instance.pk).delete()
+
+@receiver(post_save, sender=AdPerformance)
+@receiver(post_delete, sender=AdPerformance)
+def refresh_ad_performance_rollups(sender, instance, raw=False, **kwargs):
+    if not raw:
+        from .ad_reports import refresh_rollups
+        refresh_rollups(instance.date, instance.date)
+
+# L'index des emplacements publicitaires (ads.py) est reconstruit après toute modification
+CACHE_TAGS.update({
+    AdSenseConfig: ('ad-placements',),
+    AdUnit: ('ad-placements',),
+})
+
+# ===== STATISTIQUES DE FRÉQUENTATION =====
+# Événements bruts insérés par lots (voir analytics.py), agrégés par heure et
+# par jour par la commande rollup_view_events. Les pages et l'admin ne lisent
+# que les agrégats.
+
+VIEW_KIND_CHOICES = [
+    ('project', 'Projet'),
+    ('blogpost', 'Article de blog'),
+    ('resume', 'CV'),
+]
+
+class ViewEvent(models.Model):
+    """Vue brute d'un projet, d'un article ou d'un CV (append-only)"""
+    kind = models.CharField(max_length=10, choices=VIEW_KIND_CHOICES, verbose_name="Type")
+    object_id = models.PositiveIntegerField(verbose_name="Objet")
+    referrer = models.CharField(max_length=255, blank=True, verbose_name="Site référent")
+    device = models.CharField(max_length=10, verbose_name="Appareil")
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Vue"
+        verbose_name_plural = "Vues"
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.created_at}"
+
+class ViewRollup(models.Model):
+    kind = models.CharField(max_length=10, choices=VIEW_KIND_CHOICES, verbose_name="Type")
+    object_id = models.PositiveIntegerField(verbose_name="Objet")
+    referrer = models.CharField(max_length=255, blank=True, verbose_name="Site référent")
+    device = models.CharField(max_length=10, verbose_name="Appareil")
+    views = models.PositiveIntegerField(default=0, verbose_name="Vues")
+
+    # Dimensions d'un agrégat (hors période)
+    DIMENSIONS = ('kind', 'object_id', 'referrer', 'device')
+
+    class Meta:
+        abstract = True
+
+class HourlyViewRollup(ViewRollup):
+    hour = models.DateTimeField(verbose_name="Heure")
+
+    class Meta:
+        verbose_name = "Vues par heure"
+        verbose_name_plural = "Vues par heure"
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'kind', 'object_id', 'referrer', 'device'],
+                                    name='hourly_view_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.hour}"
+
+class DailyViewRollup(ViewRollup):
+    day = models.DateField(verbose_name="Jour")
+
+    class Meta:
+        verbose_name = "Vues par jour"
+        verbose_name_plural = "Vues par jour"
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'kind', 'object_id', 'referrer', 'device'],
+                                    name='daily_view_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.day}"
@@ -0,0 +1,83 @@
+from django.urls import reverse
+
+from . import metrics
+from .models import Comment, Reply, Notification
+
+
+def project_participant_ids(project):
+    """
+    Retourne les IDs de tous les participants d'un projet (propriétaire,
+    auteurs de commentaires et auteurs de réponses) en une seule requête.
+    """
+    comment_authors = Comment.objects.filter(project_id=project.pk).order_by().values_list('author_id', flat=True)
+    reply_authors = Reply.objects.filter(comment__project_id=project.pk).order_by().values_list('author_id', flat=True)
+
+    participants = set(comment_authors.union(reply_authors))
+    participants.add(project.user_id)
+    return participants
+
+
+def fan_out(user_ids, build_message, link):
+    """
+    Crée une notification pour chaque utilisateur avec un seul bulk_create.
+    `build_message` reçoit l'ID de l'utilisateur et retourne son message.
+    """
+    notifications = [
+        Notification(user_id=user_id, message=build_message(user_id), link=link)
+        for user_id in sorted(user_ids)
+    ]
+    if notifications:
+        Notification.objects.bulk_create(notifications)
+    metrics.NOTIFICATION_FANOUT.observe(len(notifications))
+    return notifications
+
+
+def notify_new_comment(comment):
+    """
+    Notifie les participants d'un projet lorsqu'un commentaire est ajouté.
+    Un commentaire avec `parent` (formulaire de réponse) est notifié comme une réponse.
+    """
+    if comment.parent_id:
+        return _notify_reply(comment.project, comment.parent, comment.author)
+
+    project = comment.project
+    author = comment.author
+
+    participants = project_participant_ids(project)
+    participants.discard(author.pk)
+
+    def build_message(user_id):
+        if user_id == project.user_id:
+            # Message spécial pour le propriétaire du projet
+            return f"{author.username} a commenté votre projet : {project.title}"
+        # Message pour les autres participants
+        return f"{author.username} a ajouté un commentaire sur le projet : {project.title}"
+
+    link = reverse('project_detail', args=[project.pk]) + f"#comment-{comment.pk}"
+    return fan_out(participants, build_message, link)
+
+
+def notify_new_reply(reply):
+    """Notifie les participants d'un projet lorsqu'une réponse est ajoutée"""
+    comment = reply.comment
+    return _notify_reply(comment.project, comment, reply.author)
+
+
+def _notify_reply(project, comment, author):
+    """Notifie l'auteur du commentaire, le propriétaire et les participants d'une réponse à `comment`"""
+    participants = project_participant_ids(project)
+    participants.add(comment.author_id)
+    participants.discard(author.pk)
+
+    def build_message(user_id):
+        if user_id == comment.author_id:
+            # Message spécial pour l'auteur du commentaire original
+            return f"{author.username} a répondu à votre commentaire sur le projet : {project.title}"
+        if user_id == project.user_id:
+            # Message pour le propriétaire du projet
+            return f"{author.username} a répondu à un commentaire sur votre projet : {project.title}"
+        # Message pour les autres participants
+        return f"{author.username} a ajouté une réponse sur le projet : {project.title}"
+
+    link = reverse('project_detail', args=[project.pk]) + f"#comment-{comment.pk}"
+    return fan_out(participants, build_message, link)
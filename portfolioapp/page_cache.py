@@ -0,0 +1,195 @@
+"""
+Cache de pages complètes pour les visiteurs anonymes.
+
+Une page est mise en cache par (chemin, query string, langue, type d'appareil)
+et dépend de tags (voir caching.py) : toute modification d'un modèle lié
+invalide les pages concernées via les signaux de models.py.
+
+- seules les requêtes GET anonymes réussies (200) sont mises en cache, et
+  jamais une réponse qui modifie la session, dépose des cookies ou affiche
+  des messages flash ;
+- le jeton CSRF des formulaires est remplacé à chaque service de la page ;
+- les incréments de compteurs et les vues enregistrées par la vue (voir
+  counters.py et analytics.py) sont rejoués à chaque hit ;
+- l'en-tête `X-Page-Cache-Bypass: <PAGE_CACHE_BYPASS_TOKEN>` force un
+  nouveau rendu (qui remplace l'entrée en cache) ;
+- les hits/miss sont comptés par vue dans le cache (`stats()`, commande
+  `page_cache_stats`), partagés entre workers si le backend de cache l'est
+  (Redis, Memcached, base) ; avec METRICS_ENABLED, aussi dans les métriques
+  (metrics.py), additionnées sur tous les workers (`metrics_stats()`).
+"""
+import hashlib
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+
+from . import analytics, counters, metrics
+from .caching import versioned_key
+from .devices import device_type
+
+# Données du gabarit de base (context processor global, publicités). Les
+# statistiques globales n'en font pas partie : elles changent à chaque flush
+# des compteurs de vues et seule la page /stats/ en dépend.
+BASE_TAGS = ('category-list', 'tag-list', 'project-list', 'resume-list', 'ad-placements')
+HEADER = 'X-Page-Cache'
+STATS_PREFIX = 'page-cache:'
+OUTCOMES = ('hit', 'miss', 'bypass')
+
+_CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+_CSRF_PLACEHOLDER = b'__page_cache_csrf__'
+# En-têtes ajoutés par les middlewares à chaque réponse : inutile de les stocker
+_SKIPPED_HEADERS = {'content-length', 'set-cookie', 'vary'}
+
+# Noms des vues décorées, pour relire leurs compteurs
+_views = set()
+
+
+def _timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+
+def _enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', True)
+
+
+def _page_key(request):
+    query = '&'.join(sorted(request.GET.urlencode().split('&'))) if request.GET else ''
+    raw = '|'.join((request.path, query, translation.get_language() or '', device_type(request)))
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _bypass_requested(request):
+    token = getattr(settings, 'PAGE_CACHE_BYPASS_TOKEN', '')
+    return bool(token) and request.headers.get('X-Page-Cache-Bypass') == token
+
+
+def _stats_key(view_name, outcome):
+    return f'{STATS_PREFIX}{view_name}:{outcome}'
+
+
+def _count(view_name, outcome):
+    key = _stats_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Premier comptage, ou clé évincée
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+    metrics.PAGE_CACHE.inc(view=view_name, outcome=outcome)
+
+
+def _view_names():
+    # Les vues décorées s'enregistrent à l'import (commande de gestion comprise)
+    from . import views  # noqa: F401
+    return sorted(_views)
+
+
+def stats():
+    """{vue: {'hit': n, 'miss': n, 'bypass': n}} lus dans le cache"""
+    names = _view_names()
+    keys = {_stats_key(name, outcome): (name, outcome) for name in names for outcome in OUTCOMES}
+    values = cache.get_many(keys)
+    result = {name: dict.fromkeys(OUTCOMES, 0) for name in names}
+    for key, (name, outcome) in keys.items():
+        result[name][outcome] = values.get(key, 0)
+    return result
+
+
+def reset_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in _view_names() for outcome in OUTCOMES])
+
+
+def metrics_stats():
+    """Mêmes compteurs, additionnés sur tous les workers (fichiers de METRICS_DIR)"""
+    result = {}
+    for (name, labels), value in metrics.collect().items():
+        if name == metrics.PAGE_CACHE.name:
+            labels = dict(labels)
+            result.setdefault(labels['view'], dict.fromkeys(OUTCOMES, 0))[labels['outcome']] += value
+    return dict(sorted(result.items()))
+
+
+def _has_pending_messages(request):
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    session = getattr(request, 'session', None)
+    return session is not None and SessionStorage.session_key in session
+
+
+def _is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if response.has_header('Cache-Control') and 'private' in response['Cache-Control']:
+        return False
+    session = getattr(request, 'session', None)
+    if session is not None and session.modified:
+        return False
+    storage = getattr(request, '_messages', None)
+    return storage is None or not (storage.used or len(storage))
+
+
+def _store(key, request, response, increments, views):
+    content = response.content
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        content = _CSRF_INPUT_RE.sub(rb'\1' + _CSRF_PLACEHOLDER + rb'\2', content)
+    headers = {name: value for name, value in response.items() if name.lower() not in _SKIPPED_HEADERS}
+    cache.set(key, {'content': content, 'headers': headers, 'increments': increments, 'views': views}, _timeout())
+
+
+def _build(request, entry):
+    content = entry['content']
+    if _CSRF_PLACEHOLDER in content:
+        content = content.replace(_CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content)
+    for name, value in entry['headers'].items():
+        response[name] = value
+    return response
+
+
+def cache_anonymous_page(*tags):
+    """
+    Décorateur de vue. Les tags peuvent utiliser les arguments de l'URL,
+    ex. @cache_anonymous_page('blog-list', 'blogpost:{slug}').
+    """
+    def decorator(view):
+        view_name = view.__name__
+        _views.add(view_name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _enabled() or request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            # Des messages flash en attente doivent être affichés par un rendu complet
+            if _has_pending_messages(request):
+                return view(request, *args, **kwargs)
+
+            key = versioned_key(_page_key(request), [*BASE_TAGS, *(tag.format(**kwargs) for tag in tags)])
+            bypass = _bypass_requested(request)
+            if not bypass:
+                entry = cache.get(key)
+                if entry is not None:
+                    _count(view_name, 'hit')
+                    counters.replay(entry['increments'])
+                    analytics.replay(request, entry.get('views', ()))
+                    response = _build(request, entry)
+                    response[HEADER] = 'HIT'
+                    return response
+
+            with counters.recording() as increments, analytics.recording() as views:
+                response = view(request, *args, **kwargs)
+            outcome = 'bypass' if bypass else 'miss'
+            _count(view_name, outcome)
+            if _is_cacheable(request, response):
+                _store(key, request, response, increments, views)
+            response[HEADER] = outcome.upper()
+            return response
+
+        return wrapper
+    return decorator
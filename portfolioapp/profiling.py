@@ -0,0 +1,166 @@
+"""
+Profilage CPU à la demande (ProfilingMiddleware, middleware.py).
+
+Une requête est exécutée sous cProfile :
+- à la demande d'un membre du staff : en-tête `X-Profile: 1` ou paramètre
+  `?_profile=1` (ignorés pour les autres utilisateurs) ;
+- ou par échantillonnage d'une fraction PROFILING_SAMPLE_RATE des requêtes.
+
+Chaque rapport est un fichier pstats de PROFILING_DIR (lisible avec
+`python -m pstats`, snakeviz, flameprof...) accompagné de ses métadonnées en
+JSON ; seuls les PROFILING_MAX_REPORTS plus récents sont conservés. La page
+staff `cpu_profiles` liste les requêtes profilées les plus lentes par vue.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = '_profile'
+REPORT_RE = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+# cProfile : un seul profilage à la fois par worker
+_profiling_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def _profiles_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'var' / 'profiles'))
+
+
+def _max_reports():
+    return getattr(settings, 'PROFILING_MAX_REPORTS', 200)
+
+
+def trigger(request):
+    """Raison de profiler la requête ('header', 'query' ou 'sample'), None sinon"""
+    if request.META.get(HEADER) == '1':
+        requested = 'header'
+    elif request.GET.get(QUERY_PARAM) == '1':
+        requested = 'query'
+    else:
+        requested = None
+    # request.user n'est chargé que si le profilage est demandé
+    if requested and request.user.is_staff:
+        return requested
+    if random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0):
+        return 'sample'
+    return None
+
+
+@contextmanager
+def profile():
+    """Profileur actif dans le bloc, ou None si un autre profilage est en cours"""
+    if not _profiling_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+    finally:
+        _profiling_lock.release()
+
+
+def store(profiler, request, response, duration, reason):
+    """Écrit le rapport et ses métadonnées, puis applique la rétention. Retourne le nom du rapport."""
+    match = request.resolver_match
+    name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    meta = {
+        'name': name,
+        'time': timezone.now().isoformat(),
+        'view': match.view_name if match else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'trigger': reason,
+    }
+    directory = _profiles_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f'{name}.prof')
+        # Métadonnées écrites en dernier : un rapport listé a toujours son fichier pstats
+        tmp_path = directory / f'{name}.tmp'
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, directory / f'{name}.json')
+        prune()
+    except OSError:
+        # Rapport perdu ; la réponse profilée est renvoyée telle quelle
+        logger.exception("Écriture du rapport de profilage impossible")
+        return None
+    return name
+
+
+def prune(limit=None):
+    """Supprime les rapports les plus anciens au-delà de `limit`. Retourne le nombre supprimé."""
+    limit = _max_reports() if limit is None else limit
+    # Noms préfixés par l'horodatage en ns : l'ordre alphabétique est chronologique
+    metas = sorted(_profiles_dir().glob('*.json'))
+    expired = metas[:max(len(metas) - limit, 0)]
+    for path in expired:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+    return len(expired)
+
+
+def reports():
+    """Métadonnées de tous les rapports conservés"""
+    directory = _profiles_dir()
+    found = []
+    for path in sorted(directory.glob('*.json')) if directory.exists() else []:
+        try:
+            found.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Rapport supprimé par la rétention d'un autre worker
+            continue
+    return found
+
+
+def slowest_by_view(limit=10):
+    """[(vue, [rapports du plus lent au plus rapide]), ...], vues triées par leur rapport le plus lent"""
+    by_view = {}
+    for meta in reports():
+        by_view.setdefault(meta['view'] or '(non résolue)', []).append(meta)
+    grouped = [
+        (view, sorted(metas, key=lambda meta: meta['duration_ms'], reverse=True)[:limit])
+        for view, metas in by_view.items()
+    ]
+    return sorted(grouped, key=lambda item: item[1][0]['duration_ms'], reverse=True)
+
+
+def report_path(name):
+    """Chemin du fichier pstats d'un rapport, None si le nom est invalide ou le rapport supprimé"""
+    if not REPORT_RE.match(name):
+        return None
+    path = _profiles_dir() / f'{name}.prof'
+    return path if path.exists() else None
+
+
+def summary(path, sort='cumulative', limit=60):
+    """Fonctions les plus coûteuses d'un rapport, au format texte de pstats"""
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,74 @@
+"""
+Budgets de requêtes SQL par route de portfolioapp/urls.py (manifeste unique).
+
+Vérifiés par QueryBudgetTests (tests.py) sur une base remplie avec
+FIXTURE_SIZES (plusieurs pages de projets et d'articles, fils de
+commentaires avec réponses et likes), cache vidé avant chaque requête :
+le nombre de requêtes ne doit pas dépendre du volume. Un dépassement fait
+échouer le test avec le SQL et le gabarit/ligne de code d'origine de chaque
+requête.
+
+Un budget ne se relève qu'en connaissance de cause, dans le même commit que
+le changement qui l'explique. "anonymous" sur une vue protégée mesure la
+redirection vers la connexion.
+"""
+
+FIXTURE_SIZES = {
+    'projects': 24,
+    'comments': 400,
+    'notifications': 60,
+    'users': 8,
+    'blog_posts': 12,
+}
+
+BUDGETS = {
+    # Pages principales
+    'home': {'anonymous': 4, 'user': 7},
+    'about': {'anonymous': 3, 'user': 6},
+    'contact': {'anonymous': 2, 'user': 5},
+
+    # Projets
+    'projects': {'anonymous': 7, 'user': 11},
+    'project_detail': {'anonymous': 7, 'user': 12},
+    'project_detail_en': {'anonymous': 7, 'user': 12},
+    'search_projects': {'anonymous': 10, 'user': 13},
+    'toggle_like': {'anonymous': 0, 'user': 10},
+
+    # Commentaires
+    'add_comment': {'anonymous': 0, 'user': 9},
+    'add_reply': {'anonymous': 0, 'user': 11},
+    'toggle_like_comment': {'anonymous': 0, 'user': 12},
+    'delete_comment': {'anonymous': 0, 'user': 5},
+    'edit_comment': {'anonymous': 0, 'user': 5},
+    'get_replies': {'anonymous': 3, 'user': 7},
+    'report_comment': {'anonymous': 0, 'user': 4},
+
+    # Blog
+    'blog': {'anonymous': 14, 'user': 17},
+    'blog_detail': {'anonymous': 6, 'user': 9},
+
+    # Témoignages, CV, statistiques
+    'testimonials': {'anonymous': 4, 'user': 7},
+    'download_resume': {'anonymous': 1, 'user': 1},
+    'portfolio_stats': {'anonymous': 10, 'user': 13},
+    'metrics': {'anonymous': 0, 'user': 0},
+    'cpu_profiles': {'anonymous': 0, 'user': 5},
+    'cpu_profile_report': {'anonymous': 0, 'user': 2},
+
+    # Authentification et profil
+    'signup': {'anonymous': 2, 'user': 5},
+    'profile': {'anonymous': 0, 'user': 6},
+    'edit_profile': {'anonymous': 0, 'user': 6},
+    # Le cas reconnecte l'utilisateur avant chaque requête : la session existe toujours
+    'logout': {'anonymous': 4, 'user': 4},
+
+    # Notifications
+    'unread_notifications': {'anonymous': 0, 'user': 3},
+    'view_notifications': {'anonymous': 0, 'user': 6},
+    'mark_notification_as_read': {'anonymous': 0, 'user': 3},
+    'mark_all_notifications_as_read': {'anonymous': 0, 'user': 4},
+
+    # Pages légales
+    'privacy_policy': {'anonymous': 2, 'user': 5},
+    'terms_of_service': {'anonymous': 2, 'user': 5},
+}
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .caching import get_or_set
+from .models import Project
+
+UNCATEGORIZED = "non_categorise"
+
+
+def _build_projects_by_category(limit):
+    """
+    Top-N projets les plus récents de chaque catégorie, en une seule requête
+    fenêtrée (ROW_NUMBER() OVER (PARTITION BY category_id ...)). Les compteurs
+    de likes et de commentaires sont stockés sur le projet.
+    """
+    ranked = Project.objects.select_related('category').annotate(
+        category_rank=Window(
+            RowNumber(),
+            partition_by=F('category_id'),
+            order_by=[F('created_at').desc(), F('pk').desc()],
+        ),
+    ).filter(category_rank__lte=limit).order_by(F('category_id').asc(nulls_last=True), 'category_rank')
+
+    projects_by_category = {}
+    for project in ranked:
+        key = project.category if project.category_id else UNCATEGORIZED
+        projects_by_category.setdefault(key, []).append(project)
+    return projects_by_category
+
+
+def projects_by_category(limit=3):
+    """Projets de la barre « autres réalisations », mis en cache jusqu'à la prochaine modification"""
+    timeout = getattr(settings, 'RELATED_PROJECTS_CACHE_TIMEOUT', 3600)
+    return get_or_set(
+        f'related-projects:{limit}',
+        ['project-list', 'category-list', 'project-engagement'],
+        lambda: _build_projects_by_category(limit),
+        timeout,
+    )
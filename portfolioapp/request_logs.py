@@ -0,0 +1,70 @@
+"""
+Outils communs à l'instrumentation par requête (sql_instrumentation.py,
+template_profiling.py) :
+- `RequestLog` : journal JSON lines à rotation par taille, réglé par les
+  paramètres <PRÉFIXE>_LOG, <PRÉFIXE>_LOG_MAX_BYTES et <PRÉFIXE>_LOG_BACKUPS ;
+- `append_server_timing` : ajout d'une mesure à l'en-tête Server-Timing.
+"""
+import json
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestLog:
+    """Une ligne JSON par requête mesurée, le fichier étant rouvert si le paramètre change"""
+
+    def __init__(self, prefix, default_path):
+        self.prefix = prefix
+        # Relatif à BASE_DIR, résolu à l'écriture
+        self.default_path = default_path
+        self._lock = threading.Lock()
+        self._handler = None
+
+    def _setting(self, suffix, default):
+        return getattr(settings, f'{self.prefix}_{suffix}', default)
+
+    def path(self):
+        return Path(self._setting('LOG', Path(settings.BASE_DIR) / self.default_path))
+
+    def files(self, path=None):
+        """Journal courant et fichiers de rotation (.1 = le plus récent), du plus ancien au plus récent"""
+        path = Path(path) if path else self.path()
+        backups = [backup for backup in path.parent.glob(f'{path.name}.*') if backup.suffix[1:].isdigit()]
+        backups.sort(key=lambda backup: int(backup.suffix[1:]), reverse=True)
+        return [candidate for candidate in (*backups, path) if candidate.exists()]
+
+    def _log_handler(self):
+        path = self.path()
+        with self._lock:
+            if self._handler is None or Path(self._handler.baseFilename) != path.resolve():
+                if self._handler is not None:
+                    self._handler.close()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._handler = RotatingFileHandler(
+                    path,
+                    maxBytes=self._setting('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                    backupCount=self._setting('LOG_BACKUPS', 5),
+                    encoding='utf-8',
+                )
+            return self._handler
+
+    def write(self, data):
+        record = logging.makeLogRecord({'name': __name__, 'msg': json.dumps(data, ensure_ascii=False)})
+        try:
+            self._log_handler().handle(record)
+        except OSError:
+            # Mesure perdue, la réponse est envoyée normalement
+            logger.exception("Écriture du journal %s impossible", self.prefix)
+
+
+def append_server_timing(response, value):
+    """Ajoute `value` à l'en-tête Server-Timing déjà posé par un autre middleware"""
+    if response.has_header('Server-Timing'):
+        value = f"{response['Server-Timing']}, {value}"
+    response['Server-Timing'] = value
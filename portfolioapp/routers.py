@@ -0,0 +1,63 @@
+"""
+Base SQLite séparée pour les tables à forte écriture (optionnelle).
+
+Avec ACTIVITY_DATABASE renseigné (voir settings.py), les notifications, les
+événements et agrégats de vues, les performances AdSense et les sessions sont
+lus et écrits dans la base "activity" ; tout le reste (projets, articles,
+utilisateurs...) reste dans "default". SQLite n'ayant qu'un écrivain par
+fichier, une rafale de notifications ou un flush de vues ne bloque plus les
+lectures et écritures du contenu.
+
+Les deux bases ne peuvent pas être jointes : les clés étrangères des tables
+d'activité vers le contenu sont sans contrainte en base (db_constraint=False)
+et leurs suppressions en cascade sont faites par des signaux (models.py).
+Les opérations RunPython sans indication de modèle ne s'exécutent que sur
+"default".
+
+Le compteur de notifications non lues (Profile, "default") et les
+notifications ("activity") sont écrits dans deux transactions ouvertes
+ensemble (models.unread_atomic) mais validées l'une après l'autre : un échec
+entre les deux commits, ou un signal de notification hors de unread_atomic
+(création et suppression unitaires), peut faire dériver le compteur. Avec ce
+découpage, lancer périodiquement `python manage.py reconcile_unread_notifications`.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+ACTIVITY = 'activity'
+
+ACTIVITY_MODELS = frozenset({
+    'portfolioapp.notification',
+    'portfolioapp.viewevent',
+    'portfolioapp.hourlyviewrollup',
+    'portfolioapp.dailyviewrollup',
+    'portfolioapp.adperformance',
+    'portfolioapp.adperformancerollup',
+    'sessions.session',
+})
+
+
+def is_activity_model(model):
+    return model._meta.label_lower in ACTIVITY_MODELS
+
+
+class ActivityRouter:
+    def _db(self, model):
+        # Toujours une base explicite : sans réponse, Django suivrait la base de
+        # l'instance liée (un AdUnit lu depuis une AdPerformance irait dans "activity")
+        return ACTIVITY if is_activity_model(model) else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._db(model)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Clés étrangères sans contrainte des tables d'activité vers le contenu
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return db == DEFAULT_DB_ALIAS
+        routed = f'{app_label}.{model_name}' in ACTIVITY_MODELS
+        return routed if db == ACTIVITY else not routed
@@ -0,0 +1,218 @@
+"""
+Index de recherche plein texte (SQLite FTS5) pour les projets et articles de blog.
+
+Le HTML CKEditor est retiré avant indexation. Chaque document occupe la ligne
+rowid = pk * 2 + type, ce qui permet les mises à jour/suppressions par clé.
+Les résultats sont classés par BM25 et accompagnés d'un extrait surligné.
+Si FTS5 n'est pas disponible (autre base de données), `is_available()`
+retourne False et les vues reviennent aux filtres `icontains`.
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import F
+from django.utils.html import escape, strip_tags
+
+TABLE = 'portfolioapp_search_index'
+KINDS = {'project': 0, 'blogpost': 1}
+COLUMNS = ('title', 'body', 'excerpt', 'technologies', 'tags')
+# Poids BM25 des colonnes, dans l'ordre de COLUMNS
+WEIGHTS = (10.0, 1.0, 3.0, 5.0, 5.0)
+
+# Marqueurs de surlignage : caractères de contrôle absents du texte indexé,
+# remplacés par <mark> après échappement de l'extrait.
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_SPACES_RE = re.compile(r'\s+')
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_TABLE_SQL = f"DROP TABLE IF EXISTS {TABLE}"
+
+_available = None
+
+
+def is_available():
+    """Vrai si la base est SQLite et que la table FTS5 existe"""
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+    return _available
+
+
+def reset_availability():
+    global _available
+    _available = None
+
+
+def html_to_text(value):
+    """Retire le HTML (CKEditor) et normalise les espaces"""
+    text = html.unescape(strip_tags(value or ''))
+    return _SPACES_RE.sub(' ', text.replace(_MARK_START, '').replace(_MARK_END, '')).strip()
+
+
+def _rowid(kind, pk):
+    return pk * 2 + KINDS[kind]
+
+
+def project_document(project):
+    return (
+        html_to_text(project.title),
+        html_to_text(project.description),
+        '',
+        html_to_text(project.technologies),
+        ' '.join(tag.name for tag in project.tags.all()),
+    )
+
+
+def blog_post_document(post):
+    return (
+        html_to_text(post.title),
+        html_to_text(post.content),
+        html_to_text(post.excerpt),
+        '',
+        ' '.join(tag.name for tag in post.tags.all()),
+    )
+
+
+def _write(cursor, rows):
+    """Remplace les documents donnés : rows = [(rowid, document ou None)]"""
+    cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(rowid,) for rowid, _ in rows])
+    inserts = [(rowid, *document) for rowid, document in rows if document is not None]
+    if inserts:
+        placeholders = ', '.join(['%s'] * (len(COLUMNS) + 1))
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES ({placeholders})",
+            inserts,
+        )
+
+
+def index_project(project):
+    if is_available():
+        with connection.cursor() as cursor:
+            _write(cursor, [(_rowid('project', project.pk), project_document(project))])
+
+
+def index_blog_post(post):
+    if is_available():
+        # Seuls les articles publiés sont consultables
+        document = blog_post_document(post) if post.is_published else None
+        with connection.cursor() as cursor:
+            _write(cursor, [(_rowid('blogpost', post.pk), document)])
+
+
+def remove(kind, pk):
+    if is_available():
+        with connection.cursor() as cursor:
+            _write(cursor, [(_rowid(kind, pk), None)])
+
+
+def rebuild(project_model, blog_post_model, batch_size=500, using=None):
+    """
+    Reconstruit tout l'index par lots de `batch_size` documents.
+    Les modèles sont passés en paramètre pour pouvoir être appelé depuis une migration.
+    Retourne le nombre de documents indexés.
+    """
+    db = connections[using or DEFAULT_DB_ALIAS]
+    indexed = 0
+    with db.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    sources = (
+        ('project', project_model.objects.all(), project_document),
+        ('blogpost', blog_post_model.objects.filter(is_published=True), blog_post_document),
+    )
+    for kind, queryset, build in sources:
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').prefetch_related('tags')[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic(using=db.alias), db.cursor() as cursor:
+                _write(cursor, [(_rowid(kind, obj.pk), build(obj)) for obj in batch])
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+    return indexed
+
+
+def build_match_query(query):
+    """
+    Transforme la saisie utilisateur en requête FTS5 sûre : chaque mot devient
+    un préfixe entre guillemets ("mot"*), les mots étant combinés par AND.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _highlight(snippet):
+    return escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def search(kind, query, limit=None, queryset=None):
+    """
+    Recherche dans l'index. Retourne la liste des pk triée par pertinence BM25
+    (meilleur résultat en premier). Les extraits sont calculés à part, pour la
+    seule page affichée (voir `snippets`).
+
+    Avec `queryset`, seuls ses objets sont retenus : le filtre fait partie de
+    la requête FTS, avant la limite SEARCH_MAX_RESULTS.
+    """
+    match = build_match_query(query)
+    if not match or not is_available():
+        return []
+    if limit is None:
+        limit = getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    where, params = f"{TABLE} MATCH %s AND rowid %% 2 = %s", [match, KINDS[kind]]
+    if queryset is not None:
+        rowids = queryset.order_by().annotate(search_rowid=F('pk') * 2 + KINDS[kind]).values('search_rowid')
+        subquery, subquery_params = rowids.query.sql_with_params()
+        where += f" AND rowid IN ({subquery})"
+        params.extend(subquery_params)
+    sql = f"SELECT rowid FROM {TABLE} WHERE {where} ORDER BY bm25({TABLE}, {weights}) LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [rowid // 2 for rowid, in cursor.fetchall()]
+
+
+def snippets(kind, query, pks):
+    """Extraits HTML surlignés {pk: extrait} pour les documents donnés"""
+    match = build_match_query(query)
+    if not match or not pks or not is_available():
+        return {}
+    rowids = [_rowid(kind, pk) for pk in pks]
+    sql = (
+        f"SELECT rowid, snippet({TABLE}, -1, %s, %s, '…', 16) FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND rowid IN ({', '.join(['%s'] * len(rowids))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_MARK_START, _MARK_END, match, *rowids])
+        return {rowid // 2: _highlight(snippet) for rowid, snippet in cursor.fetchall()}
+
+
+def rank(queryset, kind, query):
+    """
+    Applique la recherche à un queryset déjà filtré. Retourne la liste des pk
+    des résultats appartenant au queryset, par ordre de pertinence.
+    """
+    return search(kind, query, queryset=queryset)
+
+
+def load_page(queryset, page, kind, query):
+    """
+    Remplace les pk d'une page de résultats par les objets correspondants, dans
+    l'ordre de pertinence, avec l'extrait surligné dans l'attribut `search_snippet`.
+    """
+    pks = list(page.object_list)
+    objects = queryset.in_bulk(pks)
+    extracts = snippets(kind, query, pks)
+    page.object_list = []
+    for pk in pks:
+        obj = objects.get(pk)
+        if obj is not None:
+            obj.search_snippet = extracts.get(pk, '')
+            page.object_list.append(obj)
+    return page
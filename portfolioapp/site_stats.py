@@ -0,0 +1,77 @@
+"""
+Statistiques globales du portfolio (ligne unique PortfolioStats, id=1).
+
+Les totaux sont tenus à jour par deltas, sans jamais tout recompter :
+- création/suppression de projets, de likes et publication/suppression
+  d'articles (signaux de models.py) ;
+- vues écrites en base par les flushs des compteurs (signal counters_flushed).
+
+`reconcile()` recalcule tous les totaux en base et corrige une éventuelle
+dérive (commande `reconcile_portfolio_stats`, à planifier périodiquement).
+"""
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .caching import invalidate
+from .models import BlogPost, PortfolioStats, Project, ProjectLike
+
+STATS_ID = 1
+FIELDS = ('total_projects', 'total_blog_posts', 'total_views', 'total_likes')
+
+
+def _total_views(model):
+    return model.objects.aggregate(total=Coalesce(Sum('views_count'), 0))['total']
+
+
+def compute():
+    """Totaux recalculés en base (agrégats SQL)"""
+    return {
+        'total_projects': Project.objects.count(),
+        'total_blog_posts': BlogPost.objects.filter(is_published=True).count(),
+        'total_views': _total_views(Project) + _total_views(BlogPost),
+        'total_likes': ProjectLike.objects.count(),
+    }
+
+
+def reconcile():
+    """Recalcule les statistiques. Retourne {champ: (valeur stockée, valeur réelle)} pour les champs corrigés."""
+    with transaction.atomic():
+        stats, _ = PortfolioStats.objects.select_for_update().get_or_create(pk=STATS_ID)
+        expected = compute()
+        drift = {
+            field: (getattr(stats, field), value)
+            for field, value in expected.items()
+            if getattr(stats, field) != value
+        }
+        for field, value in expected.items():
+            setattr(stats, field, value)
+        stats.save()
+    return drift
+
+
+def apply_deltas(**deltas):
+    """Ajoute les deltas donnés (ex. total_views=12) en un seul UPDATE atomique"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = PortfolioStats.objects.filter(pk=STATS_ID).update(
+        last_updated=timezone.now(),
+        **{field: Greatest(F(field) + Value(delta), Value(0)) for field, delta in deltas.items()},
+    )
+    if updated:
+        # update() n'envoie pas post_save : invalidation explicite
+        invalidate('portfolio-stats')
+    else:
+        # Première utilisation : la ligne est créée avec les totaux réels
+        reconcile()
+
+
+def get_stats():
+    """Lecture seule de la ligne de statistiques (créée au besoin)"""
+    stats = PortfolioStats.objects.filter(pk=STATS_ID).first()
+    if stats is None:
+        reconcile()
+        stats = PortfolioStats.objects.get(pk=STATS_ID)
+    return stats
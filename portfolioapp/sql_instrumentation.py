@@ -0,0 +1,132 @@
+"""
+Instrumentation SQL par requête HTTP (SQLInstrumentationMiddleware, middleware.py).
+
+Sur une fraction des requêtes (SQL_INSTRUMENTATION_SAMPLE_RATE), chaque
+requête SQL passe par un `execute_wrapper` qui la chronomètre. En fin de
+requête :
+- l'en-tête `Server-Timing` donne le temps SQL, le nombre de requêtes et de
+  doublons, et le temps total (visible dans l'onglet Réseau du navigateur) ;
+- une ligne JSON est ajoutée au journal SQL_INSTRUMENTATION_LOG (rotation par
+  taille) : vue résolue, statut, compteurs, requêtes répétées (N+1 probables)
+  et requêtes les plus lentes. Les paramètres des requêtes (clés de session,
+  hachages de mots de passe...) ne sont jamais écrits : le SQL suffit à
+  repérer les requêtes en trop.
+
+Les requêtes non échantillonnées ne coûtent qu'un tirage aléatoire.
+"""
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .request_logs import RequestLog
+
+log = RequestLog('SQL_INSTRUMENTATION', Path('var') / 'sql' / 'requests.jsonl')
+
+APP_DIR = Path(__file__).resolve().parent
+_SKIPPED_FILES = {str(APP_DIR / 'sql_instrumentation.py'), str(APP_DIR / 'tests.py')}
+
+
+def enabled():
+    return getattr(settings, 'SQL_INSTRUMENTATION_ENABLED', False)
+
+
+def sampled():
+    return random.random() < getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0.05)
+
+
+def query_origin():
+    """
+    Origine de la requête SQL en cours : "gabarit:ligne" du nœud de template en
+    cours de rendu et/ou "fichier:ligne" du code de portfolioapp le plus proche.
+    """
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and template is None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        elif code is None and frame.f_code.co_filename.startswith(str(APP_DIR)) \
+                and frame.f_code.co_filename not in _SKIPPED_FILES:
+            code = f'{Path(frame.f_code.co_filename).relative_to(APP_DIR.parent)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ' via '.join(part for part in (template, code) if part) or None
+
+
+class QueryRecorder:
+    """execute_wrapper qui chronomètre chaque requête SQL (et note son origine si `origins`)"""
+
+    def __init__(self, origins=False):
+        # [(sql, paramètres, durée en secondes), ...] ; paramètres gardés en mémoire pour duplicates()
+        self.queries = []
+        self.origins = [] if origins else None
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.origins is not None:
+            self.origins.append(query_origin())
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        """Requêtes exécutées plusieurs fois avec les mêmes paramètres (exécutions en trop)"""
+        counts = Counter((sql, params) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+    def repeated(self, limit=5):
+        """SQL exécutés plusieurs fois, tous paramètres confondus : [(sql, nombre), ...]"""
+        counts = Counter(sql for sql, _, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common(limit) if count > 1]
+
+    def slowest(self, limit=5):
+        return sorted(self.queries, key=lambda query: query[2], reverse=True)[:limit]
+
+
+def server_timing(recorder, total):
+    """Valeur de l'en-tête Server-Timing (ASCII uniquement)"""
+    return (
+        f'db;dur={recorder.duration * 1000:.2f};'
+        f'desc="{recorder.count} queries, {recorder.duplicates()} duplicates", '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+def entry(request, response, recorder, total):
+    limit = getattr(settings, 'SQL_INSTRUMENTATION_SLOWEST', 5)
+    match = request.resolver_match
+    return {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 2),
+        'sql_ms': round(recorder.duration * 1000, 2),
+        'queries': recorder.count,
+        'duplicates': recorder.duplicates(),
+        'repeated': [{'sql': sql, 'count': count} for sql, count in recorder.repeated(limit)],
+        'slowest': [
+            {'sql': sql, 'ms': round(duration * 1000, 2)}
+            for sql, _, duration in recorder.slowest(limit)
+        ],
+    }
+
+
+def log_request(request, response, recorder, total):
+    log.write(entry(request, response, recorder, total))
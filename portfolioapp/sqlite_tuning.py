@@ -0,0 +1,58 @@
+"""
+Réglages des connexions SQLite.
+
+Chaque nouvelle connexion (signal connection_created, voir models.py) reçoit
+les PRAGMA de SQLITE_PRAGMAS :
+- journal_mode=WAL : les lectures ne bloquent plus les écritures (et
+  inversement), un seul écrivain à la fois ;
+- busy_timeout : un écrivain attend le verrou au lieu d'échouer aussitôt avec
+  "database is locked" ;
+- synchronous=NORMAL : sûr en WAL (pas de corruption), un fsync par
+  checkpoint au lieu d'un par transaction ;
+- mmap_size, cache_size, temp_store : lectures et tris en mémoire.
+
+Les connexions étant persistantes (CONN_MAX_AGE), ces PRAGMA ne sont exécutés
+qu'une fois par connexion, pas à chaque requête HTTP.
+"""
+import re
+
+from django.conf import settings
+
+# busy_timeout en premier : le passage en WAL attend alors le verrou lui aussi
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'memory',
+}
+
+_TOKEN = re.compile(r'-?\w+')
+
+
+def pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+
+def pragma_statements(values=None):
+    """PRAGMA à exécuter, dans l'ordre (noms et valeurs validés : ils sont insérés tels quels dans le SQL)"""
+    statements = []
+    for name, value in (pragmas() if values is None else values).items():
+        if not _TOKEN.fullmatch(name) or not _TOKEN.fullmatch(str(value)):
+            raise ValueError(f"PRAGMA invalide : {name}={value!r}")
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def apply_pragmas(cursor, values=None):
+    """Exécute les PRAGMA sur un curseur (ou une connexion sqlite3)"""
+    for statement in pragma_statements(values):
+        cursor.execute(statement)
+
+
+def configure_connection(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
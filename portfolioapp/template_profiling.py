@@ -0,0 +1,226 @@
+"""
+Profilage du rendu des templates (TemplateProfilingMiddleware, middleware.py).
+
+Sur une fraction des requêtes (TEMPLATE_PROFILING_SAMPLE_RATE), le temps et
+le nombre d'appels sont mesurés pour :
+- chaque template rendu ("template" : pages, parents d'un {% extends %},
+  templates des inclusion tags) ;
+- chaque {% include %} ("include" : gabarit:ligne et template inclus) ;
+- chaque tag de portfolio_extras ("tag" : project_card, adsense_unit...).
+
+Pour chacun : appels, temps cumulé (enfants compris) et propre (hors
+templates, includes et tags imbriqués), requêtes SQL cumulées et propres.
+Par requête : en-tête Server-Timing et ligne JSON dans TEMPLATE_PROFILING_LOG ;
+sur plusieurs requêtes : commande `template_profile` (lit le journal) et
+compteurs de /metrics.
+
+Les méthodes de rendu de Django sont enveloppées une seule fois, au
+chargement du middleware ; hors requête échantillonnée, l'enveloppe ne coûte
+qu'une lecture de ContextVar.
+"""
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.template.base import Template
+from django.template.library import InclusionNode, SimpleNode
+from django.template.loader_tags import IncludeNode
+from django.utils import timezone
+
+from . import metrics
+from .request_logs import RequestLog
+
+TAG_MODULE = 'portfolioapp.templatetags.portfolio_extras'
+
+_current = ContextVar('template_recorder', default=None)
+_install_lock = threading.Lock()
+_installed = False
+
+log = RequestLog('TEMPLATE_PROFILING', Path('var') / 'templates' / 'renders.jsonl')
+
+RENDER_TIME = metrics.Counter(
+    'portfolio_template_render_seconds_total', 'Temps cumulé de rendu des templates, includes et tags '
+    '(requêtes échantillonnées)', ('kind', 'name'),
+)
+RENDERS = metrics.Counter(
+    'portfolio_template_renders_total', 'Rendus de templates, includes et tags (requêtes échantillonnées)',
+    ('kind', 'name'),
+)
+RENDER_QUERIES = metrics.Counter(
+    'portfolio_template_queries_total', 'Requêtes SQL propres aux templates, includes et tags '
+    '(requêtes échantillonnées)', ('kind', 'name'),
+)
+
+
+def enabled():
+    return getattr(settings, 'TEMPLATE_PROFILING_ENABLED', False)
+
+
+def sampled():
+    return random.random() < getattr(settings, 'TEMPLATE_PROFILING_SAMPLE_RATE', 0.1)
+
+
+class RenderRecorder:
+    """
+    Statistiques de rendu d'une requête. Sert aussi d'execute_wrapper pour
+    compter les requêtes SQL.
+    """
+
+    def __init__(self):
+        # {(type, nom): [appels, temps, temps propre, requêtes, requêtes propres]}
+        self.stats = {}
+        self.queries = 0
+        self.total = 0.0
+        # [temps, requêtes] des enfants de chaque mesure en cours
+        self._stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def measure(self, kind, name):
+        queries = self.queries
+        self._stack.append([0.0, 0])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            triggered = self.queries - queries
+            child_time, child_queries = self._stack.pop()
+            if self._stack:
+                self._stack[-1][0] += elapsed
+                self._stack[-1][1] += triggered
+            else:
+                self.total += elapsed
+            entry = self.stats.setdefault((kind, name), [0, 0.0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += elapsed - child_time
+            entry[3] += triggered
+            entry[4] += triggered - child_queries
+
+    def entries(self):
+        """Statistiques triées par temps propre décroissant"""
+        rows = [
+            {
+                'kind': kind, 'name': name, 'calls': calls,
+                'ms': round(elapsed * 1000, 3), 'self_ms': round(own * 1000, 3),
+                'queries': queries, 'self_queries': own_queries,
+            }
+            for (kind, name), (calls, elapsed, own, queries, own_queries) in self.stats.items()
+        ]
+        return sorted(rows, key=lambda row: row['self_ms'], reverse=True)
+
+
+@contextmanager
+def recording(recorder):
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+def _template_name(template):
+    return template.origin.template_name or template.name or '<chaîne>'
+
+
+def _include_name(node):
+    # Site de l'include (gabarit:ligne) et template inclus tel qu'écrit
+    included = node.template.token.strip('\'"')
+    return f'{node.origin.template_name}:{node.token.lineno} {included}'
+
+
+def _tag_name(node):
+    if getattr(node.func, '__module__', None) != TAG_MODULE:
+        return None
+    return node.func.__name__
+
+
+def _instrument(cls, method, kind, name_of):
+    render = getattr(cls, method)
+
+    @wraps(render)
+    def wrapper(self, context):
+        recorder = _current.get()
+        if recorder is None:
+            return render(self, context)
+        name = name_of(self)
+        if name is None:
+            return render(self, context)
+        with recorder.measure(kind, name):
+            return render(self, context)
+
+    setattr(cls, method, wrapper)
+
+
+def install():
+    """Enveloppe les méthodes de rendu de Django (une seule fois par processus)"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        # _render couvre aussi les parents d'un {% extends %}, rendus sans passer par render()
+        _instrument(Template, '_render', 'template', _template_name)
+        _instrument(IncludeNode, 'render', 'include', _include_name)
+        _instrument(SimpleNode, 'render', 'tag', _tag_name)
+        _instrument(InclusionNode, 'render', 'tag', _tag_name)
+        _installed = True
+
+
+def server_timing(recorder):
+    renders = sum(entry[0] for entry in recorder.stats.values())
+    return f'tpl;dur={recorder.total * 1000:.2f};desc="{renders} renders"'
+
+
+def entry(request, response, recorder):
+    match = request.resolver_match
+    return {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'template_ms': round(recorder.total * 1000, 3),
+        'renders': recorder.entries(),
+    }
+
+
+def log_request(request, response, recorder):
+    for (kind, name), (calls, elapsed, _, _, own_queries) in recorder.stats.items():
+        RENDERS.inc(calls, kind=kind, name=name)
+        RENDER_TIME.inc(elapsed, kind=kind, name=name)
+        RENDER_QUERIES.inc(own_queries, kind=kind, name=name)
+
+    log.write(entry(request, response, recorder))
+
+
+def aggregate(lines, view=None):
+    """
+    Agrège des lignes du journal : (nombre de requêtes, {(type, nom): totaux}).
+    Les totaux ont les clés de RenderRecorder.entries() (ms et requêtes additionnés).
+    """
+    requests = 0
+    totals = {}
+    for line in lines:
+        try:
+            data = json.loads(line)
+        except ValueError:
+            continue
+        if view and data.get('view') != view:
+            continue
+        requests += 1
+        for row in data['renders']:
+            total = totals.setdefault((row['kind'], row['name']), dict.fromkeys(
+                ('calls', 'ms', 'self_ms', 'queries', 'self_queries'), 0))
+            for field in total:
+                total[field] += row[field]
+    return requests, totals
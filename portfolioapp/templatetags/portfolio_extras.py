@@ -1,7 +1,12 @@
 from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.db.models import Count
-from ..models import Project, BlogPost, Tag, ProjectLike, AdUnit, AdSenseConfig
+from .. import ads, images, metrics
+from ..devices import device_type
+from ..likes import liked_ids
+from ..models import Project, BlogPost, Tag
 import json
 
 register = template.Library()
@@ -14,11 +19,9 @@ def split_technologies(technologies):
     return []
 
 @register.filter
-def is_liked_by(project, user):
-    """Vérifie si un projet est liké par un utilisateur"""
-    if user.is_authenticated:
-        return ProjectLike.objects.filter(project=project, user=user).exists()
-    return False
+def is_liked_by(obj, user):
+    """Vérifie si un projet (ou un commentaire) est liké par un utilisateur, sans requête par carte"""
+    return liked_ids(user).contains(obj)
 
 @register.filter
 def get_range(value):
@@ -40,12 +43,13 @@ def get_featured_projects(limit=6):
     """Retourne les projets mis en avant"""
     return Project.objects.filter(featured=True).order_by('-created_at')[:limit]
 
-@register.inclusion_tag('portfolioapp/tags/project_card.html')
-def project_card(project, show_actions=True):
+@register.inclusion_tag('portfolioapp/tags/project_card.html', takes_context=True)
+def project_card(context, project, show_actions=True):
     """Template tag pour afficher une carte de projet"""
     return {
         'project': project,
         'show_actions': show_actions,
+        'user': context.get('user'),
     }
 
 @register.inclusion_tag('portfolioapp/tags/blog_card.html')
@@ -55,6 +59,32 @@ def blog_card(post):
         'post': post,
     }
 
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """
+    Affiche une image avec ses déclinaisons WebP/JPEG (srcset/sizes).
+    Exemple : {% responsive_image project.image sizes="(max-width: 768px) 100vw, 33vw" alt=project.title class="project-image" loading="lazy" %}
+    Tant que les déclinaisons ne sont pas générées, l'image d'origine est utilisée.
+    """
+    if not image:
+        return ''
+    attributes = flatatt({key.replace('_', '-'): value for key, value in attrs.items() if value is not None})
+    if not images.is_ready(image.name):
+        return format_html('<img src="{}"{}>', image.url, attributes)
+    sources = [
+        format_html('<source type="{}" srcset="{}" sizes="{}">', mime_type, images.srcset(image.name, extension), sizes)
+        for extension, _, mime_type in images.FORMATS[:-1]
+    ]
+    fallback_extension = images.FORMATS[-1][0]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        mark_safe(''.join(sources)),
+        images.derivative_url(image.name, max(images.widths()), fallback_extension),
+        images.srcset(image.name, fallback_extension),
+        sizes,
+        attributes,
+    )
+
 @register.filter
 def json_encode(value):
     """Encode une valeur en JSON pour JavaScript"""
@@ -110,46 +140,16 @@ def truncate_chars(value, length):
 
 @register.simple_tag(takes_context=True)
 def adsense_unit(context, position):
-    """Affiche une unité publicitaire AdSense pour une position donnée"""
+    """Affiche une unité publicitaire AdSense pour une position donnée (index en mémoire, voir ads.py)"""
     request = context.get('request')
     if not request:
         return ''
-    
-    current_path = request.path
-    
-    # Récupérer les unités publicitaires pour cette position
-    ad_units = AdUnit.objects.filter(
-        position=position,
-        is_active=True
-    )
-    
-    # Filtrer selon le type d'appareil
-    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-    is_mobile = any(device in user_agent for device in ['mobile', 'android', 'iphone', 'ipad'])
-    
-    if is_mobile:
-        ad_units = ad_units.filter(show_on_mobile=True)
-    else:
-        ad_units = ad_units.filter(show_on_desktop=True)
-    
-    # Filtrer selon la page actuelle
-    valid_ads = []
-    for ad_unit in ad_units:
-        if ad_unit.should_display_on_page(current_path):
-            valid_ads.append(ad_unit)
-    
-    if not valid_ads:
-        return ''
-    
-    # Prendre la première unité valide (ou implémenter une logique de rotation)
-    ad_unit = valid_ads[0]
-    
-    return mark_safe(ad_unit.get_ad_code())
+    return mark_safe(ads.unit_html(request, position))
 
-@register.simple_tag
-def adsense_script():
+@register.simple_tag(takes_context=True)
+def adsense_script(context):
     """Génère le script principal AdSense"""
-    config = AdSenseConfig.get_config()
+    config = ads.get_index(context.get('request')).config
     
     if not config.is_active:
         return ''
@@ -161,27 +161,19 @@ def adsense_script():
     
     return mark_safe(script.strip())
 
-@register.simple_tag
-def adsense_auto_ads():
+@register.simple_tag(takes_context=True)
+def adsense_auto_ads(context):
     """Génère le code pour les Auto Ads"""
-    config = AdSenseConfig.get_config()
-    
-    if not config.is_active:
-        return ''
+    index = ads.get_index(context.get('request'))
     
     # Vérifier s'il y a des unités Auto Ads actives
-    has_auto_ads = AdUnit.objects.filter(
-        ad_type='auto',
-        is_active=True
-    ).exists()
-    
-    if not has_auto_ads:
+    if not index.config.is_active or not index.has_auto_ads:
         return ''
     
     script = f'''
     <script>
         (adsbygoogle = window.adsbygoogle || []).push({{
-            google_ad_client: "{config.publisher_id}",
+            google_ad_client: "{index.config.publisher_id}",
             enable_page_level_ads: true
         }});
     </script>
@@ -196,39 +188,25 @@ def adsense_banner(context, position, css_class=''):
     if not request:
         return {'ad_code': '', 'css_class': css_class}
     
-    current_path = request.path
-    
-    # Récupérer l'unité publicitaire
-    try:
-        ad_unit = AdUnit.objects.filter(
-            position=position,
-            is_active=True
-        ).first()
-        
-        if ad_unit and ad_unit.should_display_on_page(current_path):
-            # Vérifier le type d'appareil
-            user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-            is_mobile = any(device in user_agent for device in ['mobile', 'android', 'iphone', 'ipad'])
-            
-            if (is_mobile and ad_unit.show_on_mobile) or (not is_mobile and ad_unit.show_on_desktop):
-                return {
-                    'ad_code': ad_unit.get_ad_code(),
-                    'css_class': css_class,
-                    'custom_css': ad_unit.custom_css,
-                    'position': position
-                }
-    except AdUnit.DoesNotExist:
-        pass
+    # Première unité active de la position, puis filtres de page et d'appareil
+    placement = ads.get_index(request).first_by_position.get(position)
+    if placement and placement.matches(request.path) and placement.shows_on(device_type(request)):
+        metrics.AD_RENDERS.inc(position=position, tag='adsense_banner')
+        return {
+            'ad_code': placement.html,
+            'css_class': css_class,
+            'custom_css': placement.custom_css,
+            'position': position
+        }
     
     return {'ad_code': '', 'css_class': css_class}
 
-@register.simple_tag
-def adsense_config():
+@register.simple_tag(takes_context=True)
+def adsense_config(context):
     """Récupère la configuration AdSense"""
-    return AdSenseConfig.get_config()
+    return ads.get_index(context.get('request')).config
 
 @register.filter
 def is_adsense_active(value):
     """Vérifie si AdSense est actif"""
-    config = AdSenseConfig.get_config()
-    return config.is_active
\ No newline at end of file
+    return ads.get_index().config.is_active
\ No newline at end of file
@@ -1,3 +1,1639 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils import timezone
+
+from . import (ad_reports, ads, analytics, benchmarks, counters, images, likes, metrics, notifications, page_cache,
+               profiling, related_projects, query_budgets, routers, search, site_stats, sql_instrumentation, sqlite_tuning,
+               template_profiling)
+from .comment_threads import load_comment_thread
+from .context_processors import global_context
+from .devices import DESKTOP, MOBILE
+from .models import (Project, Comment, Reply, Notification, BlogPost, Resume, Category, Profile,
+                     ProjectLike, Tag, AdSenseConfig, AdUnit, Testimonial, PortfolioStats,
+                     ViewEvent, HourlyViewRollup, DailyViewRollup, AdPerformance, AdPerformanceRollup)
+
+
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        self.participants = [User.objects.create_user(f'user{i}') for i in range(5)]
+        self.newcomer = User.objects.create_user('newcomer')
+
+    def build_thread(self, length):
+        for i in range(length):
+            author = self.participants[i % len(self.participants)]
+            comment = Comment.objects.create(project=self.project, author=author, text=f'Commentaire {i}')
+            Reply.objects.create(comment=comment, author=self.participants[(i + 1) % len(self.participants)], text='Réponse')
+
+    def count_comment_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Comment.objects.create(project=self.project, author=self.newcomer, text='Nouveau commentaire')
+        return len(ctx.captured_queries)
+
+    def test_comment_fan_out_query_budget_is_constant(self):
+        self.build_thread(3)
+        short_thread = self.count_comment_queries()
+        self.build_thread(60)
+        long_thread = self.count_comment_queries()
+
+        # INSERT du commentaire + compteur de commentaires du projet + requête des
+        # participants + bulk_create + mise à jour des compteurs de notifications non lues
+        self.assertEqual(short_thread, 5)
+        self.assertEqual(long_thread, short_thread)
+
+    def test_comment_notifies_each_participant_once(self):
+        self.build_thread(10)
+        Notification.objects.all().delete()
+
+        Comment.objects.create(project=self.project, author=self.newcomer, text='Bonjour')
+
+        recipients = list(Notification.objects.values_list('user__username', flat=True))
+        self.assertEqual(sorted(recipients), sorted(['owner'] + [u.username for u in self.participants]))
+        owner_notification = Notification.objects.get(user=self.owner)
+        self.assertIn('a commenté votre projet', owner_notification.message)
+
+    def test_reply_messages_depend_on_recipient(self):
+        comment = Comment.objects.create(project=self.project, author=self.participants[0], text='Question')
+        Comment.objects.create(project=self.project, author=self.participants[1], text='Autre')
+        Notification.objects.all().delete()
+
+        with self.assertNumQueries(4):
+            Reply.objects.create(comment=comment, author=self.newcomer, text='Réponse')
+
+        messages = dict(Notification.objects.values_list('user__username', 'message'))
+        self.assertIn('a répondu à votre commentaire', messages['user0'])
+        self.assertIn('a répondu à un commentaire sur votre projet', messages['owner'])
+        self.assertIn('a ajouté une réponse', messages['user1'])
+        self.assertNotIn('newcomer', messages)
+
+    def test_add_comment_view_does_not_duplicate_owner_notification(self):
+        self.client.force_login(self.newcomer)
+        response = self.client.post(f'/projets/{self.project.pk}/comment/', {'text': 'Salut'})
+
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(Notification.objects.filter(user=self.owner).count(), 1)
+
+    def test_add_reply_view_notifies_comment_author_as_a_reply(self):
+        comment = Comment.objects.create(project=self.project, author=self.participants[0], text='Question')
+        Comment.objects.create(project=self.project, author=self.participants[1], text='Autre')
+        Notification.objects.all().delete()
+
+        self.client.force_login(self.newcomer)
+        response = self.client.post(f'/comment/{comment.pk}/reply/', {'text': 'Réponse'})
+        self.assertTrue(response.json()['success'])
+
+        [author_message] = Notification.objects.filter(user=self.participants[0]).values_list('message', flat=True)
+        self.assertIn('a répondu à votre commentaire', author_message)
+        messages = dict(Notification.objects.values_list('user__username', 'message'))
+        self.assertIn('a répondu à un commentaire sur votre projet', messages['owner'])
+        self.assertIn('a ajouté une réponse', messages['user1'])
+        self.assertNotIn('newcomer', messages)
+
+        # Réponse à son propre commentaire : pas de notification pour soi-même
+        Notification.objects.all().delete()
+        self.client.force_login(self.participants[0])
+        self.client.post(f'/comment/{comment.pk}/reply/', {'text': 'Précision'})
+        self.assertFalse(Notification.objects.filter(user=self.participants[0]).exists())
+        self.assertTrue(Notification.objects.filter(user=self.owner).exists())
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=3600, COUNTER_FLUSH_THRESHOLD=2)
+class CounterConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        counters.buffer.drain()
+        owner = User.objects.create_user('owner')
+        self.projects = [
+            Project.objects.create(user=owner, title=f'Projet {i}', description='Description')
+            for i in range(3)
+        ]
+        self.post = BlogPost.objects.create(title='Article', content='Contenu')
+
+    def test_concurrent_increments_are_not_lost(self):
+        threads_count, hits = 8, 200
+
+        def worker():
+            try:
+                for i in range(hits):
+                    Project(pk=self.projects[i % 3].pk, views_count=0).increment_views()
+                    BlogPost(pk=self.post.pk, views_count=0).increment_views()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+        # Les flushs concurrents peuvent échouer ("database table is locked") :
+        # leurs incréments doivent alors être remis en attente, pas perdus.
+        with mock.patch.object(counters.logger, 'exception'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        counters.flush()
+
+        total = sum(Project.objects.values_list('views_count', flat=True))
+        self.assertEqual(total, threads_count * hits)
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).views_count, threads_count * hits)
+
+
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        counters.buffer.drain()
+        self.resume = Resume.objects.create(title='CV', file='resumes/cv.pdf')
+
+    def tearDown(self):
+        counters.buffer.drain()
+
+    def test_increment_is_deferred_until_flush(self):
+        with self.assertNumQueries(0):
+            self.resume.increment_downloads()
+            self.resume.increment_downloads()
+        self.assertEqual(self.resume.download_count, 2)
+        self.assertEqual(Resume.objects.get(pk=self.resume.pk).download_count, 0)
+
+        counters.flush()
+        self.assertEqual(Resume.objects.get(pk=self.resume.pk).download_count, 2)
+
+    def test_failed_flush_keeps_increments(self):
+        self.resume.increment_downloads()
+        with mock.patch.object(counters, 'apply_increments', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('portfolioapp.counters', 'ERROR'):
+                self.assertEqual(counters.flush(), 0)
+        self.assertEqual(counters.buffer.pending('portfolioapp.Resume', 'download_count', self.resume.pk), 1)
+
+        counters.flush()
+        self.assertEqual(Resume.objects.get(pk=self.resume.pk).download_count, 1)
+
+    @override_settings(COUNTER_FLUSH_INTERVAL=0.2)
+    def test_idle_worker_flushes_after_interval(self):
+        # Aucune requête après l'incrément : le minuteur déclenche le flush
+        flushed = threading.Event()
+        with mock.patch.object(counters.buffer, 'flush', side_effect=lambda: flushed.set()):
+            self.resume.increment_downloads()
+            self.assertTrue(flushed.wait(5))
+
+    def test_spooled_increments_are_replayed(self):
+        with self.settings(COUNTER_SPOOL_DIR=self.spool_dir()):
+            self.resume.increment_downloads()
+            path = counters.buffer.spool()
+            self.assertTrue(path.exists())
+
+            self.assertEqual(counters.replay_spool(), 1)
+            self.assertFalse(path.exists())
+        self.assertEqual(Resume.objects.get(pk=self.resume.pk).download_count, 1)
+
+    def spool_dir(self):
+        path = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, path, True)
+        return path
+
+
+class GlobalContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        owner = User.objects.create_user('owner')
+        self.category = Category.objects.create(name='Web')
+        Project.objects.create(user=owner, title='Projet', description='Description', category=self.category)
+
+    def test_values_are_lazy(self):
+        with self.assertNumQueries(0):
+            context = global_context(self.request)
+        self.assertEqual(set(context), {'global_categories', 'global_popular_tags', 'global_stats', 'global_resumes'})
+
+    def test_warm_cache_runs_no_queries(self):
+        list(global_context(self.request)['global_categories'])
+        with self.assertNumQueries(0):
+            context = global_context(self.request)
+            self.assertEqual([c.name for c in context['global_categories']], ['Web'])
+
+    def test_model_signals_invalidate_cache(self):
+        list(global_context(self.request)['global_resumes'])
+        Resume.objects.create(title='CV', file='resumes/cv.pdf')
+        self.assertEqual(len(global_context(self.request)['global_resumes']), 1)
+
+        self.category.name = 'Mobile'
+        self.category.save()
+        self.assertEqual([c.name for c in global_context(self.request)['global_categories']], ['Mobile'])
+
+
+class UnreadNotificationCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader')
+
+    def unread(self):
+        return Profile.objects.get(user=self.user).unread_notifications_count
+
+    def test_counter_follows_create_bulk_create_and_reads(self):
+        first = Notification.objects.create(user=self.user, message='Un')
+        Notification.objects.bulk_create([Notification(user=self.user, message=str(i)) for i in range(3)])
+        self.assertEqual(self.unread(), 4)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        self.assertEqual(self.unread(), 3)
+
+        self.assertEqual(Notification.objects.mark_all_as_read(self.user), 3)
+        self.assertEqual(self.unread(), 0)
+
+    def test_unread_badge_is_cached(self):
+        Notification.objects.create(user=self.user, message='Un')
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get('/unread-notifications/').json(), {'unread_count': 1})
+        self.assertEqual(Profile.get_unread_count(self.user), 1)
+        with self.assertNumQueries(0):
+            Profile.get_unread_count(self.user)
+
+        Notification.objects.create(user=self.user, message='Deux')
+        self.assertEqual(Profile.get_unread_count(self.user), 2)
+
+    def test_reconcile_command_fixes_drift(self):
+        Notification.objects.create(user=self.user, message='Un')
+        Profile.objects.filter(user=self.user).update(unread_notifications_count=7)
+
+        call_command('reconcile_unread_notifications', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.unread(), 1)
+
+
+class CommentThreadLoaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.viewer = User.objects.create_user('viewer')
+        self.project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+
+    def add_comments(self, count):
+        # Insertion directe : les signaux de notification ne sont pas utiles ici
+        comments = Comment.objects.bulk_create([
+            Comment(project=self.project, author=self.owner if i % 2 else self.viewer, text=f'Commentaire {i}')
+            for i in range(count)
+        ])
+        replies = Comment.objects.bulk_create([
+            Comment(project=self.project, author=self.viewer, parent=comment, text='Réponse')
+            for comment in comments[::5]
+        ])
+        Comment.likes.through.objects.bulk_create([
+            Comment.likes.through(comment_id=comment.pk, user_id=self.viewer.pk)
+            for comment in comments[::3] + replies
+        ])
+        # bulk_create n'envoie pas les signaux qui tiennent les compteurs à jour
+        call_command('reconcile_engagement_counters', stdout=StringIO())
+        return comments
+
+    def detail_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/projets/{self.project.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_project_detail_query_count_does_not_grow_with_comments(self):
+        self.client.force_login(self.viewer)
+        self.add_comments(5)
+        self.detail_queries()  # remplit les caches (badge de notifications...)
+        small_thread, _ = self.detail_queries()
+
+        self.add_comments(495)
+        large_thread, response = self.detail_queries()
+
+        self.assertEqual(large_thread, small_thread)
+        self.assertEqual(response.context['comments_count'], 600)
+        self.assertEqual(len(response.context['comments']), 500)
+
+    def test_thread_carries_counts_replies_and_liked_state(self):
+        first = self.add_comments(5)[0]
+
+        with self.assertNumQueries(2):
+            comments, total = load_comment_thread(self.project, self.viewer)
+
+        comment = next(c for c in comments if c.pk == first.pk)
+        self.assertEqual(total, 6)
+        self.assertEqual(comment.likes_count, 1)
+        self.assertTrue(comment.is_liked)
+        self.assertEqual(comment.replies_count, 1)
+        self.assertTrue(comment.thread_replies[0].is_liked)
+
+    def test_get_replies_uses_loader(self):
+        first = self.add_comments(5)[0]
+        response = self.client.get(f'/comment/{first.pk}/replies/')
+        self.assertEqual(response.json()['replies_count'], 1)
+        self.assertIn('Réponse', response.json()['replies_html'])
+
+
+class RelatedProjectsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+
+    def add_category(self, name, projects=4):
+        category = Category.objects.create(name=name)
+        for i in range(projects):
+            Project.objects.create(user=self.owner, title=f'{name} {i}', description='Description', category=category)
+        return category
+
+    def test_one_windowed_query_whatever_the_number_of_categories(self):
+        for i in range(8):
+            self.add_category(f'Catégorie {i}')
+        liked = Project.objects.first()
+        ProjectLike.objects.create(user=self.owner, project=liked)
+
+        with self.assertNumQueries(1):
+            grouped = related_projects._build_projects_by_category(3)
+
+        self.assertEqual(len(grouped), 8)
+        self.assertTrue(all(len(projects) == 3 for projects in grouped.values()))
+        first_category = next(iter(grouped))
+        self.assertEqual([p.title for p in grouped[first_category]], ['Catégorie 0 3', 'Catégorie 0 2', 'Catégorie 0 1'])
+        self.assertEqual(next(p for g in grouped.values() for p in g if p.pk == liked.pk).likes_count, 1)
+
+    def test_cached_until_projects_change(self):
+        category = self.add_category('Web', projects=1)
+        related_projects.projects_by_category()
+        with self.assertNumQueries(0):
+            related_projects.projects_by_category()
+
+        Project.objects.create(user=self.owner, title='Nouveau', description='Description', category=category)
+        self.assertEqual(related_projects.projects_by_category()[category][0].title, 'Nouveau')
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        search.reset_availability()
+        self.owner = User.objects.create_user('owner')
+
+    def project(self, title, description='<p>Description</p>', **kwargs):
+        return Project.objects.create(user=self.owner, title=title, description=description, **kwargs)
+
+    def test_html_markup_is_not_indexed(self):
+        self.project('Site vitrine', '<p style="color:red;"><strong>Boutique</strong> en ligne</p>')
+        self.assertEqual(search.search('project', 'style'), [])
+        self.assertEqual(search.search('project', 'strong'), [])
+        self.assertEqual(len(search.search('project', 'boutique')), 1)
+
+    def test_results_are_ranked_by_relevance(self):
+        body_only = self.project('Application', '<p>Gestion scolaire pour une école</p>')
+        in_title = self.project('École numérique', '<p>Plateforme</p>')
+        self.project('Autre', '<p>Sans rapport</p>')
+        # Accents ignorés, titre mieux pondéré que le contenu
+        self.assertEqual(search.search('project', 'ecole'), [in_title.pk, body_only.pk])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        project = self.project('Outil', '<p>Tableau de bord &lt;admin&gt; en Django</p>')
+        snippet = search.snippets('project', 'django', [project.pk])[project.pk]
+        self.assertIn('<mark>Django</mark>', snippet)
+        self.assertIn('&lt;admin&gt;', snippet)
+
+    def test_tags_are_reindexed(self):
+        project = self.project('Projet')
+        tag = Tag.objects.create(name='Robotique')
+        project.tags.add(tag)
+        self.assertEqual(search.search('project', 'robotique'), [project.pk])
+
+        tag.name = 'Domotique'
+        tag.save()
+        self.assertEqual(search.search('project', 'robotique'), [])
+        self.assertEqual(search.search('project', 'domotique'), [project.pk])
+
+        tag.delete()
+        self.assertEqual(search.search('project', 'domotique'), [])
+
+    def test_deleted_and_unpublished_documents_are_removed(self):
+        project = self.project('Chatbot')
+        post = BlogPost.objects.create(title='Chatbot', slug='chatbot', content='<p>Article</p>')
+        self.assertEqual(search.search('blogpost', 'chatbot'), [post.pk])
+
+        post.is_published = False
+        post.save()
+        self.assertEqual(search.search('blogpost', 'chatbot'), [])
+        project.delete()
+        self.assertEqual(search.search('project', 'chatbot'), [])
+
+    def test_views_use_the_index(self):
+        category = Category.objects.create(name='Web')
+        self.project('Portail Django', category=category)
+        self.project('Portail mobile')
+        BlogPost.objects.create(title='Astuces Django', slug='astuces', content='<p>Contenu</p>')
+
+        response = self.client.get('/search/', {'search': 'portail', 'category': category.pk})
+        self.assertEqual([p.title for p in response.context['page_obj']], ['Portail Django'])
+        self.assertContains(response, '<mark>Portail</mark>')
+
+        response = self.client.get('/blog/', {'search': 'django'})
+        self.assertEqual([p.title for p in response.context['page_obj']], ['Astuces Django'])
+
+    @override_settings(SEARCH_MAX_RESULTS=2)
+    def test_filter_applies_before_result_limit(self):
+        category = Category.objects.create(name='Web')
+        self.project('Portail', '<p>Portail portail</p>')
+        self.project('Portail mobile', '<p>Portail</p>')
+        filtered = self.project('Application', '<p>Un portail parmi d\'autres</p>', category=category)
+
+        projects = Project.objects.filter(category=category).order_by('-created_at')
+        self.assertEqual(search.rank(projects, 'project', 'portail'), [filtered.pk])
+
+
+class ResumeDownloadTests(TestCase):
+    def setUp(self):
+        counters.buffer.drain()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.content = bytes(range(256)) * 1024
+        self.resume = Resume(title='CV Chadrack')
+        self.resume.file.save('cv.pdf', ContentFile(self.content))
+        self.url = f'/download-resume/{self.resume.pk}/'
+
+    def tearDown(self):
+        counters.buffer.drain()
+
+    def pending_downloads(self):
+        return counters.buffer.pending('portfolioapp.Resume', 'download_count', self.resume.pk)
+
+    def test_full_download_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertIn('attachment; filename="CV Chadrack.pdf"', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(self.pending_downloads(), 1)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:2000])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        # Les reprises et les intervalles invalides ne comptent pas comme téléchargements
+        self.assertEqual(self.pending_downloads(), 0)
+
+    def test_only_first_get_counts_as_download(self):
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        response = self.client.head(self.url, HTTP_RANGE='bytes=0-')
+        response.close()
+        self.assertEqual(self.pending_downloads(), 0)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1023')
+        self.assertEqual(response.status_code, 206)
+        response.close()
+        self.assertEqual(self.pending_downloads(), 1)
+
+    def test_if_range_with_stale_etag_returns_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"ancienne-version"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response.close()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.pending_downloads(), 1)
+
+    def test_offload_to_web_server(self):
+        with self.settings(FILE_DELIVERY_OFFLOAD='x-accel-redirect', FILE_DELIVERY_ACCEL_PREFIX='/protected/'):
+            response = self.client.get(self.url)
+            # Reprise et HEAD servis par le serveur web : pas de téléchargement compté
+            self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+            self.client.head(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.resume.file.name)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.pending_downloads(), 1)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVE_WIDTHS=(320, 640)))
+        self.owner = User.objects.create_user('owner')
+
+    def png(self, size=(800, 400), mode='RGBA'):
+        from PIL import Image
+
+        output = tempfile.SpooledTemporaryFile()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(output, 'PNG')
+        output.seek(0)
+        return ContentFile(output.read(), name='capture.png')
+
+    def render(self, image):
+        return Template('{% load portfolio_extras %}{% responsive_image image sizes="33vw" alt="Aperçu" %}').render(
+            Context({'image': image})
+        )
+
+    def test_upload_schedules_derivatives(self):
+        from PIL import Image
+
+        project = Project(user=self.owner, title='Projet', description='Description')
+        project.image.save('capture.png', self.png(), save=False)
+        self.assertIn('<img src="/media/projects/capture', self.render(project.image))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        images.wait_pending()
+
+        for width in (320, 640):
+            for extension in ('webp', 'jpg'):
+                path = Path(self.media_root) / images.derivative_name(project.image.name, width, extension)
+                with Image.open(path) as derivative:
+                    self.assertEqual(derivative.width, width)
+        html = self.render(project.image)
+        self.assertIn('<source type="image/webp" srcset="/media/derivatives/projects/capture', html)
+        self.assertIn('-640w.jpg 640w"', html)
+        self.assertIn('sizes="33vw" alt="Aperçu"', html)
+
+    def test_small_images_are_not_upscaled(self):
+        from PIL import Image
+
+        name = default_storage.save('about/photo.png', self.png(size=(200, 100), mode='RGB'))
+        self.assertEqual(images.generate(name), 4)
+        with Image.open(Path(self.media_root) / images.derivative_name(name, 640, 'jpg')) as derivative:
+            self.assertEqual(derivative.size, (200, 100))
+        self.assertEqual(images.generate(name), 0)
+
+    def test_backfill_command(self):
+        names = [default_storage.save(f'projects/image{i}.png', self.png()) for i in range(3)]
+        call_command('build_image_derivatives', workers=2, stdout=open(os.devnull, 'w'))
+        for name in names:
+            self.assertTrue((Path(self.media_root) / images.derivative_name(name, 320, 'webp')).exists())
+        self.assertEqual(sorted(images.iter_media_images()), sorted(names))
+
+
+class AdPlacementIndexTests(TestCase):
+    template = Template(
+        '{% load portfolio_extras %}{% adsense_script %}'
+        '{% for position in positions %}[{% adsense_unit position %}]{% endfor %}'
+    )
+
+    def setUp(self):
+        cache.clear()
+        AdSenseConfig.objects.create(pk=1, publisher_id='ca-pub-123', is_active=True)
+        AdUnit.objects.create(name='Header', ad_unit_id='111', position='header')
+        AdUnit.objects.create(name='Blog', ad_unit_id='222', position='content_top', pages_to_show='/blog/, /projects/',
+                              pages_to_exclude='/blog/brouillon')
+        AdUnit.objects.create(name='Mobile', ad_unit_id='333', position='footer', show_on_desktop=False)
+
+    def render(self, path, user_agent='Mozilla/5.0 (X11; Linux x86_64)'):
+        request = RequestFactory().get(path, HTTP_USER_AGENT=user_agent)
+        positions = ['header', 'content_top', 'content_bottom', 'footer', 'between_posts']
+        return self.template.render(Context({'request': request, 'positions': positions}))
+
+    def test_ad_tags_cost_no_queries_once_indexed(self):
+        self.render('/')
+        with self.assertNumQueries(0):
+            html = self.render('/blog/article/')
+        self.assertIn('ca-pub-123', html)
+        self.assertIn('data-ad-slot="111"', html)
+        self.assertIn('data-ad-slot="222"', html)
+
+    def test_page_and_device_targeting(self):
+        self.assertNotIn('data-ad-slot="222"', self.render('/'))
+        self.assertNotIn('data-ad-slot="222"', self.render('/blog/brouillon/'))
+        self.assertNotIn('data-ad-slot="333"', self.render('/'))
+        self.assertIn('data-ad-slot="333"', self.render('/', user_agent='Mozilla/5.0 (iPhone) Mobile'))
+
+        index = ads.get_index()
+        self.assertIsNone(index.unit_for('content_top', DESKTOP, '/'))
+        self.assertEqual(index.unit_for('content_top', DESKTOP, '/projects/').position, 'content_top')
+        self.assertIsNone(index.unit_for('footer', DESKTOP, '/'))
+        self.assertIsNotNone(index.unit_for('footer', MOBILE, '/'))
+
+    def test_index_is_rebuilt_after_changes(self):
+        index = ads.get_index()
+        self.assertIs(ads.get_index(), index)
+        unit = AdUnit.objects.get(ad_unit_id='111')
+        unit.is_active = False
+        unit.save()
+        self.assertIsNot(ads.get_index(), index)
+        self.assertNotIn('data-ad-slot="111"', self.render('/'))
+
+        config = AdSenseConfig.objects.get(pk=1)
+        config.is_active = False
+        config.save()
+        self.assertEqual(self.render('/blog/'), '[][][][][]')
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.buffer.drain()
+        self.metrics_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.metrics_dir, True)
+        metrics.store.drain()
+        self.addCleanup(metrics.store.drain)
+        self.owner = User.objects.create_user('owner')
+        self.post = BlogPost.objects.create(title='Premier article', slug='premier', content='<p>Contenu</p>')
+
+    def tearDown(self):
+        counters.buffer.drain()
+        analytics.buffer.drain()
+
+    def test_second_anonymous_visit_is_served_from_cache(self):
+        first = self.client.get('/blog/')
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+        # Seule reste la requête des validateurs HTTP (ETag/Last-Modified)
+        with self.assertNumQueries(1):
+            second = self.client.get('/blog/')
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        # Compteurs du cache, sans les métriques (désactivées par défaut)
+        self.assertEqual(page_cache.stats()['blog_list'], {'hit': 1, 'miss': 1, 'bypass': 0})
+        output = StringIO()
+        call_command('page_cache_stats', '--reset', stdout=output)
+        self.assertIn('hits:      1  miss:      1', output.getvalue())
+        self.assertEqual(page_cache.stats()['blog_list'], {'hit': 0, 'miss': 0, 'bypass': 0})
+        with self.assertRaises(CommandError):
+            call_command('page_cache_stats', '--metrics', stdout=StringIO())
+
+        # --metrics : additionne aussi le fichier de métriques d'un autre worker
+        with override_settings(METRICS_ENABLED=True, METRICS_DIR=self.metrics_dir):
+            other = metrics.MetricStore()
+            other.inc(metrics.PAGE_CACHE.key({'view': 'blog_list', 'outcome': 'hit'}), 3)
+            other.flush(force=True)
+            output = StringIO()
+            call_command('page_cache_stats', '--metrics', stdout=output)
+        self.assertIn('hits:      4  miss:      1', output.getvalue())
+
+    def test_key_includes_query_string_and_device(self):
+        self.client.get('/blog/')
+        self.assertEqual(self.client.get('/blog/?page=1')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/blog/', HTTP_USER_AGENT='iPhone Mobile')['X-Page-Cache'], 'MISS')
+
+    def test_model_changes_invalidate_dependent_pages(self):
+        self.client.get('/blog/')
+        self.client.get('/testimonials/')
+        Testimonial.objects.create(name='Client satisfait', position='Directeur', message='Excellent travail')
+
+        response = self.client.get('/testimonials/')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Client satisfait')
+        self.assertEqual(self.client.get('/blog/')['X-Page-Cache'], 'HIT')
+
+        BlogPost.objects.create(title='Second article', slug='second', content='<p>Contenu</p>')
+        self.assertContains(self.client.get('/blog/'), 'Second article')
+
+    def test_likes_invalidate_project_pages(self):
+        project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        heart = re.compile(rb'fa-heart"></i>\s*<span>(\d+)</span>')
+        for path in ('/', '/projects/'):
+            self.client.get(path)
+            self.assertEqual(self.client.get(path)['X-Page-Cache'], 'HIT')
+
+        ProjectLike.objects.create(user=self.owner, project=project)
+        for path in ('/', '/projects/'):
+            response = self.client.get(path)
+            self.assertEqual(response['X-Page-Cache'], 'MISS', path)
+            self.assertEqual(heart.findall(response.content), [b'1'], path)
+
+    def test_view_counter_is_replayed_on_hits(self):
+        self.client.get('/blog/premier/')
+        self.assertEqual(self.client.get('/blog/premier/')['X-Page-Cache'], 'HIT')
+        self.assertEqual(counters.buffer.pending('portfolioapp.BlogPost', 'views_count', self.post.pk), 2)
+
+    def test_authenticated_users_and_bypass_header(self):
+        self.client.get('/blog/')
+        with self.settings(PAGE_CACHE_BYPASS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/blog/', HTTP_X_PAGE_CACHE_BYPASS='faux')['X-Page-Cache'], 'HIT')
+            self.assertEqual(self.client.get('/blog/', HTTP_X_PAGE_CACHE_BYPASS='secret')['X-Page-Cache'], 'BYPASS')
+
+        self.client.force_login(self.owner)
+        self.assertNotIn('X-Page-Cache', self.client.get('/blog/'))
+
+    def test_csrf_token_is_renewed_for_each_visitor(self):
+        self.client.get('/testimonials/')
+        other = self.client_class(enforce_csrf_checks=True)
+        response = other.get('/testimonials/')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotIn(b'__page_cache_csrf__', response.content)
+        token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', response.content).group(1).decode()
+
+        response = other.post('/testimonials/', {'csrfmiddlewaretoken': token, 'name': ''})
+        self.assertNotEqual(response.status_code, 403)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.buffer.drain()
+        self.owner = User.objects.create_user('owner')
+        self.viewer = User.objects.create_user('viewer')
+        self.project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        BlogPost.objects.create(title='Article', slug='article', content='<p>Contenu</p>')
+
+    def tearDown(self):
+        counters.buffer.drain()
+        analytics.buffer.drain()
+
+    def test_list_answers_304_before_rendering(self):
+        response = self.client.get('/blog/')
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/blog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        BlogPost.objects.create(title='Nouvel article', slug='nouvel-article', content='<p>Contenu</p>')
+        self.assertEqual(self.client.get('/blog/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_project_detail_etag_follows_comments_likes_and_viewer(self):
+        url = f'/projets/{self.project.pk}/'
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.viewer)
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, anonymous_etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        comment = Comment.objects.create(project=self.project, author=self.owner, text='Bravo')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        comment.likes.add(self.viewer)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_revalidated_visits_are_still_counted(self):
+        post = BlogPost.objects.get(slug='article')
+        analytics.buffer.drain()
+        for url, obj in ((f'/projets/{self.project.pk}/', self.project), ('/blog/article/', post)):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(counters.buffer.pending(obj._meta.label, 'views_count', obj.pk), 2, url)
+        self.assertEqual(len(analytics.buffer), 4)
+
+    def test_json_endpoints_use_content_etags(self):
+        self.client.force_login(self.owner)
+        response = self.client.get('/unread-notifications/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/unread-notifications/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Notification.objects.create(user=self.owner, message='Nouveau like')
+        response = self.client.get('/unread-notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 1)
+
+
+class PortfolioStatsDeltaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.buffer.drain()
+        self.owner = User.objects.create_user('owner')
+        self.viewer = User.objects.create_user('viewer')
+
+    def tearDown(self):
+        counters.buffer.drain()
+
+    def totals(self):
+        stats = PortfolioStats.objects.get(pk=1)
+        return {field: getattr(stats, field) for field in site_stats.FIELDS}
+
+    def test_signals_and_flushes_keep_totals_exact(self):
+        project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        other = Project.objects.create(user=self.owner, title='Autre', description='Description')
+        draft = BlogPost.objects.create(title='Brouillon', slug='brouillon', content='<p>x</p>', is_published=False)
+        post = BlogPost.objects.create(title='Article', slug='article', content='<p>x</p>')
+        ProjectLike.objects.create(user=self.viewer, project=project)
+        ProjectLike.objects.create(user=self.viewer, project=other)
+
+        for _ in range(3):
+            project.increment_views()
+        post.increment_views()
+        counters.flush()
+
+        draft.is_published = True
+        draft.save()
+        post.is_published = False
+        post.save()
+        other.delete()
+
+        self.assertEqual(self.totals(), site_stats.compute())
+        self.assertEqual(self.totals(), {
+            'total_projects': 1, 'total_blog_posts': 1, 'total_views': 4, 'total_likes': 1,
+        })
+
+    def test_stats_page_is_read_only_and_constant(self):
+        project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        ProjectLike.objects.create(user=self.viewer, project=project)
+        self.client.get('/stats/')
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/stats/')
+        for index in range(10):
+            created = Project.objects.create(user=self.owner, title=f'Projet {index}', description='Description')
+            ProjectLike.objects.create(user=self.viewer, project=created)
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/stats/')
+
+        self.assertEqual(len(many), len(few))
+        self.assertFalse([q for q in many.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))])
+        self.assertEqual(response.context['stats'].total_projects, 11)
+        self.assertEqual(self.client.get('/stats/')['X-Page-Cache'], 'HIT')
+
+        # Un flush de vues invalide la page des statistiques, pas les autres pages
+        self.client.get('/testimonials/')
+        project.increment_views()
+        counters.flush()
+        self.assertEqual(self.client.get('/stats/')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/testimonials/')['X-Page-Cache'], 'HIT')
+
+    def test_reconcile_command_fixes_drift(self):
+        Project.objects.create(user=self.owner, title='Projet', description='Description', views_count=7)
+        PortfolioStats.objects.filter(pk=1).update(total_projects=5, total_views=0)
+
+        out = StringIO()
+        call_command('reconcile_portfolio_stats', stdout=out)
+        self.assertIn('total_projects: 5 → 1', out.getvalue())
+        self.assertEqual(self.totals()['total_views'], 7)
+
+        out = StringIO()
+        call_command('reconcile_portfolio_stats', stdout=out)
+        self.assertIn('à jour', out.getvalue())
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=3600, ANALYTICS_FLUSH_THRESHOLD=1000)
+class ViewEventRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters.buffer.drain()
+        analytics.buffer.drain()
+        self.post = BlogPost.objects.create(title='Article', slug='article', content='<p>x</p>')
+
+    def tearDown(self):
+        counters.buffer.drain()
+        analytics.buffer.drain()
+
+    def test_views_are_buffered_and_replayed_on_cache_hits(self):
+        self.client.get('/blog/article/', HTTP_REFERER='https://www.google.com/search?q=x')
+        self.assertEqual(self.client.get('/blog/article/', HTTP_USER_AGENT='iPhone Mobile')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/blog/article/')['X-Page-Cache'], 'HIT')
+        self.assertFalse(ViewEvent.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(analytics.flush(), 3)
+        events = ViewEvent.objects.order_by('id')
+        self.assertEqual([(e.kind, e.object_id) for e in events], [('blogpost', self.post.pk)] * 3)
+        self.assertEqual([e.referrer for e in events], ['www.google.com', '', ''])
+        self.assertEqual([e.device for e in events], ['desktop', 'mobile', 'desktop'])
+
+    def test_rollup_is_idempotent_and_absorbs_late_events(self):
+        now = timezone.now()
+        ViewEvent.objects.bulk_create([
+            ViewEvent(kind='project', object_id=1, device='desktop', created_at=now - timedelta(days=2)),
+            ViewEvent(kind='project', object_id=1, device='desktop', created_at=now - timedelta(days=2)),
+            ViewEvent(kind='project', object_id=1, device='mobile', referrer='x.com', created_at=now),
+        ])
+        analytics.rollup()
+        analytics.rollup()
+        self.assertEqual(HourlyViewRollup.objects.count(), 2)
+        self.assertEqual(sorted(DailyViewRollup.objects.values_list('device', 'views')),
+                         [('desktop', 2), ('mobile', 1)])
+
+        ViewEvent.objects.create(kind='project', object_id=1, device='mobile', referrer='x.com', created_at=now)
+        analytics.rollup()
+        self.assertEqual(DailyViewRollup.objects.get(device='mobile').views, 2)
+
+        summary = analytics.traffic_summary()
+        self.assertEqual(summary['total'], 4)
+        self.assertEqual(summary['referrers'], [('x.com', 2)])
+        self.assertEqual(len(summary['days']), 30)
+
+    def test_prune_deletes_expired_rolled_up_events_in_batches(self):
+        now = timezone.now()
+        old = now - timedelta(days=100)
+        ViewEvent.objects.bulk_create(
+            [ViewEvent(kind='resume', object_id=1, device='desktop', created_at=old) for _ in range(5)]
+            + [ViewEvent(kind='resume', object_id=1, device='desktop', created_at=now)]
+        )
+        # Rien n'est supprimé tant que les événements ne sont pas agrégés
+        self.assertEqual(analytics.prune(retention_days=90, batch_size=2), 0)
+
+        out = StringIO()
+        call_command('rollup_view_events', '--batch-size', '2', stdout=out)
+        self.assertIn('5 événement(s) expiré(s) supprimé(s)', out.getvalue())
+        self.assertEqual(ViewEvent.objects.count(), 1)
+        self.assertEqual(DailyViewRollup.objects.aggregate(total=Sum('views'))['total'], 6)
+
+    def test_stats_page_reads_rollups(self):
+        ViewEvent.objects.create(kind='blogpost', object_id=self.post.pk, device='desktop',
+                                 referrer='news.ycombinator.com', created_at=timezone.now())
+        self.assertNotContains(self.client.get('/stats/'), 'news.ycombinator.com')
+        call_command('rollup_view_events', stdout=StringIO())
+        self.assertContains(self.client.get('/stats/'), 'news.ycombinator.com')
+
+
+class AdPerformanceImportTests(TestCase):
+    csv = (
+        'Date,Ad unit,Impressions,Clicks,Estimated earnings (USD)\n'
+        '2026-03-02,111,"1,000",25,$12.50\n'
+        '2026-03-03,Blog,400,4,"1,002.10"\n'
+        '2026-03-09,111,200,1,0.40\n'
+        '2026-03-10,999,10,0,0\n'
+        'mardi,111,10,0,0\n'
+        '2026-03-11,111,10,20,0\n'
+        'Totals,,1610,30,1015.00\n'
+    )
+
+    def setUp(self):
+        self.header = AdUnit.objects.create(name='Header', ad_unit_id='111', position='header')
+        self.blog = AdUnit.objects.create(name='Blog', ad_unit_id='222', position='content_top')
+
+    def import_csv(self, text, **options):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'export.csv'
+        path.write_text(text, encoding='utf-8')
+        out = StringIO()
+        call_command('import_ad_performance', str(path), stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_validates_upserts_in_batches_and_computes_ctr(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.import_csv(self.csv, batch_size=2)
+        self.assertIn('3 ligne(s) importée(s), 3 ligne(s) rejetée(s)', output)
+        self.assertIn('ligne 5: unité publicitaire inconnue', output)
+        self.assertIn('ligne 6: date invalide', output)
+        self.assertIn("ligne 7: plus de clics", output)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "portfolioapp_adperformance"')]
+        self.assertEqual(len(inserts), 2)
+
+        first = AdPerformance.objects.get(ad_unit=self.header, date=date(2026, 3, 2))
+        self.assertEqual((first.impressions, first.clicks, first.ctr, first.revenue),
+                         (1000, 25, Decimal('2.50'), Decimal('12.50')))
+        self.assertEqual(AdPerformance.objects.get(ad_unit=self.blog).revenue, Decimal('1002.10'))
+
+        # Réimport : mise à jour des lignes existantes, sans doublon
+        self.import_csv('Date,Ad unit,Impressions,Clicks\n2026-03-02,111,2000,10\n')
+        first.refresh_from_db()
+        self.assertEqual((first.impressions, first.ctr), (2000, Decimal('0.50')))
+        self.assertEqual(AdPerformance.objects.count(), 3)
+
+    def test_revenue_separators(self):
+        self.import_csv(
+            'Date,Ad unit,Impressions,Clicks,Revenue\n'
+            '2026-03-02,111,10,0,"1,234"\n'
+            '2026-03-03,111,10,0,"12,5"\n'
+            '2026-03-04,111,10,0,"1.234,56"\n'
+            '2026-03-05,111,10,0,"2,345,678.9"\n'
+        )
+        revenues = list(AdPerformance.objects.order_by('date').values_list('revenue', flat=True))
+        self.assertEqual(revenues, [Decimal('1234.00'), Decimal('12.50'), Decimal('1234.56'), Decimal('2345678.90')])
+
+    def test_rollups_by_week_month_and_position(self):
+        self.import_csv(self.csv)
+        weeks = {
+            (row.period_start, row.position): (row.impressions, row.clicks, row.ctr)
+            for row in AdPerformanceRollup.objects.filter(period='week')
+        }
+        self.assertEqual(weeks, {
+            (date(2026, 3, 2), 'header'): (1000, 25, Decimal('2.50')),
+            (date(2026, 3, 2), 'content_top'): (400, 4, Decimal('1.00')),
+            (date(2026, 3, 9), 'header'): (200, 1, Decimal('0.50')),
+        })
+        month = AdPerformanceRollup.objects.get(period='month', position='header')
+        self.assertEqual((month.period_start, month.impressions, month.revenue),
+                         (date(2026, 3, 1), 1200, Decimal('12.90')))
+
+        # Une saisie dans l'admin met à jour les rapports de sa période
+        AdPerformance.objects.filter(date=date(2026, 3, 9)).delete()
+        self.assertFalse(AdPerformanceRollup.objects.filter(period='week', period_start=date(2026, 3, 9)).exists())
+        self.assertEqual(AdPerformanceRollup.objects.get(period='month', position='header').impressions, 1000)
+
+    def test_dry_run_and_missing_columns(self):
+        output = self.import_csv(self.csv, dry_run=True)
+        self.assertIn('3 ligne(s) validée(s)', output)
+        self.assertFalse(AdPerformance.objects.exists())
+        with self.assertRaisesMessage(CommandError, 'Colonnes manquantes : clicks'):
+            self.import_csv('Date,Ad unit,Impressions\n')
+
+
+class EngagementCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.viewer = User.objects.create_user('viewer')
+        self.project = Project.objects.create(user=self.owner, title='Projet', description='Description')
+        self.comment = Comment.objects.create(project=self.project, author=self.owner, text='Bravo')
+
+    def counts(self):
+        project = Project.objects.get(pk=self.project.pk)
+        comment = Comment.objects.get(pk=self.comment.pk)
+        return project.likes_count, project.comments_count, comment.likes_count, comment.replies_count
+
+    def test_toggles_update_stored_counters(self):
+        self.client.force_login(self.viewer)
+        response = self.client.post(f'/project/{self.project.pk}/like/')
+        self.assertEqual(response.json(), {'liked': True, 'likes_count': 1})
+        response = self.client.post(f'/comment/{self.comment.pk}/like/')
+        self.assertEqual((response.json()['liked'], response.json()['likes_count']), (True, 1))
+        Comment.objects.create(project=self.project, author=self.viewer, text='Merci', parent=self.comment)
+        self.assertEqual(self.counts(), (1, 2, 1, 1))
+
+        self.assertEqual(self.client.post(f'/project/{self.project.pk}/like/').json(), {'liked': False, 'likes_count': 0})
+        self.assertFalse(self.client.post(f'/comment/{self.comment.pk}/like/').json()['liked'])
+        # remove() d'un utilisateur qui n'a pas liké ne décompte rien
+        self.comment.likes.add(self.owner)
+        self.comment.likes.remove(self.viewer)
+        self.owner.liked_comments.clear()
+        self.comment.replies.get().delete()
+        self.assertEqual(self.counts(), (0, 1, 0, 0))
+
+    def test_cards_render_without_queries(self):
+        ProjectLike.objects.create(user=self.viewer, project=self.project)
+        project = Project.objects.select_related('category').prefetch_related('tags').get(pk=self.project.pk)
+        template = Template('{% include "portfolioapp/tags/project_card.html" %}')
+        with self.assertNumQueries(0):
+            html = template.render(Context({'project': project}))
+        self.assertIn('<span>1</span>', html)
+
+    def test_reconcile_command_fixes_drift(self):
+        Project.objects.filter(pk=self.project.pk).update(likes_count=7)
+        Comment.objects.filter(pk=self.comment.pk).update(replies_count=3)
+        out = StringIO()
+        call_command('reconcile_engagement_counters', stdout=out)
+        self.assertIn('project {} (likes_count): 7 → 0'.format(self.project.pk), out.getvalue())
+        self.assertIn('2 compteur(s) corrigé(s)', out.getvalue())
+        self.assertEqual(self.counts(), (0, 1, 0, 0))
+
+
+class LikedIdsTests(TestCase):
+    template = Template('{% load portfolio_extras %}{% for project in projects %}{% project_card project %}{% endfor %}')
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner')
+        self.viewer = User.objects.create_user('viewer')
+        Project.objects.bulk_create([
+            Project(user=self.owner, title=f'Projet {i}', description='Description') for i in range(50)
+        ])
+        self.projects = list(Project.objects.select_related('category').prefetch_related('tags'))
+        for project in self.projects[:10]:
+            ProjectLike.objects.create(user=self.viewer, project=project)
+
+    def request_user(self):
+        # Nouvel objet à chaque fois, comme request.user d'une nouvelle requête
+        return User.objects.get(pk=self.viewer.pk)
+
+    def render(self, user):
+        return self.template.render(Context({'projects': self.projects, 'user': user}))
+
+    def test_fifty_cards_cost_one_query_then_none(self):
+        user = self.request_user()
+        with self.assertNumQueries(1):
+            html = self.render(user)
+        self.assertEqual(html.count('fas fa-heart'), 10)
+        self.assertEqual(html.count('far fa-heart'), 40)
+
+        # Requête suivante du même utilisateur : ensemble lu dans le cache
+        user = self.request_user()
+        with self.assertNumQueries(0):
+            self.render(user)
+
+    def test_toggles_invalidate_cached_ids(self):
+        comment = Comment.objects.create(project=self.projects[0], author=self.owner, text='Bravo')
+        self.assertEqual(likes.liked_ids(self.request_user()).comments, frozenset())
+
+        self.client.force_login(self.viewer)
+        self.client.post(f'/project/{self.projects[0].pk}/like/')
+        self.client.post(f'/comment/{comment.pk}/like/')
+        liked = likes.liked_ids(self.request_user())
+        self.assertNotIn(self.projects[0].pk, liked.projects)
+        self.assertEqual(liked.comments, frozenset({comment.pk}))
+
+        comment.likes.clear()
+        self.assertEqual(likes.liked_ids(self.request_user()).comments, frozenset())
+
+
+class SQLiteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_receives_configured_pragmas(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+    def test_unsafe_pragma_is_rejected(self):
+        with self.assertRaises(ValueError):
+            sqlite_tuning.pragma_statements({'journal_mode': 'wal; DROP TABLE project'})
+
+    def test_benchmark_reports_both_profiles(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', duration=0.2, readers=2, writers=2, rows=50, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['défaut', 'réglé'])
+        self.assertIn('"database is locked": 0', lines[1])
+
+
+class ActivityRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.ActivityRouter()
+
+    def test_activity_models_are_routed_to_their_own_database(self):
+        for model in (Notification, ViewEvent, HourlyViewRollup, AdPerformance, AdPerformanceRollup):
+            self.assertEqual(self.router.db_for_write(model), 'activity')
+        # Le contenu reste dans "default", même lu depuis une instance de la base d'activité
+        performance = AdPerformance(ad_unit_id=1)
+        performance._state.db = 'activity'
+        self.assertEqual(self.router.db_for_read(AdUnit, instance=performance), 'default')
+        self.assertEqual(self.router.db_for_read(Project), 'default')
+
+    def test_migrations_are_split_between_databases(self):
+        self.assertTrue(self.router.allow_migrate('activity', 'portfolioapp', 'notification'))
+        self.assertFalse(self.router.allow_migrate('default', 'portfolioapp', 'notification'))
+        self.assertTrue(self.router.allow_migrate('default', 'portfolioapp', 'project'))
+        self.assertFalse(self.router.allow_migrate('activity', 'auth', 'user'))
+        # RunPython sans modèle : base principale seulement
+        self.assertTrue(self.router.allow_migrate('default', 'portfolioapp'))
+        self.assertFalse(self.router.allow_migrate('activity', 'portfolioapp'))
+
+    def test_cascades_without_database_constraints(self):
+        user = User.objects.create_user('reader')
+        Notification.objects.create(user=user, message='Bienvenue')
+        unit = AdUnit.objects.create(name='Bannière', ad_unit_id='1234', position='header')
+        AdPerformance.objects.create(ad_unit=unit, date=date(2026, 1, 5), impressions=100, clicks=4)
+        self.assertEqual(AdPerformanceRollup.objects.count(), 2)
+
+        user.delete()
+        unit.delete()
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(AdPerformance.objects.exists())
+        self.assertFalse(AdPerformanceRollup.objects.exists())
+
+    def test_rollups_and_admin_do_not_join_ad_units(self):
+        unit = AdUnit.objects.create(name='Bannière', ad_unit_id='1234', position='header')
+        AdPerformance.objects.create(ad_unit=unit, date=date(2026, 1, 5), impressions=100, clicks=4)
+        with CaptureQueriesContext(connection) as queries:
+            ad_reports.refresh_rollups(date(2026, 1, 5), date(2026, 1, 5))
+        self.assertFalse([q for q in queries if 'JOIN' in q['sql'] and 'adperformance' in q['sql']])
+        self.assertEqual(
+            AdPerformanceRollup.objects.get(period='week').position, 'header'
+        )
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/portfolioapp/adperformance/', {'q': 'banni'})
+        self.assertContains(response, 'Bannière')
+        self.assertFalse([q for q in queries if 'JOIN' in q['sql'] and 'adperformance' in q['sql']])
+
+
+@skipUnless(routers.ACTIVITY in settings.DATABASES, "ACTIVITY_DATABASE non renseigné")
+class ActivityDatabaseTests(TestCase):
+    """
+    Deux bases réelles, les autres tests supposant une base unique :
+    ACTIVITY_DATABASE=/tmp/activity.sqlite3 python manage.py test portfolioapp.tests.ActivityDatabaseTests (et
+    ActivityTransactionTests)
+    """
+
+    # "default" et "activity" (sans ACTIVITY_DATABASE, la classe est ignorée)
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(override_settings(DATABASE_ROUTERS=['portfolioapp.routers.ActivityRouter']))
+        self.user = User.objects.create_user('reader')
+
+    def tables(self, alias):
+        return set(connections[alias].introspection.table_names())
+
+    def test_migrations_are_split_between_databases(self):
+        self.assertIn('portfolioapp_notification', self.tables(routers.ACTIVITY))
+        self.assertNotIn('portfolioapp_notification', self.tables('default'))
+        self.assertIn('portfolioapp_project', self.tables('default'))
+        self.assertNotIn('portfolioapp_project', self.tables(routers.ACTIVITY))
+
+    def test_unread_counter_and_cascade_across_databases(self):
+        Notification.objects.bulk_create([Notification(user=self.user, message=f'n{i}') for i in range(3)])
+        notification = Notification.objects.first()
+        self.assertEqual(notification._state.db, routers.ACTIVITY)
+        notification.mark_as_read()
+        self.assertEqual(Profile.objects.get(user=self.user).unread_notifications_count, 2)
+
+        self.user.delete()
+        self.assertFalse(Notification.objects.using(routers.ACTIVITY).exists())
+
+    def test_move_activity_data(self):
+        # Table de notifications d'une base principale antérieure au partage
+        with connections[routers.ACTIVITY].cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'portfolioapp_notification'")
+            create_sql, = cursor.fetchone()
+        with connections['default'].cursor() as cursor:
+            cursor.execute(create_sql)
+        Notification._base_manager.using('default').bulk_create(
+            [Notification(user=self.user, message=f'ancienne {i}') for i in range(3)]
+        )
+
+        call_command('move_activity_data', '--delete', batch_size=2, stdout=StringIO())
+        self.assertEqual(Notification.objects.using(routers.ACTIVITY).count(), 3)
+        self.assertFalse(Notification._base_manager.using('default').exists())
+
+
+@skipUnless(routers.ACTIVITY in settings.DATABASES, "ACTIVITY_DATABASE non renseigné")
+class ActivityTransactionTests(TransactionTestCase):
+    """Transactions réelles dans les deux bases : un échec du compteur annule aussi les notifications"""
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(override_settings(DATABASE_ROUTERS=['portfolioapp.routers.ActivityRouter']))
+        self.user = User.objects.create_user('reader')
+        Notification.objects.bulk_create([Notification(user=self.user, message='Bienvenue')])
+
+    def test_failed_counter_update_rolls_back_notifications(self):
+        attempts = (
+            lambda: Notification.objects.bulk_create([Notification(user=self.user, message='Perdue')]),
+            lambda: Notification.objects.mark_all_as_read(self.user),
+            lambda: Notification.objects.get().mark_as_read(),
+        )
+        failing = mock.patch.object(Profile, 'adjust_unread_counts', side_effect=OperationalError('database is locked'))
+        for attempt in attempts:
+            with self.assertRaises(OperationalError), failing:
+                attempt()
+        self.assertEqual(list(Notification.objects.values_list('message', 'is_read')), [('Bienvenue', False)])
+        self.assertEqual(Profile.objects.get(user=self.user).unread_notifications_count, 1)
+
+
+class ViewBenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, METRICS_ENABLED=True, METRICS_DIR=Path(media_root) / 'metrics',
+            PROFILING_ENABLED=True, PROFILING_DIR=Path(media_root) / 'profiles',
+        ))
+        self.addCleanup(metrics.store.drain)
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+
+    def test_cases_cover_every_route(self):
+        self.assertEqual(benchmarks.uncovered_routes(benchmarks.cases()), [])
+
+    def test_seeded_views_are_measured(self):
+        dataset = benchmarks.seed(projects=6, comments=60, notifications=30, users=4, blog_posts=3)
+        self.assertEqual(Project.objects.get(pk=dataset.project_id).comments_count,
+                         Comment.objects.filter(project_id=dataset.project_id).count())
+
+        results = benchmarks.run(benchmarks.cases(), dataset, repeat=2)
+        self.assertEqual(set(results), {case.key for case in benchmarks.cases()})
+        for key, result in results.items():
+            self.assertLess(result['status'], 400, key)
+            if not key.startswith('metrics:'):  # /metrics ne lit que des fichiers
+                self.assertGreater(result['queries'], 0, key)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'], key)
+
+    def test_compare_flags_regressions(self):
+        before = {'home:anonymous': {'status': 200, 'p95_ms': 10.0, 'queries': 4, 'peak_memory_kib': 500.0}}
+        same = {'home:anonymous': {'status': 200, 'p95_ms': 11.0, 'queries': 4, 'peak_memory_kib': 520.0}}
+        worse = {'home:anonymous': {'status': 500, 'p95_ms': 30.0, 'queries': 9, 'peak_memory_kib': 900.0}}
+        self.assertEqual(benchmarks.compare(before, same), [])
+        self.assertEqual(len(benchmarks.compare(before, worse)), 4)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        paths = []
+        for name, results in (('before', before), ('after', worse)):
+            paths.append(os.path.join(directory, f'{name}.json'))
+            with open(paths[-1], 'w') as output:
+                json.dump({'results': results}, output)
+        with self.assertRaisesMessage(CommandError, '4 régression(s)'):
+            call_command('benchmark_views', compare=paths, stdout=StringIO())
+
+
+class SQLInstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.log = Path(directory) / 'sql.jsonl'
+        self.enterContext(override_settings(
+            SQL_INSTRUMENTATION_ENABLED=True, SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_INSTRUMENTATION_LOG=self.log,
+        ))
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+
+    def entries(self):
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def test_server_timing_and_log_entry(self):
+        BlogPost.objects.create(title='Article', content='Contenu')
+        response = self.client.get('/blog/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries, \d+ duplicates", total;dur=')
+
+        [entry] = self.entries()
+        self.assertEqual((entry['view'], entry['status'], entry['method']), ('blog', 200, 'GET'))
+        self.assertGreater(entry['queries'], 0)
+        self.assertLessEqual(entry['sql_ms'], entry['total_ms'])
+        self.assertTrue(entry['slowest'][0]['sql'].startswith('SELECT'))
+
+    def test_query_parameters_are_never_logged(self):
+        user = User.objects.create_user('lecteur', password='secret-password')
+        self.client.force_login(user)
+        with override_settings(SQL_INSTRUMENTATION_SLOWEST=50):
+            self.client.get('/profile/')
+        content = self.log.read_text()
+        self.assertIn('django_session', content)
+        self.assertNotIn(self.client.session.session_key, content)
+        self.assertNotIn(user.password, content)
+
+    def test_duplicate_and_repeated_queries(self):
+        recorder = sql_instrumentation.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in (1, 1, 2):
+                list(Project.objects.filter(pk=pk))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates(), 1)
+        [(sql, count)] = recorder.repeated()
+        self.assertEqual(count, 3)
+
+    def test_unsampled_requests_are_not_instrumented(self):
+        with override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0):
+            response = self.client.get('/blog/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(self.log.exists())
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.directory = Path(directory)
+        self.enterContext(override_settings(METRICS_ENABLED=True, METRICS_DIR=self.directory))
+        metrics.store.drain()
+        self.addCleanup(metrics.store.drain)
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+
+    def test_endpoint_sums_every_worker(self):
+        # Un autre worker a déjà servi 4 fois le blog
+        other = metrics.MetricStore()
+        other.inc(metrics.REQUESTS.key({'view': 'blog', 'method': 'GET', 'status': 200}), 4)
+        other.flush(force=True)
+
+        self.client.get('/blog/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('portfolio_http_requests_total{view="blog",method="GET",status="200"} 5', text)
+        self.assertIn('portfolio_http_request_duration_seconds_count{view="blog"} 1', text)
+        self.assertIn('portfolio_db_queries_per_request_bucket{view="blog",le="+Inf"} 1', text)
+        self.assertIn('portfolio_page_cache_requests_total{view="blog_list",outcome="miss"} 1', text)
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+
+    def test_histogram_exposition(self):
+        histogram = metrics.NOTIFICATION_FANOUT
+        for size in (0, 3, 3, 1000):
+            histogram.observe(size)
+        lines = metrics.exposition(metrics.store.drain()).splitlines()
+        self.assertIn('# TYPE portfolio_notification_fanout_size histogram', lines)
+        self.assertIn('portfolio_notification_fanout_size_bucket{le="0"} 1', lines)
+        self.assertIn('portfolio_notification_fanout_size_bucket{le="2"} 1', lines)
+        self.assertIn('portfolio_notification_fanout_size_bucket{le="5"} 3', lines)
+        self.assertIn('portfolio_notification_fanout_size_bucket{le="+Inf"} 4', lines)
+        self.assertIn('portfolio_notification_fanout_size_sum 1006', lines)
+        self.assertIn('portfolio_notification_fanout_size_count 4', lines)
+
+    def test_fan_out_and_cache_hits_are_recorded(self):
+        user = User.objects.create_user('lecteur', password='x')
+        notifications.fan_out([user.pk], lambda user_id: 'Message', '/')
+        self.client.get('/blog/')
+        self.client.get('/blog/')
+        values = metrics.store.drain()
+        self.assertEqual(values[metrics.NOTIFICATION_FANOUT.key({})][-2:], [1, 1])
+        self.assertEqual(values[metrics.PAGE_CACHE.key({'view': 'blog_list', 'outcome': 'hit'})], 1)
+
+    def test_forked_worker_starts_empty(self):
+        metrics.REQUESTS.inc(view='home', method='GET', status=200)
+        parent_file = metrics.store.flush(force=True)
+        with mock.patch('portfolioapp.metrics.os.getpid', return_value=os.getpid() + 1):
+            metrics.REQUESTS.inc(view='about', method='GET', status=200)
+            child_file = metrics.store.flush(force=True)
+        self.assertNotEqual(parent_file, child_file)
+        self.assertEqual(list(metrics.collect().values()), [1, 1])
+
+    def test_endpoint_is_local_only(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, 404)
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.directory = Path(directory)
+        self.enterContext(override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory))
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+        self.staff = User.objects.create_user('admin', password='x', is_staff=True)
+        self.visitor = User.objects.create_user('visiteur', password='x')
+
+    def test_staff_request_is_profiled_and_listed(self):
+        self.client.force_login(self.staff)
+        self.client.get('/about/', {'_profile': '1'})
+        self.client.get('/contact/', HTTP_X_PROFILE='1')
+        reports = profiling.reports()
+        self.assertEqual([(r['view'], r['trigger'], r['status']) for r in reports],
+                         [('about', 'query', 200), ('contact', 'header', 200)])
+
+        page = self.client.get('/profiling/')
+        self.assertContains(page, reports[0]['name'])
+        slowest = [reports[0] for _, reports in page.context['views']]
+        self.assertEqual({r['view'] for r in slowest}, {'about', 'contact'})
+        self.assertGreaterEqual(slowest[0]['duration_ms'], slowest[1]['duration_ms'])
+
+        summary = self.client.get(f"/profiling/{reports[0]['name']}/")
+        self.assertContains(summary, 'function calls')
+        download = self.client.get(f"/profiling/{reports[0]['name']}/", {'download': '1'})
+        self.assertIn('attachment', download['Content-Disposition'])
+        self.assertEqual(self.client.get('/profiling/123-notahex/').status_code, 404)
+
+    def test_visitors_cannot_trigger_or_read_profiles(self):
+        self.client.force_login(self.visitor)
+        self.client.get('/about/', {'_profile': '1'}, HTTP_X_PROFILE='1')
+        self.assertEqual(profiling.reports(), [])
+        self.assertEqual(self.client.get('/profiling/').status_code, 302)
+
+    def test_sampling_and_retention(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_REPORTS=2):
+            for path in ('/about/', '/contact/', '/privacy-policy/'):
+                self.client.get(path)
+        reports = profiling.reports()
+        self.assertEqual([(r['view'], r['trigger']) for r in reports],
+                         [('contact', 'sample'), ('privacy_policy', 'sample')])
+        self.assertEqual(len(list(self.directory.glob('*.prof'))), 2)
+
+
+class TemplateProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.log = Path(directory) / 'renders.jsonl'
+        self.enterContext(override_settings(
+            TEMPLATE_PROFILING_ENABLED=True, TEMPLATE_PROFILING_SAMPLE_RATE=1.0, TEMPLATE_PROFILING_LOG=self.log,
+        ))
+        self.addCleanup(metrics.store.drain)
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+        template_profiling.install()
+        self.author = User.objects.create_user('auteur', password='x')
+
+    def renders(self):
+        """Statistiques de la dernière requête mesurée"""
+        entry = json.loads(self.log.read_text().splitlines()[-1])
+        return {(row['kind'], row['name']): row for row in entry['renders']}
+
+    def test_queries_are_attributed_to_the_template_that_runs_them(self):
+        Project.objects.create(user=self.author, title='Projet', description='Description')
+        template = Template(
+            '{% load portfolio_extras %}{% get_popular_projects 3 as popular %}'
+            '{% for project in popular %}{{ project.title }}{% endfor %}'
+        )
+        recorder = template_profiling.RenderRecorder()
+        with template_profiling.recording(recorder), connection.execute_wrapper(recorder):
+            self.assertEqual(template.render(Context()), 'Projet')
+
+        # Le tag retourne un QuerySet paresseux : la requête part de la boucle du template
+        tag = recorder.stats[('tag', 'get_popular_projects')]
+        page = recorder.stats[('template', '<chaîne>')]
+        self.assertEqual((tag[0], tag[3]), (1, 0))
+        self.assertEqual((page[0], page[3], page[4]), (1, 1, 1))
+        self.assertLessEqual(tag[1], page[1])
+
+    def test_includes_and_inclusion_tags_per_request(self):
+        project = Project.objects.create(user=self.author, title='Projet', description='Description')
+        comment = Comment.objects.create(project=project, author=self.author, text='Commentaire')
+        Reply.objects.create(comment=comment, author=self.author, text='Réponse')
+
+        response = self.client.get(f'/projets/{project.pk}/')
+        self.assertRegex(response['Server-Timing'], r'tpl;dur=[\d.]+;desc="\d+ renders"')
+        renders = self.renders()
+        self.assertEqual(renders[('include', 'portfolioapp/project_detail.html:481 portfolioapp/comment_item.html')]['calls'], 1)
+        self.assertEqual(renders[('template', 'portfolioapp/comment_item.html')]['calls'], 1)
+        self.assertEqual(renders[('template', 'portfolioapp/base.html')]['calls'], 1)
+
+        for slug in ('premier', 'second'):
+            BlogPost.objects.create(title=slug, slug=slug, content='Contenu', is_published=True)
+        self.client.get('/blog/')
+        renders = self.renders()
+        self.assertEqual(renders[('tag', 'blog_card')]['calls'], 2)
+        self.assertEqual(renders[('template', 'portfolioapp/tags/blog_card.html')]['calls'], 2)
+
+    def test_command_aggregates_across_requests(self):
+        self.client.get('/contact/')
+        self.client.get('/contact/')
+        self.client.get('/privacy-policy/')
+        output = StringIO()
+        call_command('template_profile', view='contact', kind='template', stdout=output)
+        self.assertIn('2 requête(s) mesurée(s)', output.getvalue())
+        self.assertIn('portfolioapp/contact.html', output.getvalue())
+        self.assertNotIn('portfolioapp/privacy_policy.html', output.getvalue())
+        counted = metrics.store.drain()
+        key = template_profiling.RENDERS.key({'kind': 'template', 'name': 'portfolioapp/contact.html'})
+        self.assertEqual(counted[key], 2)
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=3600, ANALYTICS_FLUSH_INTERVAL=3600)
+class QueryBudgetTests(TestCase):
+    """Nombre de requêtes SQL de chaque route (anonyme et connecté), voir query_budgets.py"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, PROFILING_ENABLED=True, PROFILING_DIR=Path(media_root) / 'profiles',
+        ))
+        # Middleware de métriques actif : il ne doit ajouter aucune requête
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, True)
+        self.enterContext(override_settings(METRICS_ENABLED=True, METRICS_DIR=Path(metrics_dir)))
+        self.addCleanup(metrics.store.drain)
+        self.addCleanup(counters.buffer.drain)
+        self.addCleanup(analytics.buffer.drain)
+        self.dataset = benchmarks.seed(**query_budgets.FIXTURE_SIZES)
+        self.cases = {}
+        for case in benchmarks.cases():
+            self.cases.setdefault(case.name, case)
+
+    def overrun(self, name, audience, budget):
+        """Message d'erreur si la route dépasse son budget, None sinon"""
+        case = self.cases[name]
+        client = Client()
+        if audience == 'user':
+            client.force_login(User.objects.get(pk=self.dataset.user_id))
+        path = case.resolve_path(self.dataset, client)
+        cache.clear()
+        counters.buffer.drain()
+        analytics.buffer.drain()
+
+        recorder = sql_instrumentation.QueryRecorder(origins=True)
+        with connection.execute_wrapper(recorder):
+            getattr(client, case.method)(path, case.data)
+        if recorder.count <= budget:
+            return None
+        lines = [f'{name} ({audience}, {case.method.upper()} {path}) : '
+                 f'{recorder.count} requêtes SQL pour un budget de {budget}']
+        for number, ((sql, params, _), origin) in enumerate(zip(recorder.queries, recorder.origins), 1):
+            lines.append(f'  {number:3}. [{origin or "?"}] {sql[:300]} {params[:100]}')
+        return '\n'.join(lines)
+
+    def test_manifest_covers_every_route(self):
+        routes = {pattern.name for pattern in get_resolver('portfolioapp.urls').url_patterns}
+        self.assertEqual(set(query_budgets.BUDGETS), routes)
+        for name, budgets in query_budgets.BUDGETS.items():
+            self.assertEqual(set(budgets), {'anonymous', 'user'}, name)
+
+    def test_every_route_stays_within_budget(self):
+        for name, budgets in query_budgets.BUDGETS.items():
+            for audience, budget in budgets.items():
+                with self.subTest(route=name, audience=audience):
+                    message = self.overrun(name, audience, budget)
+                    if message:
+                        self.fail(message)
+
+    def test_overrun_reports_sql_and_template_origin(self):
+        message = self.overrun('home', 'anonymous', 0)
+        self.assertIn('home (anonymous, GET /) : 4 requêtes SQL pour un budget de 0', message)
+        self.assertRegex(message, r'\[portfolioapp/home\.html:\d+\] SELECT "portfolioapp_project"')
@@ -7,7 +7,7 @@ from .comment_views import (
 from .views import (custom_logout, get_unread_notifications_count, view_notifications, 
                    mark_all_notifications_as_read, mark_notification_as_read, toggle_like,
                    search_projects, blog_list, blog_detail, testimonials_view, 
-                   download_resume, portfolio_stats)
+                   download_resume, portfolio_stats, metrics_endpoint, cpu_profiles, cpu_profile_report)
 
 urlpatterns = [
     # Pages principales
@@ -43,6 +43,9 @@ urlpatterns = [
     
     # Statistiques
     path('stats/', portfolio_stats, name='portfolio_stats'),
+    path('metrics', metrics_endpoint, name='metrics'),
+    path('profiling/', cpu_profiles, name='cpu_profiles'),
+    path('profiling/<slug:name>/', cpu_profile_report, name='cpu_profile_report'),
     
     # Authentification et profil
     path('signup/', views.signup, name='signup'),
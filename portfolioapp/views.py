@@ -1,28 +1,39 @@
+import os
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.forms import UserCreationForm
+from django.db import transaction
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.utils.text import slugify
-from django.urls import reverse
 from .models import (Project, Comment, Reply, Notification, Category, About,
-                     Tag, ProjectLike, Testimonial, Resume, BlogPost, PortfolioStats, Profile)
+                     Tag, ProjectLike, Testimonial, Resume, BlogPost, Profile)
 from .forms import (CommentForm, ReplyForm, ProfileForm, ContactForm, 
                    TestimonialForm, ProjectSearchForm)
+from .comment_threads import load_comment_thread
+from . import analytics, file_delivery, metrics, profiling, related_projects, search, site_stats
+from .page_cache import cache_anonymous_page
+from .conditional import (conditional_view, content_etag, project_state, projects_state,
+                          published_posts_state, stats_state)
 
+@cache_anonymous_page('project-engagement')
 def home(request):
-    projects = Project.objects.all().order_by('-created_at')
+    projects = Project.objects.select_related('category').order_by('-created_at')
     return render(request, 'portfolioapp/home.html', {'projects': projects})
 
 def blog(request):
     return render(request, 'portfolioapp/blog.html')
 
+@conditional_view(projects_state, tags=['project-engagement'])
+@cache_anonymous_page('project-engagement')
 def projects_view(request):
-    projects = Project.objects.all().order_by('-created_at')
-    categories = Category.objects.all()
+    projects = Project.objects.select_related('category').prefetch_related('tags').order_by('-created_at')
+    # Nombre de projets par catégorie calculé dans la même requête (pas de COUNT par catégorie)
+    categories = Category.objects.annotate(project_count=Count('project'))
     category_icons = {
         "Développement": "bi-code",
         "Design": "bi-brush",
@@ -62,24 +73,24 @@ def projects_view(request):
     })
 
 
+def record_project_view(request, pk):
+    """Visite revalidée (304) : comptée sans charger le projet"""
+    project = Project(pk=pk)
+    project.increment_views()
+    analytics.record_view(request, project)
+
 # Vue pour la page de détail d'un projet
+@conditional_view(project_state, tags=['project-engagement'], on_not_modified=record_project_view)
 def project_detail(request, pk):
     project = get_object_or_404(Project, pk=pk)
 
-    # Récupérer les commentaires triés par date de création décroissante
-    comments = Comment.objects.filter(project=project).order_by('-created_at')
+    # Récupérer le fil de commentaires (réponses, auteurs, likes) en un nombre constant de requêtes
+    comments, comments_count = load_comment_thread(project, request.user)
 
-    # Récupérer les catégories et les projets associés
-    categories = Category.objects.all()
-    categories_with_projects = [category for category in categories if
-                                Project.objects.filter(category=category).exists()]
-    projects_by_category = {category: Project.objects.filter(category=category) for category in
-                            categories_with_projects}
-
-    # Récupérer les projets non catégorisés
-    uncategorized_projects = Project.objects.filter(category__isnull=True)
-    if uncategorized_projects.exists():
-        projects_by_category["non_categorise"] = uncategorized_projects
+    # Récupérer les projets associés par catégorie (requête fenêtrée unique, mise en cache)
+    projects_by_category = related_projects.projects_by_category()
+    categories_with_projects = [category for category in projects_by_category
+                                if category != related_projects.UNCATEGORIZED]
 
     # Gestion des formulaires de commentaire et de réponse
     if request.method == 'POST':
@@ -107,10 +118,13 @@ def project_detail(request, pk):
     else:
         form = CommentForm()
         reply_form = ReplyForm()
+        project.increment_views()
+        analytics.record_view(request, project)
 
     return render(request, 'portfolioapp/project_detail.html', {
         'project': project,
         'comments': comments,
+        'comments_count': comments_count,
         'projects_by_category': projects_by_category,
         'categories': categories_with_projects,
         'form': form,
@@ -135,16 +149,9 @@ def add_comment(request, project_id):
             comment = form.save(commit=False)
             comment.project = project
             comment.author = request.user
+            # Les notifications (propriétaire inclus) sont créées par le signal post_save
             comment.save()
             
-            # Créer une notification pour le propriétaire du projet
-            if project.user != request.user:
-                Notification.objects.create(
-                    user=project.user,
-                    message=f"{request.user.username} a commenté votre projet {project.title}",
-                    link=reverse('project_detail', args=[project.id]) + f"#comment-{comment.id}"
-                )
-            
             # Rendre le template du commentaire en HTML
             comment_html = render_to_string('portfolioapp/comment_item.html', {
                 'comment': comment,
@@ -170,16 +177,9 @@ def add_reply(request, comment_id):
             reply.author = request.user
             reply.project = comment.project
             reply.parent = comment
+            # Les notifications (auteur du commentaire inclus) sont créées par le signal post_save
             reply.save()
             
-            # Créer une notification pour l'auteur du commentaire
-            if comment.author != request.user:
-                Notification.objects.create(
-                    user=comment.author,
-                    message=f"{request.user.username} a répondu à votre commentaire",
-                    link=reverse('project_detail', args=[comment.project.id]) + f"#comment-{comment.id}"
-                )
-            
             # Rendre le template de la réponse en HTML
             reply_html = render_to_string('portfolioapp/comment_item.html', {
                 'comment': reply,
@@ -237,8 +237,9 @@ def custom_logout(request):
     return redirect('home')
 
 @login_required
+@content_etag
 def get_unread_notifications_count(request):
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
+    count = Profile.get_unread_count(request.user)
     return JsonResponse({'unread_count': count})
 
 @login_required
@@ -254,9 +255,10 @@ def mark_notification_as_read(request, notification_id):
 
 @login_required
 def mark_all_notifications_as_read(request):
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    Notification.objects.mark_all_as_read(request.user)
     return redirect('view_notifications')
 
+@cache_anonymous_page('about')
 def about(request):
     about_info = About.objects.first()
     return render(request, 'portfolioapp/about.html', {'about_info': about_info})
@@ -278,21 +280,20 @@ def contact(request):
 def toggle_like(request, project_id):
     """Vue pour liker/unliker un projet"""
     project = get_object_or_404(Project, id=project_id)
-    like, created = ProjectLike.objects.get_or_create(user=request.user, project=project)
-    
-    if not created:
-        like.delete()
-        liked = False
-    else:
-        liked = True
-    
-    likes_count = project.likes.count()
+    with transaction.atomic():
+        # Le compteur du projet est mis à jour par les signaux, dans cette transaction
+        deleted, _ = ProjectLike.objects.filter(user=request.user, project=project).delete()
+        liked = not deleted
+        if liked:
+            ProjectLike.objects.get_or_create(user=request.user, project=project)
+        likes_count = Project.objects.values_list('likes_count', flat=True).get(pk=project.pk)
     return JsonResponse({'liked': liked, 'likes_count': likes_count})
 
 def search_projects(request):
     """Vue pour la recherche avancée de projets"""
     form = ProjectSearchForm(request.GET)
-    projects = Project.objects.all()
+    projects = Project.objects.select_related('category').prefetch_related('tags')
+    search_query = None
     
     if form.is_valid():
         search_query = form.cleaned_data.get('search')
@@ -300,13 +301,6 @@ def search_projects(request):
         tag = form.cleaned_data.get('tag')
         status = form.cleaned_data.get('status')
         
-        if search_query:
-            projects = projects.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(technologies__icontains=search_query)
-            )
-        
         if category:
             projects = projects.filter(category=category)
         
@@ -315,11 +309,23 @@ def search_projects(request):
         
         if status:
             projects = projects.filter(status=status)
+        
+        if search_query and not search.is_available():
+            projects = projects.filter(
+                Q(title__icontains=search_query) |
+                Q(description__icontains=search_query) |
+                Q(technologies__icontains=search_query)
+            )
     
     # Pagination
-    paginator = Paginator(projects, 9)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if search_query and search.is_available():
+        # Index FTS5 : résultats classés par pertinence avec extraits
+        ranked = search.rank(projects, 'project', search_query)
+        page_obj = search.load_page(projects, Paginator(ranked, 9).get_page(page_number), 'project', search_query)
+    else:
+        paginator = Paginator(projects, 9)
+        page_obj = paginator.get_page(page_number)
     
     return render(request, 'portfolioapp/search_results.html', {
         'form': form,
@@ -327,28 +333,35 @@ def search_projects(request):
         'projects': page_obj,
     })
 
+@conditional_view(published_posts_state, tags=['blog-list'])
+@cache_anonymous_page('blog-list')
 def blog_list(request):
     """Vue pour la liste des articles de blog"""
     posts = BlogPost.objects.filter(is_published=True)
     
+    # Filtrage par tag
+    tag_id = request.GET.get('tag')
+    if tag_id:
+        posts = posts.filter(tags__id=tag_id)
+    
     # Recherche
     search_query = request.GET.get('search')
-    if search_query:
+    if search_query and not search.is_available():
         posts = posts.filter(
             Q(title__icontains=search_query) |
             Q(content__icontains=search_query) |
             Q(excerpt__icontains=search_query)
         )
     
-    # Filtrage par tag
-    tag_id = request.GET.get('tag')
-    if tag_id:
-        posts = posts.filter(tags__id=tag_id)
-    
     # Pagination
-    paginator = Paginator(posts, 6)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if search_query and search.is_available():
+        # Index FTS5 : résultats classés par pertinence avec extraits
+        ranked = search.rank(posts, 'blogpost', search_query)
+        page_obj = search.load_page(posts, Paginator(ranked, 6).get_page(page_number), 'blogpost', search_query)
+    else:
+        paginator = Paginator(posts, 6)
+        page_obj = paginator.get_page(page_number)
     
     # Tags populaires
     popular_tags = Tag.objects.annotate(
@@ -361,10 +374,21 @@ def blog_list(request):
         'search_query': search_query,
     })
 
+def record_post_view(request, slug):
+    """Visite revalidée (304) : comptée sans rendre l'article"""
+    post = BlogPost.objects.filter(slug=slug, is_published=True).only('pk', 'views_count').first()
+    if post is not None:
+        post.increment_views()
+        analytics.record_view(request, post)
+
+# Dépend de tous les articles (articles similaires), pas seulement de celui affiché
+@conditional_view(published_posts_state, tags=['blog-list'], on_not_modified=record_post_view)
+@cache_anonymous_page('blog-list')
 def blog_detail(request, slug):
     """Vue pour le détail d'un article de blog"""
     post = get_object_or_404(BlogPost, slug=slug, is_published=True)
     post.increment_views()
+    analytics.record_view(request, post)
     
     # Articles similaires
     related_posts = BlogPost.objects.filter(
@@ -377,6 +401,7 @@ def blog_detail(request, slug):
         'related_posts': related_posts,
     })
 
+@cache_anonymous_page('testimonial-list')
 def testimonials_view(request):
     """Vue pour afficher les témoignages"""
     testimonials = Testimonial.objects.all().order_by('-created_at')
@@ -400,25 +425,20 @@ def testimonials_view(request):
 def download_resume(request, resume_id):
     """Vue pour télécharger un CV"""
     resume = get_object_or_404(Resume, id=resume_id, is_active=True)
-    resume.increment_downloads()
-    
-    response = HttpResponse(resume.file.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{resume.title}.pdf"'
-    return response
+    extension = os.path.splitext(resume.file.name)[1] or '.pdf'
 
+    def on_delivery(response):
+        resume.increment_downloads()
+        analytics.record_view(request, resume)
+
+    # Streaming avec Range/ETag ; le téléchargement n'est compté qu'une fois la réponse envoyée
+    return file_delivery.serve_file(request, resume.file, f"{resume.title}{extension}", on_delivery=on_delivery)
+
+@conditional_view(stats_state, tags=['portfolio-stats', 'blog-list', analytics.TAG])
+@cache_anonymous_page('portfolio-stats', 'blog-list', analytics.TAG)
 def portfolio_stats(request):
-    """Vue pour afficher les statistiques du portfolio"""
-    stats, created = PortfolioStats.objects.get_or_create(id=1)
-    
-    # Mettre à jour les statistiques
-    stats.total_projects = Project.objects.count()
-    stats.total_blog_posts = BlogPost.objects.filter(is_published=True).count()
-    stats.total_views = (
-        sum(Project.objects.values_list('views_count', flat=True)) +
-        sum(BlogPost.objects.values_list('views_count', flat=True))
-    )
-    stats.total_likes = ProjectLike.objects.count()
-    stats.save()
+    """Vue pour afficher les statistiques du portfolio (lecture seule, voir site_stats.py)"""
+    stats = site_stats.get_stats()
     
     # Projets les plus populaires
     popular_projects = Project.objects.order_by('-views_count')[:5]
@@ -434,6 +454,7 @@ def portfolio_stats(request):
         'popular_projects': popular_projects,
         'popular_posts': popular_posts,
         'recent_projects': recent_projects,
+        'traffic': analytics.traffic_summary(),
     })
 
 def privacy_policy(request):
@@ -442,4 +463,29 @@ def privacy_policy(request):
 
 def terms_of_service(request):
     """Vue pour les conditions d'utilisation"""
-    return render(request, 'portfolioapp/terms_of_service.html')
\ No newline at end of file
+    return render(request, 'portfolioapp/terms_of_service.html')
+
+def metrics_endpoint(request):
+    """Métriques au format Prometheus, pour un scraper local (adresses de METRICS_ALLOWED_IPS)"""
+    if not metrics.enabled() or request.META.get('REMOTE_ADDR') not in metrics.allowed_ips():
+        raise Http404
+    return HttpResponse(metrics.exposition(metrics.collect()), content_type=metrics.CONTENT_TYPE)
+
+@user_passes_test(lambda user: user.is_staff)
+def cpu_profiles(request):
+    """Requêtes profilées les plus lentes, par vue (staff uniquement)"""
+    return render(request, 'portfolioapp/cpu_profiles.html', {
+        'views': profiling.slowest_by_view(),
+        'header': 'X-Profile: 1',
+        'query_param': profiling.QUERY_PARAM,
+    })
+
+@user_passes_test(lambda user: user.is_staff)
+def cpu_profile_report(request, name):
+    """Résumé texte d'un rapport, ou fichier pstats brut avec ?download=1"""
+    path = profiling.report_path(name)
+    if path is None:
+        raise Http404
+    if request.GET.get('download'):
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+    return HttpResponse(profiling.summary(path), content_type='text/plain; charset=utf-8')